@@ -6,6 +6,8 @@ from anapyzermodel import AnaPyzerModel
 from anapyzerview import AnaPyzerView
 # Import the AnaPyzerController class
 from anapyzercontroller import AnaPyzerController
+# Import the parse cache that the model loads parsed logs from
+from anapyzercache import default_parse_cache
 
 from anapyzerparser import AnaPyzerParser
 
@@ -19,6 +21,8 @@ if __name__ == '__main__':
     analyzer = AnaPyzerAnalyzer()
     # Instantiate the main application model object
     model = AnaPyzerModel(parser, analyzer)
+    # Give the model the on-disk parse cache, unless it is turned off with the ANAPYZER_NO_CACHE environment variable
+    model.set_parse_cache(default_parse_cache())
 
     root = tkinter.Tk()
     root.resizable(width=False, height=False)
@@ -0,0 +1,664 @@
+# Import the array library for compact storage of the rows an analysis keeps
+import array
+# Import the bisect library to find the session that an out of order request falls in
+import bisect
+# Import the collections library to count the codes of dictionary-encoded columns
+import collections
+# Import the concurrent.futures library to find the suspicious activity of the ips of each partition in its own process
+import concurrent.futures
+# Import the heapq library to find the top resources without sorting all of them
+import heapq
+# Import the itertools library to find the runs of rows with the same code
+import itertools
+# Import the operator library to rank resources by their counts
+import operator
+# Import the time library to show the times of sessions
+import time
+# Import the NumPy resource counts that are used in place of the python ones when NumPy is installed
+import anapyzernumpy
+# Import the symbol tables that values are encoded with, the epoch seconds given to rows without a time and the offsets
+# of time zones
+from anapyzerparsedlog import SymbolTable, MISSING_EPOCH, zone_offset
+# Import the records that reports are made of
+from anapyzerreport import ReportRecord, HEADING
+# Import the HyperLogLog sketches that unique values are counted approximately with
+from anapyzersketch import HyperLogLog, SpaceSaving, sketch_hash, check_precision
+
+# The default thresholds of the suspicious activity report: an ip that hits one resource more than
+# SUSPICIOUS_MAX_HITS times within SUSPICIOUS_WINDOW_SECONDS seconds is reported. Hits of the
+# SUSPICIOUS_IGNORED_URLS, such as the home page that every page links to, are never reported
+SUSPICIOUS_MAX_HITS = 5
+SUSPICIOUS_WINDOW_SECONDS = 1
+SUSPICIOUS_IGNORED_URLS = ('/',)
+
+# The longest time in seconds between two requests of a client in the same session of the connection length report
+SESSION_GAP_SECONDS = 30 * 60
+
+# The number of resources in the web site resource report, and the counts it can rank them by
+WEB_PAGES_TOP_K = 50
+METRIC_HITS = 'hits'
+METRIC_BYTES = 'bytes'
+WEB_PAGES_METRICS = (METRIC_HITS, METRIC_BYTES)
+
+# The hour and the day that the rows without a time fall in
+_MISSING_HOUR = MISSING_EPOCH // 3600
+_MISSING_DAY = MISSING_EPOCH // 86400
+# The two digit text of each hour of the day that the connections per hour are kept under
+_HOUR_TEXTS = ['%02d' % hour for hour in range(0, 24)]
+
+# The words for the small numbers of the suspicious activity report's thresholds
+_NUMBER_WORDS = ['zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten']
+
+
+# The Accumulator class is the base of the analyses that are built up one batch of a parsed log at a time.
+# update() folds the rows of a ParsedLog, starting at row start, into the running state of the analysis and
+# finalize() returns the result of the analysis from that state without changing it, so an accumulator can keep
+# being updated as new rows are parsed.
+# row_count is the number of rows that have been folded in
+class Accumulator:
+
+    # Constructor
+    def __init__(self):
+        self.row_count = 0
+
+    # Folds the rows of parsed_log from row start onwards into the accumulator
+    def update(self, parsed_log, start=0):
+        if start < parsed_log.length:
+            self._update(parsed_log, start)
+            self.row_count += parsed_log.length - start
+
+    # Folds the rows of parsed_log from row start onwards into the state of the analysis
+    def _update(self, parsed_log, start):
+        raise NotImplementedError
+
+    # Returns the result of the analysis for every row folded in so far
+    def finalize(self):
+        raise NotImplementedError
+
+
+# Returns the values of the named column of parsed_log from row start onwards, or None if the log does not have it
+def column_values(parsed_log, name, start=0):
+    column = parsed_log.column(name)
+    if column is None:
+        return None
+    return column.values(start)
+
+
+# Returns the codes of the named column of parsed_log from row start onwards along with the column's symbol table,
+# or None if the log does not have the column. Counting codes is much faster than hashing the strings they stand for
+def column_codes(parsed_log, name, start=0):
+    column = parsed_log.column(name)
+    if column is None:
+        return None
+    return column.codes[start:], column.symbol_table
+
+
+# Returns the epoch seconds of every row of a batch from row start onwards in the time zone the log recorded them in,
+# which are its epoch seconds with the offset of its time zone added back, so each row falls in the hour and on the
+# date of its own date and time. Rows without a time keep MISSING_EPOCH. Returns None if the log has no date or time
+def _local_epochs(parsed_log, start):
+    epochs = parsed_log.epoch_column()
+    if epochs is None:
+        return None
+    epochs = epochs.values(start)
+    zones = parsed_log.column('time-zone')
+    if zones is None:
+        return epochs
+    # the offset of each distinct zone is only worked out once, as it is for the epoch seconds
+    offsets = zones.symbol_table.derived('offset', zone_offset)
+    return [epoch if epoch == MISSING_EPOCH else epoch + offsets[zone_code]
+            for epoch, zone_code in zip(epochs, zones.codes[start:])]
+
+
+# Groups the rows of a batch by hour and yields the (date code, hour of the day, set of ip codes) of each run of rows
+# in the same hour of the same date. The hours are counted from the local epoch seconds of the rows, and the date code
+# is that of the first row of the run. The rows of a log are in time order, so the ips are found a run of rows at a
+# time. Rows without a time are left out
+def _hour_ip_groups(date_codes, local_epochs, ip_codes):
+    run_start = 0
+    for hour_number, run in itertools.groupby(local_epoch // 3600 for local_epoch in local_epochs):
+        run_end = run_start + len(list(run))
+        if hour_number != _MISSING_HOUR:
+            yield date_codes[run_start], hour_number % 24, set(ip_codes[run_start:run_end])
+        run_start = run_end
+
+
+# Counts the rows of a batch of each ip on each date and returns a list of (date code, ip code, count). The dates are
+# the days of the local epoch seconds of the rows, or the date codes themselves if local_epochs is None, and the date
+# code is that of the first row of each day. The rows of a log are in time order, so the ip codes are counted a run of
+# rows of the same date at a time. Rows without a time are left out
+def _date_ip_counts(date_codes, local_epochs, ip_codes):
+    counts = []
+    run_start = 0
+    days = date_codes if local_epochs is None else (local_epoch // 86400 for local_epoch in local_epochs)
+    for day_number, run in itertools.groupby(days):
+        run_end = run_start + len(list(run))
+        if day_number != _MISSING_DAY:
+            counts.extend((date_codes[run_start], ip_code, count)
+                          for ip_code, count in collections.Counter(ip_codes[run_start:run_end]).items())
+        run_start = run_end
+    return counts
+
+
+# Counts the rows of a batch of each code and returns a dictionary of each code to its count, along with a dictionary
+# of each code to the sum of the values of its rows, or of 0s if value_codes is None.
+# This is the python group-by of anapyzernumpy.code_counts
+def _code_counts(codes, values=None, value_codes=None):
+    hits = collections.Counter(codes)
+    sums = dict.fromkeys(hits, 0)
+    if value_codes is not None:
+        for code, value_code in zip(codes, value_codes):
+            sums[code] += values[value_code]
+    return hits, sums
+
+
+# Returns the metric of the web site resource report, raising a ValueError if it is not one of WEB_PAGES_METRICS
+def check_web_pages_metric(metric):
+    if metric not in WEB_PAGES_METRICS:
+        raise ValueError("Unknown web site resource metric: " + str(metric))
+    return metric
+
+
+# The ColumnRecoder class encodes the values of the columns of several parsed logs in a single symbol table of its
+# own, for analyses that keep codes from one batch to the next when the batches may not share their symbol tables.
+# The code in symbol_table of each code of a column's symbol table is worked out once, and only for the symbols
+# added to the column's symbol table since the last batch
+class ColumnRecoder:
+
+    # Constructor
+    def __init__(self):
+        self.symbol_table = SymbolTable()
+        self._remaps = {}
+
+    # Returns the list of the codes in symbol_table of the values of column from row start onwards
+    def codes(self, column, start=0):
+        column_table = column.symbol_table
+        table_remap = self._remaps.get(id(column_table))
+        if table_remap is None or table_remap[0] is not column_table:
+            table_remap = (column_table, [])
+            self._remaps[id(column_table)] = table_remap
+        remap = table_remap[1]
+        if len(remap) < len(column_table):
+            remap.extend(self.symbol_table.codes(column_table.symbols[len(remap):]))
+        return list(map(remap.__getitem__, column.codes[start:]))
+
+
+# Returns the number of bytes in a bytes sent field, which is '-' or empty when nothing was sent
+def _bytes_value(value):
+    if not value or not value.isdigit():
+        return 0
+    return int(value)
+
+
+# Accumulates the number of unique ips seen in each hour of each date, the result of
+# AnaPyzerAnalyzer.get_connections_per_hour. The hour of each row is worked out from its epoch seconds, in the time
+# zone the log recorded it in, and rows without a time are left out. The distinct ips of each hour are kept in a set,
+# so memory does not grow with the number of lines.
+# If precision is given, the ips of each hour are counted approximately in a HyperLogLog sketch of that precision
+# instead, which takes the same small amount of memory however many distinct ips there are.
+# The accumulators of several files or parsing processes can be combined with merge()
+class ConnectionsPerHourAccumulator(Accumulator):
+
+    # Constructor. Raises a ValueError if the precision is not a valid HyperLogLog precision
+    def __init__(self, precision=None):
+        super().__init__()
+        self.precision = check_precision(precision) if precision is not None else None
+        self._ips_per_hour = {}
+
+    def _update(self, parsed_log, start):
+        connections_per_hour_table = self._ips_per_hour
+        local_epochs = _local_epochs(parsed_log, start)
+        if local_epochs is None:
+            return
+        date_codes, date_table = column_codes(parsed_log, 'date', start)
+        ip_codes, ip_table = column_codes(parsed_log, 'client-ip', start)
+        date_symbols = date_table.symbols
+        precision = self.precision
+        if precision is None:
+            ip_symbols = ip_table.derived('str', str)
+        else:
+            # the hash of each distinct ip is only worked out once
+            ip_hashes = ip_table.derived('sketch-hash', sketch_hash)
+
+        for date_code, hour_of_day, hour_ip_codes in _hour_ip_groups(date_codes, local_epochs, ip_codes):
+            hour = _HOUR_TEXTS[hour_of_day]
+            hours_table = connections_per_hour_table.setdefault(date_symbols[date_code], {})
+            if precision is not None:
+                sketch = hours_table.get(hour)
+                if sketch is None:
+                    sketch = hours_table[hour] = HyperLogLog(precision)
+                for ip_code in hour_ip_codes:
+                    sketch.add_hash(ip_hashes[ip_code])
+            elif hour in hours_table:
+                hours_table[hour].update(map(ip_symbols.__getitem__, hour_ip_codes))
+            else:
+                hours_table[hour] = set(map(ip_symbols.__getitem__, hour_ip_codes))
+
+    # Adds the ips of another accumulator of the same precision, such as the one of another file of a log or of
+    # another parsing process, to this one. Raises a ValueError if the precisions are different
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge connections per hour of different precisions")
+        for date, other_hours_table in other._ips_per_hour.items():
+            hours_table = self._ips_per_hour.setdefault(date, {})
+            for hour, ips in other_hours_table.items():
+                if hour not in hours_table:
+                    hours_table[hour] = HyperLogLog(self.precision) if self.precision is not None else set()
+                if self.precision is not None:
+                    hours_table[hour].merge(ips)
+                else:
+                    hours_table[hour].update(ips)
+        self.row_count += other.row_count
+
+    def finalize(self):
+        connections_per_hour_table = {}
+        for date, hours_table in self._ips_per_hour.items():
+            if self.precision is None:
+                connections_per_hour_table[date] = {hours: len(ips) for hours, ips in hours_table.items()}
+            else:
+                connections_per_hour_table[date] = {hours: round(sketch.count())
+                                                     for hours, sketch in hours_table.items()}
+
+        connections_per_hour_table['xlabel'] = "Hour of Day"
+        connections_per_hour_table['ylabel'] = "Unique IPs Recorded"
+        connections_per_hour_table['title'] = "Connections Per Hour"
+        return connections_per_hour_table
+
+
+# Accumulates the hits and bytes sent for each resource, the result of AnaPyzerAnalyzer.get_web_pages.
+# finalize() reports the top_k resources ranked by metric, either METRIC_HITS or METRIC_BYTES, which are only read
+# by finalize() so they can be changed between calls.
+# Every resource is counted exactly, unless capacity is given, in which case only the capacity resources with the
+# largest counts of the metric are kept in a Space-Saving sketch, so memory does not grow with the number of distinct
+# resources. The count of the metric kept in the sketch is never under the true count and may be over it by at most
+# its error, while the other count of a resource is only counted from when it was last taken into the sketch, so it
+# may be under the true count
+class WebPagesAccumulator(Accumulator):
+
+    # Constructor. Raises a ValueError if the metric is not one of WEB_PAGES_METRICS
+    def __init__(self, top_k=WEB_PAGES_TOP_K, metric=METRIC_HITS, capacity=None):
+        super().__init__()
+        self.top_k = top_k
+        self.metric = check_web_pages_metric(metric)
+        self._hits = {}
+        self._bytes = {}
+        self._sketch = SpaceSaving(capacity) if capacity is not None else None
+        # The metric the sketch ranks resources by, which cannot change once it has started counting
+        self._sketch_metric = metric
+
+    def _update(self, parsed_log, start):
+        web_page_dictionary = self._hits
+        web_page_bytes = self._bytes
+        url_codes, url_table = column_codes(parsed_log, 'uri-stem', start)
+        url_symbols = url_table.symbols
+
+        # bytes sent from the server to the client for each resource, not every log records it
+        bytes_values = bytes_codes = None
+        bytes_sent_codes = column_codes(parsed_log, 'bytes-sent', start)
+        if bytes_sent_codes is not None:
+            bytes_codes, bytes_table = bytes_sent_codes
+            # each distinct bytes sent value is only converted to a number once
+            bytes_values = bytes_table.derived('bytes', _bytes_value)
+        if anapyzernumpy.is_enabled():
+            hits, bytes_sent = anapyzernumpy.code_counts(url_codes, bytes_values, bytes_codes)
+        else:
+            hits, bytes_sent = _code_counts(url_codes, bytes_values, bytes_codes)
+
+        sketch = self._sketch
+        for url_code, count in hits.items():
+            url = url_symbols[url_code]
+            if sketch is not None:
+                evicted = sketch.add(url, count if self._sketch_metric == METRIC_HITS else bytes_sent[url_code])
+                if evicted is not None:
+                    del web_page_dictionary[evicted]
+                    del web_page_bytes[evicted]
+            if url in web_page_dictionary:
+                web_page_dictionary[url] += count
+                web_page_bytes[url] += bytes_sent[url_code]
+            else:
+                web_page_dictionary[url] = count
+                web_page_bytes[url] = bytes_sent[url_code]
+
+    # Returns a list of the (resource, hits, bytes sent, error) of the top_k resources ranked by the metric, largest
+    # first. error is how far the ranked count may be over the true count, which is 0 when every resource is counted.
+    # The ranked count of a resource of a sketch is the sketch's count, and its other count is a lower bound.
+    # Ranking the resources of a sketch by the other metric ranks only the resources it is keeping
+    def top_resources(self):
+        hits = self._hits
+        bytes_sent = self._bytes
+        if self._sketch is not None and self.metric == self._sketch_metric:
+            if self.metric == METRIC_HITS:
+                return [(url, count, bytes_sent[url], error) for url, count, error in self._sketch.top(self.top_k)]
+            return [(url, hits[url], count, error) for url, count, error in self._sketch.top(self.top_k)]
+
+        ranking = hits if self.metric == METRIC_HITS else bytes_sent
+        return [(url, hits[url], bytes_sent[url], 0)
+                for url, count in heapq.nlargest(self.top_k, ranking.items(), key=operator.itemgetter(1))]
+
+    # Yields the records of the report of the top_k resources, a HEADING with the number of entries and then a
+    # record for each resource
+    def records(self):
+        entries = len(self._hits)
+        if self._sketch is None:
+            text = "Web Site Resource Report has " + str(entries) + " entries \n\n "
+        else:
+            text = "Web Site Resource Report has " + str(entries) + " tracked entries \n\n "
+        if entries:
+            text += "The top " + str(self.top_k) + " resources are : \n\n"
+        yield ReportRecord(HEADING, {'entries': entries, 'tracked': self._sketch is not None, 'top_k': self.top_k,
+                                     'metric': self.metric}, text)
+
+        # The counts of a sketch that are not the metric it ranks by were only counted since each resource was last
+        # taken into the sketch, so they are lower bounds. The sketch's own counts may be over by their error
+        sketched = self._sketch is not None
+        ranked_at_least = "at least " if sketched and self.metric != self._sketch_metric else ""
+        for url, hits, bytes_sent, error in self.top_resources():
+            over_by = " (over by at most " + str(error) + ")" if error else ""
+            if self.metric == METRIC_HITS:
+                line = "Web Site resource: " + url + " was hit " + ranked_at_least + str(hits) + " times" + over_by
+            else:
+                hits_at_least = "at least " if sketched and (error or ranked_at_least) else ""
+                line = "Web Site resource: " + url + " sent " + ranked_at_least + str(bytes_sent) + " bytes" + \
+                       over_by + " in " + hits_at_least + str(hits) + " hits"
+            yield ReportRecord('resource', {'url': url, 'hits': hits, 'bytes_sent': bytes_sent, 'error': error},
+                               line + " \n")
+
+    def finalize(self):
+        return ''.join(record.text for record in self.records())
+
+
+# Accumulates the number of requests made by each distinct ip on each date, which
+# AnaPyzerAnalyzer.ip_connection_report groups by country. Only a count is kept for each ip of each date.
+# The date of each row is worked out from its epoch seconds, as for the connections per hour, or is the text of its
+# date in a log without times
+class IpConnectionsAccumulator(Accumulator):
+
+    # Constructor
+    def __init__(self):
+        super().__init__()
+        self._ip_connections = {}
+
+    def _update(self, parsed_log, start):
+        ip_connections = self._ip_connections
+        local_epochs = _local_epochs(parsed_log, start)
+        date_codes, date_table = column_codes(parsed_log, 'date', start)
+        ip_codes, ip_table = column_codes(parsed_log, 'client-ip', start)
+        date_symbols = date_table.symbols
+        ip_symbols = ip_table.derived('str', str)
+
+        for date_code, ip_code, count in _date_ip_counts(date_codes, local_epochs, ip_codes):
+            date_connections = ip_connections.setdefault(date_symbols[date_code], {})
+            user_ip_address = ip_symbols[ip_code]
+            if user_ip_address in date_connections:
+                date_connections[user_ip_address] += count
+            else:
+                date_connections[user_ip_address] = count
+
+    # Returns a dictionary of each date to a dictionary of each ip seen on that date to its number of requests
+    def finalize(self):
+        return {date: dict(date_connections) for date, date_connections in self._ip_connections.items()}
+
+
+# Accumulates the sessions of each client, the connection length report of
+# AnaPyzerAnalyzer.get_connection_length_report. A client is an ip, or an ip and a user agent if by_user_agent is
+# set, and a session is a run of the client's requests with no more than gap_seconds between one request and the
+# next. The requests of other clients in between do not split a session.
+# The rows of each batch are sorted by client and time once, and folded into the open session of each client.
+# The open sessions are carried over from batch to batch, and a session is closed once a later request of its client
+# comes more than gap_seconds after its end. A request in a later batch that comes before the start of its client's
+# open session, as in merged or out of order logs, is folded into the closed session it falls in or next to, or
+# starts a closed session of its own, so the sessions are the same however the log is split into batches.
+# Rows without a time are left out
+class SessionAccumulator(Accumulator):
+
+    # Constructor
+    def __init__(self, gap_seconds=SESSION_GAP_SECONDS, by_user_agent=False):
+        super().__init__()
+        self.gap_seconds = gap_seconds
+        self.by_user_agent = by_user_agent
+        self._ips = ColumnRecoder()
+        self._user_agents = ColumnRecoder()
+        # The closed sessions of each client in time order, and the session each client has open, which is its
+        # latest, as [start, end, requests, bytes]
+        self._sessions = {}
+        self._open_sessions = {}
+
+    def _update(self, parsed_log, start):
+        ips = parsed_log.column('client-ip')
+        epochs = parsed_log.epoch_column()
+        if ips is None or epochs is None:
+            return
+        epochs = epochs.values(start)
+        row_count = len(epochs)
+
+        # Each client is a single integer code: its ip code, followed by its user agent code
+        clients = self._ips.codes(ips, start)
+        user_agents = parsed_log.column('user-agent')
+        if self.by_user_agent and user_agents is not None:
+            clients = [ip_code << 32 | user_agent_code
+                       for ip_code, user_agent_code in zip(clients, self._user_agents.codes(user_agents, start))]
+        elif self.by_user_agent:
+            clients = [ip_code << 32 for ip_code in clients]
+
+        bytes_codes = column_codes(parsed_log, 'bytes-sent', start)
+        if bytes_codes is None:
+            bytes_sent = itertools.repeat(0, row_count)
+        else:
+            # each distinct bytes sent value is only converted to a number once
+            bytes_sent = map(bytes_codes[1].derived('bytes', _bytes_value).__getitem__, bytes_codes[0])
+        rows = sorted((client, epoch, row_bytes) for client, epoch, row_bytes in zip(clients, epochs, bytes_sent)
+                      if epoch != MISSING_EPOCH)
+
+        sessions = self._sessions
+        open_sessions = self._open_sessions
+        gap_seconds = self.gap_seconds
+        for client, client_rows in itertools.groupby(rows, operator.itemgetter(0)):
+            session = open_sessions.get(client)
+            for _, epoch, row_bytes in client_rows:
+                if session is not None and epoch < session[0]:
+                    self._add_earlier_request(client, epoch, row_bytes)
+                    continue
+                if session is None or epoch - session[1] > gap_seconds:
+                    if session is not None:
+                        sessions.setdefault(client, []).append(session)
+                    session = [epoch, epoch, 0, 0]
+                    open_sessions[client] = session
+                if epoch > session[1]:
+                    session[1] = epoch
+                session[2] += 1
+                session[3] += row_bytes
+
+    # Adds a request of a client that comes before the start of its open session to the session it falls in, or to
+    # the session that it is no more than gap_seconds from, or else to a new closed session. A session that is then no
+    # more than gap_seconds from the next one is joined to it, keeping the later one, so the open session stays open
+    def _add_earlier_request(self, client, epoch, row_bytes):
+        gap_seconds = self.gap_seconds
+        timeline = self._sessions.get(client, []) + [self._open_sessions[client]]
+        index = bisect.bisect_right([session[0] for session in timeline], epoch) - 1
+        if index >= 0 and epoch - timeline[index][1] <= gap_seconds:
+            session = timeline[index]
+            session[1] = max(session[1], epoch)
+        elif timeline[index + 1][0] - epoch <= gap_seconds:
+            index += 1
+            session = timeline[index]
+            session[0] = epoch
+        else:
+            index += 1
+            session = [epoch, epoch, 0, 0]
+            timeline.insert(index, session)
+        session[2] += 1
+        session[3] += row_bytes
+
+        for index in [index, index - 1]:
+            if 0 <= index < len(timeline) - 1 and timeline[index + 1][0] - timeline[index][1] <= gap_seconds:
+                earlier = timeline.pop(index)
+                later = timeline[index]
+                later[0] = earlier[0]
+                later[1] = max(later[1], earlier[1])
+                later[2] += earlier[2]
+                later[3] += earlier[3]
+        self._sessions[client] = timeline[:-1]
+
+    # Returns a list of the (ip, user agent, start, end, requests, bytes sent) of every session, closed or still
+    # open, in the order their clients were first seen and then in time order. start and end are epoch seconds, and
+    # the user agent is None unless the sessions are by user agent
+    def sessions(self):
+        ip_symbols = self._ips.symbol_table.symbols
+        user_agent_symbols = self._user_agents.symbol_table.symbols
+        sessions = []
+        for client, open_session in self._open_sessions.items():
+            if self.by_user_agent:
+                ip = ip_symbols[client >> 32]
+                user_agent_code = client & 0xffffffff
+                user_agent = user_agent_symbols[user_agent_code] if user_agent_code < len(user_agent_symbols) \
+                    else None
+            else:
+                ip = ip_symbols[client]
+                user_agent = None
+            for session in self._sessions.get(client, []) + [open_session]:
+                sessions.append((ip, user_agent, session[0], session[1], session[2], session[3]))
+        return sessions
+
+    # Yields a record for each session of the report
+    def records(self):
+        for ip, user_agent, start, end, requests, bytes_sent in self.sessions():
+            client = str(ip) if user_agent is None else str(ip) + " (" + str(user_agent) + ")"
+            start_text = _epoch_text(start)
+            end_text = _epoch_text(end)
+            yield ReportRecord('session', {'ip': ip, 'user_agent': user_agent, 'requests': requests,
+                                           'seconds': end - start, 'bytes_sent': bytes_sent, 'start': start_text,
+                                           'end': end_text},
+                               "IP Address: " + client + ": " + str(requests) + " request(s) over " + str(end - start) +
+                               " second(s), " + str(bytes_sent) + " bytes sent, from " + start_text + " to " +
+                               end_text + "\n\n")
+
+    def finalize(self):
+        return ''.join(record.text for record in self.records())
+
+
+# Returns epoch seconds as a UTC date and time in the W3C format
+def _epoch_text(epoch):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(epoch))
+
+
+# Returns a number of the suspicious activity report as a word if it is a small whole number
+def _number_text(number):
+    if number == int(number) and 0 <= number < len(_NUMBER_WORDS):
+        return _NUMBER_WORDS[int(number)]
+    return str(number)
+
+
+# Returns the sorted list of the bursts of a partition of the ips, each an ip code and a resource code packed as
+# ip code << url_bits | resource code, for every ip that hit a resource more than max_hits times within
+# window_seconds seconds. The rows are given as arrays of their ip codes, resource codes and epochs, and only the rows
+# whose ip code leaves a remainder of partition when divided by partition_count are searched. The rows of the
+# ignored_codes resources or without a time are skipped.
+# Each row is packed into a single integer key of its ip, its resource and its time from first_time, so a single sort
+# puts the rows of each ip and resource together in time order. The time field of time_bits bits is wide enough that
+# two rows of different ips or resources are always further apart than the window.
+# This runs inside a worker process for each partition of the ips, so it takes only picklable arguments, and each
+# worker picks the rows of its own partition out of the arrays of every row in the same pass that packs their keys
+def _find_partition_bursts(ip_codes, url_codes, epochs, partition, partition_count, ignored_codes, first_time,
+                           url_bits, time_bits, max_hits, window_seconds):
+    if partition_count == 1:
+        keys = [((ip_code << url_bits | url_code) << time_bits) | (epoch - first_time)
+                for ip_code, url_code, epoch in zip(ip_codes, url_codes, epochs)
+                if epoch != MISSING_EPOCH and url_code not in ignored_codes]
+    else:
+        keys = [((ip_code << url_bits | url_code) << time_bits) | (epoch - first_time)
+                for ip_code, url_code, epoch in zip(ip_codes, url_codes, epochs)
+                if ip_code % partition_count == partition and epoch != MISSING_EPOCH and
+                url_code not in ignored_codes]
+    keys.sort()
+    return sorted({key >> time_bits for key, earlier_key in zip(itertools.islice(keys, max_hits, None), keys)
+                   if key - earlier_key < window_seconds})
+
+
+# Accumulates the resources that each ip hit more than max_hits times within window_seconds seconds, the result of
+# AnaPyzerAnalyzer.malicious_activity_report.
+# Every row is kept as an ip code, a resource code and its epoch seconds in compact arrays, encoded by the
+# accumulator's own ColumnRecoders so batches parsed with different symbol tables can be folded in. finalize() sorts
+# the rows once by ip, resource and time, after which a run of more than max_hits hits within the window is a row
+# whose time is less than window_seconds after the time of the row max_hits places before it, for the same ip and
+# resource. The thresholds are only read by finalize(), so they can be changed between calls.
+# The ips do not depend on one another, so if worker_count is more than 1 the ips are split into that many partitions
+# by the remainders of their codes and each partition is searched in a process of its own. The ip codes are numbered
+# from 0 in the order the ips were first seen, so the remainders spread the ips evenly over the partitions
+class SuspiciousActivityAccumulator(Accumulator):
+
+    # Constructor
+    def __init__(self, max_hits=SUSPICIOUS_MAX_HITS, window_seconds=SUSPICIOUS_WINDOW_SECONDS,
+                 ignored_urls=SUSPICIOUS_IGNORED_URLS, worker_count=1):
+        super().__init__()
+        self.max_hits = max_hits
+        self.window_seconds = window_seconds
+        self.ignored_urls = ignored_urls
+        self.worker_count = worker_count
+        self._ips = ColumnRecoder()
+        self._urls = ColumnRecoder()
+        self._ip_codes = array.array('I')
+        self._url_codes = array.array('I')
+        self._epochs = array.array('q')
+
+    def _update(self, parsed_log, start):
+        ips = parsed_log.column('client-ip')
+        urls = parsed_log.column('uri-stem')
+        epochs = parsed_log.epoch_column()
+        if ips is None or urls is None or epochs is None:
+            return
+        self._ip_codes.fromlist(self._ips.codes(ips, start))
+        self._url_codes.fromlist(self._urls.codes(urls, start))
+        self._epochs.extend(epochs.values(start))
+
+    # Returns a dictionary of the code of each ip that hit a resource more than max_hits times within the window to
+    # the sorted list of those resources
+    def _find_bursts(self):
+        url_symbols = self._urls.symbol_table.symbols
+        ignored_codes = frozenset(code for code, url in enumerate(url_symbols)
+                                  if url is None or url in self.ignored_urls)
+        first_time = min(filter(MISSING_EPOCH.__ne__, self._epochs), default=None)
+        if first_time is None:
+            return {}
+
+        url_bits = len(url_symbols).bit_length()
+        time_bits = max((max(self._epochs) - first_time).bit_length(), int(self.window_seconds).bit_length()) + 1
+        parameters = (ignored_codes, first_time, url_bits, time_bits, self.max_hits, self.window_seconds)
+        worker_count = min(self.worker_count, len(self._ips.symbol_table))
+        if worker_count <= 1:
+            bursts = _find_partition_bursts(self._ip_codes, self._url_codes, self._epochs, 0, 1, *parameters)
+        else:
+            # Every worker is sent the arrays of all the rows and picks out its own partition, so the only serial work
+            # is copying the compact arrays to the workers
+            with concurrent.futures.ProcessPoolExecutor(max_workers=worker_count) as executor:
+                futures = [executor.submit(_find_partition_bursts, self._ip_codes, self._url_codes, self._epochs,
+                                           partition, worker_count, *parameters)
+                           for partition in range(0, worker_count)]
+                # The partitions have no ips in common, so their bursts are put back in the order of a single sort
+                bursts = sorted(itertools.chain.from_iterable(future.result() for future in futures))
+
+        url_mask = (1 << url_bits) - 1
+        bursts_per_ip = {}
+        for burst in bursts:
+            bursts_per_ip.setdefault(burst >> url_bits, []).append(url_symbols[burst & url_mask])
+        return {ip_code: sorted(urls) for ip_code, urls in bursts_per_ip.items()}
+
+    # Yields the records of the report of every ip that hit a resource more than max_hits times within the window,
+    # in the order the ips were first seen: a HEADING for each ip, followed by a record for each of its resources
+    def records(self):
+        ip_symbols = self._ips.symbol_table.symbols
+        burst_text = ("  was accessed more than " + _number_text(self.max_hits) + " times within " +
+                      _number_text(self.window_seconds) + (" second" if self.window_seconds == 1 else " seconds") +
+                      " by ")
+        for ip_code, urls in sorted(self._find_bursts().items()):
+            ip = str(ip_symbols[ip_code])
+            yield ReportRecord(HEADING, {'ip': ip}, "Malicious activity detected from " + ip + ":\n")
+            for i, url in enumerate(urls):
+                # The resources of each ip are followed by a blank line
+                yield ReportRecord('burst', {'ip': ip, 'url': url, 'max_hits': self.max_hits,
+                                             'window_seconds': self.window_seconds},
+                                   url + burst_text + ip + ("\n\n" if i == len(urls) - 1 else "\n"))
+
+    # Returns the report of every ip that hit a resource more than max_hits times within the window, in the order
+    # the ips were first seen
+    def finalize(self):
+        return ''.join(record.text for record in self.records())
@@ -2,6 +2,15 @@
 import re
 import pathlib
 import csv
+# Import the ParsedLog container that parse results are stored in
+from anapyzerparsedlog import ParsedLog
+# Import the accumulators that analyses are built up in
+from anapyzeraccumulators import ConnectionsPerHourAccumulator, WebPagesAccumulator, IpConnectionsAccumulator
+from anapyzeraccumulators import SuspiciousActivityAccumulator, SUSPICIOUS_MAX_HITS, SUSPICIOUS_WINDOW_SECONDS
+from anapyzeraccumulators import SUSPICIOUS_IGNORED_URLS, SessionAccumulator, SESSION_GAP_SECONDS
+from anapyzeraccumulators import WEB_PAGES_TOP_K, METRIC_HITS, check_web_pages_metric
+# Import the sinks that the records of reports are written to
+from anapyzerreport import TextSink, write_report
 
 # The AnaPyzerAnalyzer class contains all methods that are used to process information into a displayable form
 # from logs created by AnaPyzerParser object methods.
@@ -11,129 +20,50 @@ class AnaPyzerAnalyzer:
     def __init__(self):
         self._known_ips = {}
 
+    # malicious_activity_report reports every ip that hit the same resource more than max_hits times within
+    # window_seconds seconds, along with those resources. Hits of the ignored_urls are not reported.
+    # The rows are sorted by ip, resource and time once, so the report takes O(n log n) time for n lines, see
+    # SuspiciousActivityAccumulator. The rows are kept with the parsed log, so only rows added since the last call
+    # are read again. The ips are analyzed in worker_count processes, each taking a partition of them.
+    # If sink is given, the records of the report are written to it as they are made, see anapyzerreport, and the
+    # number of records is returned instead of the text of the report
     @staticmethod
-    def malicious_activity_report(parsed_log):
-        ip_address_log_info_dict = {}
-        # Goes through parsed log and puts a list lists timestamps(datetime)
-        # and urls into a dictionary with the relevant ip as the key
-        for entry in range(0, parsed_log['length']):
-            log_entry_ip = parsed_log[entry][parsed_log['client-ip']]
-            if log_entry_ip in ip_address_log_info_dict:
-                ip_address_log_info_dict[log_entry_ip]['timestamps'].append(parsed_log[entry][parsed_log['date']] + parsed_log[entry][parsed_log['timestamp']])
-                ip_address_log_info_dict[log_entry_ip]['urls'].append(parsed_log[entry][parsed_log['uri-stem']])
-            else:
-                ip_address_log_info_dict[log_entry_ip] = {
-                    'timestamps': [parsed_log[entry][parsed_log['date']] + parsed_log[entry][parsed_log['timestamp']]],
-                    'urls': [parsed_log[entry][parsed_log['uri-stem']]]
-                }
-        # initializes report output variable
-        report_output = ""
-
-        # loops through each ip in the dictionary and performs calculations on the relvant timestamps and urls
-        for ip in ip_address_log_info_dict:
-            # initialize variables needed for calculations
-            malicious = False
-            attempts = 1
-            counter = 0
-            current_timestamp = 0
-            current_url = 1
-            current_index = 0
-            timestamps = ip_address_log_info_dict[ip]['timestamps']
-            urls = ip_address_log_info_dict[ip]['urls']
-            # loops through timestamps and converts eacn timestamp to a numerical value
-            for timestamp in timestamps:
-                temp = ""
-                for c in timestamp:
-                    if c.isdigit():
-                        temp += c
-                timestamps[current_index] = temp
-                current_index += 1
-            timestamps.sort()
-            urls.sort()
-            url_attempts = []
-            # loops through urls and checks if the same url has been accessed more than 5 times by one ip
-            # If so sets boolean variable malicious to true
-            for url in urls:
-                try:
-                    if url == urls[current_url]:
-                        attempts += 1
-                        current_url += 1
-                        if attempts > 5 and url not in url_attempts:
-                            url_attempts.append(url)
-                            malicious = True
-                    else:
-                        current_url += 1
-                        attempts = 1
-
-                except IndexError:
-                    break
-                current_index = 0
-            # loops through timestamps and performs calculations to determine if a malicious attempt has been made
-            for timestamp in timestamps:
-                # go forward looking for timestamps within 1 secs
-                if (int(timestamp) - int(timestamps[current_timestamp])) < 1:
-                    counter += 1
-                else:
-                    current_timestamp = current_index
-                    counter = 0
-                    # go backward looking for timestamps within 1 secs
-                    for i in range(1, 10):
-                        try:
-                            if (int(timestamps[current_timestamp]) - int(timestamps[current_timestamp - i])) < 1:
-                                counter += 1
-                        except IndexError:
-                            break
-                # if website has been accessed 5 or more times and malicious is set to true,
-                # adds ip and relevant urls accessed to report_output
-                if counter >= 5 and malicious:
-                    report_output += "Malicious activity detected from " + ip + ":\n"
-                    for url in url_attempts:
-                        if url != "/":
-                            report_output += url + "  was accessed more than five times within one second by " + ip + "\n"
-                    malicious = False
-                    report_output += "\n"
-                current_index += 1;
-        return report_output
+    def malicious_activity_report(parsed_log, max_hits=SUSPICIOUS_MAX_HITS, window_seconds=SUSPICIOUS_WINDOW_SECONDS,
+                                  ignored_urls=SUSPICIOUS_IGNORED_URLS, worker_count=1, sink=None):
+        parsed_log = ParsedLog.coerce(parsed_log)
+        if parsed_log is None:
+            return None
+        accumulator = parsed_log.aggregate('suspicious-activity', SuspiciousActivityAccumulator)
+        accumulator.max_hits = max_hits
+        accumulator.window_seconds = window_seconds
+        accumulator.ignored_urls = ignored_urls
+        accumulator.worker_count = worker_count
+        return _report(accumulator, sink)
 
     # get_connections_per_hour takes in a log parsed by the above parse_w3c_tolist method
     # and returns a list containing how many unique ip connections were present during each hour of the day
     # this parsed list can be used with the plot_hourly_connections method
-    @staticmethod
-    def get_connections_per_hour(parsed_log):
-        connections_per_hour_table = {}
-        print(parsed_log)
+    # If precision is given, the unique ips are counted approximately in a HyperLogLog sketch of that precision
+    # for each hour, see ConnectionsPerHourAccumulator.
+    # The counts are kept with the parsed log, so only rows added since the last call are counted again
+    @classmethod
+    def get_connections_per_hour(cls, parsed_log, precision=None):
+        parsed_log = ParsedLog.coerce(parsed_log)
         if parsed_log is None:
             return None
+        return parsed_log.aggregate(_connections_per_hour_name(precision),
+                                    lambda: ConnectionsPerHourAccumulator(precision)).finalize()
 
-        i = 0
-        date = parsed_log[i][parsed_log['date']]
-        connections_per_hour_table[date] = {}
-        while i < parsed_log['length']:
-            # iterate through the ip addresses recorded
-            if parsed_log[i][parsed_log['date']] != date:
-                date = parsed_log[i][parsed_log['date']]
-                connections_per_hour_table[date] = {}
-
-            time_string = str(parsed_log[i][parsed_log['timestamp']])
-            user_ip_address = str(parsed_log[i][parsed_log['client-ip']])
-            hours = time_string[:2]
-
-            if connections_per_hour_table[date].get(hours):
-                connections_per_hour_table[date][hours] += [user_ip_address]
-            else:
-                connections_per_hour_table[date][hours] = [user_ip_address]
-
-            i += 1
-
-        for date in connections_per_hour_table:
-            for time in connections_per_hour_table[date]:
-                ip_count = len(set(connections_per_hour_table[date][time]))
-                connections_per_hour_table[date][time] = ip_count
-
-        connections_per_hour_table['xlabel'] = "Hour of Day"
-        connections_per_hour_table['ylabel'] = "Unique IPs Recorded"
-        connections_per_hour_table['title'] = "Connections Per Hour"
-        return connections_per_hour_table
+    # stream_connections_per_hour produces the same result as get_connections_per_hour from an iterable of
+    # parsed log batches, such as the ones yielded by AnaPyzerParser.iter_w3c_batches.
+    # Only the distinct ips seen in each hour, or their sketches, are kept, so memory does not grow with the number
+    # of lines
+    @staticmethod
+    def stream_connections_per_hour(batches, precision=None):
+        accumulator = ConnectionsPerHourAccumulator(precision)
+        for parsed_log in batches:
+            accumulator.update(parsed_log)
+        return accumulator.finalize()
 
     # The plot_connections method take a log formatted by the get_connections_per_hour method
     @staticmethod
@@ -143,46 +73,67 @@ class AnaPyzerAnalyzer:
             for log in connections_log[date]:
                 print(str(connections_log[date][log]) + " unique connections found at " + log + ":00")
 
+    # get_connection_length_report reports the sessions of each client ip, or of each ip and user agent if
+    # by_user_agent is set, with the number of requests, the bytes sent and the duration of each. A session ends when
+    # the client makes no request for more than gap_seconds, see SessionAccumulator.
+    # The sessions are kept with the parsed log, so only rows added since the last call are read again.
+    # If sink is given, the records of the report are written to it, as for malicious_activity_report
+    @classmethod
+    def get_connection_length_report(cls, parsed_log, gap_seconds=SESSION_GAP_SECONDS, by_user_agent=False,
+                                     sink=None):
+        parsed_log = ParsedLog.coerce(parsed_log)
+        name = 'connection-length'
+        if gap_seconds != SESSION_GAP_SECONDS or by_user_agent:
+            name += '-' + str(gap_seconds) + ('-user-agent' if by_user_agent else '')
+        return _report(parsed_log.aggregate(name, lambda: SessionAccumulator(gap_seconds, by_user_agent)), sink)
+
+    # stream_connection_length_report produces the same report as get_connection_length_report from an iterable
+    # of parsed log batches, carrying the open session of each client over from one batch to the next
     @staticmethod
-    def get_connection_length_report(parsed_log):
-
-        ip_connection_time = {}
-        i = 0
-        connection_time = 0
-        current_ip = ''
-
-        while i < parsed_log['length']:
-
-            # Check that the IP address hasn't changed
-            if current_ip == parsed_log[i][parsed_log['client-ip']]:
-                connection_time += 1
-
-            else:
-                if i > 0:
-                    connection_time += 1
-                    ip_end_time = parsed_log[i - 1][parsed_log['timestamp']]
-                    info_array = [connection_time, ip_end_time]
-
-                    if ip_connection_time.get(current_ip):
-                        ip_connection_time[current_ip].append(info_array)
-
-                    else:
-                        ip_connection_time[current_ip] = [info_array]
-
-                current_ip = parsed_log[i][parsed_log['client-ip']]
-
-                # reset connection_time if ip has changed
-                connection_time = 0
-
-            i += 1
-        output = ""
-        for ip in ip_connection_time:
-            # time_sum = 0  Dan unused variable
-            for info in ip_connection_time[ip]:
-                output += "IP Address: " + ip + ": " + str(info[0]) + " request(s) " + " at: " + str(info[1]) + "\n\n"
-
-        return output
-
+    def stream_connection_length_report(batches, gap_seconds=SESSION_GAP_SECONDS, by_user_agent=False, sink=None):
+        accumulator = SessionAccumulator(gap_seconds, by_user_agent)
+        for parsed_log in batches:
+            accumulator.update(parsed_log)
+        return _report(accumulator, sink)
+
+    # Returns a dictionary of the name of each analysis to the function that creates its accumulator, the function
+    # that turns the accumulator into the analysis result and the name the accumulator is kept under in a parsed
+    # log's aggregates. precision is the precision of the approximate unique ip counts of the connections per hour
+    def _analyses(self, precision=None):
+        return {
+            'connections-per-hour': (lambda: ConnectionsPerHourAccumulator(precision),
+                                     ConnectionsPerHourAccumulator.finalize, _connections_per_hour_name(precision)),
+            'ip-connections': (IpConnectionsAccumulator,
+                               lambda accumulator: self._country_code_report(accumulator.finalize()),
+                               'ip-connections'),
+            'web-pages': (WebPagesAccumulator, WebPagesAccumulator.finalize, 'web-pages'),
+            'suspicious-activity': (SuspiciousActivityAccumulator, SuspiciousActivityAccumulator.finalize,
+                                    'suspicious-activity'),
+            'connection-length': (SessionAccumulator, SessionAccumulator.finalize, 'connection-length'),
+        }
+
+    # get_analyses returns a dictionary of each of the named analyses to its result for a parsed log, the same as
+    # the result of its own analyzer method. The accumulators are kept with the parsed log, so every analysis
+    # reads only the rows added since it was last asked for
+    def get_analyses(self, parsed_log, names, precision=None):
+        parsed_log = ParsedLog.coerce(parsed_log)
+        analyses = self._analyses(precision)
+        results = {}
+        for name in names:
+            create, result, aggregate_name = analyses[name]
+            results[name] = result(parsed_log.aggregate(aggregate_name, create))
+        return results
+
+    # stream_analyses produces the same results as get_analyses from an iterable of parsed log batches, folding
+    # each batch into the accumulator of every analysis as it is read, so all of the analyses of a log are made
+    # in a single pass over it
+    def stream_analyses(self, batches, names, precision=None):
+        analyses = self._analyses(precision)
+        accumulators = {name: analyses[name][0]() for name in names}
+        for parsed_log in batches:
+            for accumulator in accumulators.values():
+                accumulator.update(parsed_log)
+        return {name: analyses[name][1](accumulator) for name, accumulator in accumulators.items()}
 
     def _lookup_ipv4(self, ip):
 
@@ -255,26 +206,22 @@ class AnaPyzerAnalyzer:
             self._known_ips[ip] = "INV"
             return "INV"
 
+    # The connection counts of each ip are kept with the parsed log, so only rows added since the last call are
+    # counted again
     def ip_connection_report(self, parsed_log):
-        ip_connections = {}
-
-        i = 0
-        date = parsed_log[i][parsed_log['date']]
-        ip_connections[date] = {}
-        # iterate through data of each date recorded
-        while i < parsed_log['length']:
-            # iterate through the ip addresses recorded
-            if parsed_log[i][parsed_log['date']] != date:
-                date = parsed_log[i][parsed_log['date']]
-                ip_connections[date] = {}
-
-            user_ip_address = str(parsed_log[i][parsed_log['client-ip']])
-
-            if ip_connections[date].get(user_ip_address):
-                ip_connections[date][user_ip_address] += 1
-            else:
-                ip_connections[date][user_ip_address] = 1
-            i += 1
+        parsed_log = ParsedLog.coerce(parsed_log)
+        return self._country_code_report(parsed_log.aggregate('ip-connections', IpConnectionsAccumulator).finalize())
+
+    # stream_ip_connection_report produces the same result as ip_connection_report from an iterable of parsed
+    # log batches, keeping only a connection count for each distinct ip of each date
+    def stream_ip_connection_report(self, batches):
+        accumulator = IpConnectionsAccumulator()
+        for parsed_log in batches:
+            accumulator.update(parsed_log)
+        return self._country_code_report(accumulator.finalize())
+
+    # Groups the ips seen on each date by their country code, counting the unique ips from each country
+    def _country_code_report(self, ip_connections):
         cc_report = {}
         for date in ip_connections:
             cc_report[date] = {}
@@ -291,43 +238,41 @@ class AnaPyzerAnalyzer:
         cc_report['title'] = "Connections by Country"
 
         return cc_report
-    
+
     # get_web_pages takes in a log parsed by parse_w3c_tolist method
+    # and reports the top_k resources ranked by metric, METRIC_HITS or METRIC_BYTES. If capacity is given, only that
+    # many resources are counted at once in a Space-Saving sketch, see WebPagesAccumulator.
+    # The hit counts are kept with the parsed log, so only rows added since the last call are counted again.
+    # If sink is given, the records of the report are written to it, as for malicious_activity_report
+    @classmethod
+    def get_web_pages(cls, parsed_log, top_k=WEB_PAGES_TOP_K, metric=METRIC_HITS, capacity=None, sink=None):
+        check_web_pages_metric(metric)
+        name = 'web-pages' if capacity is None else 'web-pages-' + metric + '-' + str(capacity)
+        accumulator = ParsedLog.coerce(parsed_log).aggregate(name,
+                                                             lambda: WebPagesAccumulator(top_k, metric, capacity))
+        accumulator.top_k = top_k
+        accumulator.metric = metric
+        return _report(accumulator, sink)
+
+    # stream_web_pages produces the same report as get_web_pages from an iterable of parsed log batches,
+    # keeping only a hit and byte count for each distinct resource, or for capacity resources
     @staticmethod
-    def get_web_pages(parsed_log):
-        web_page_dictionary = {}
-        web_page_bytes = {}
-
-        for entry in range(0, parsed_log['length']):
-            url = parsed_log[entry][parsed_log['uri-stem']]
-            # print("resource " + url)
-            bytes_received = parsed_log[entry][parsed_log['bytes-received']]
-            # print("sent " + bytes_sent)
-            #referrer = parsed_log[entry][parsed_log['referrer']]
-            #print("referrer : " + referrer)
-            if url in web_page_dictionary:
-                web_page_dictionary[url] += 1
-                web_page_bytes[url] += int(bytes_received)
-            else:
-                web_page_dictionary[url] = 1
-                web_page_bytes[url] = int(bytes_received)
-                website_report = "Web Site Resource Report has " + str(len(web_page_dictionary)) + " entries \n\n "
-                website_report += "The top 50 resources are : \n\n"
-
-        # for url, count in web_page_dictionary.items():
-        i = 1
-        for url,count in sorted(web_page_dictionary.items(),key = lambda t:t[1], reverse=True):
-            website_report += "Web Site resource: " + url + " was hit " + str(count) + " times \n"
-            i += 1
-            if i > 50:
-                break
-        return website_report
-
+    def stream_web_pages(batches, top_k=WEB_PAGES_TOP_K, metric=METRIC_HITS, capacity=None, sink=None):
+        accumulator = WebPagesAccumulator(top_k, metric, capacity)
+        for parsed_log in batches:
+            accumulator.update(parsed_log)
+        return _report(accumulator, sink)
+
+    # Writes the rows of a parsed log to out_file as CSV. The fields a row does not have, such as the fields of the
+    # other segments of a W3C log whose #Fields changed, are written as '-', the way the logs write an empty field,
+    # so every row has a field for each column of the log
     @classmethod
     def write_parsed_log_to_csv(cls, parsed_log, out_file):
-        for line in range(0, parsed_log['length']):
-            line_data = parsed_log[line]
+        parsed_log = ParsedLog.coerce(parsed_log)
+        width = len(parsed_log.schema.columns)
+        for line_data in parsed_log.rows():
             out_line = ""
+            line_data = ['-' if value is None else value for value in line_data] + ['-'] * (width - len(line_data))
             for i in range(0, len(line_data)):
                 if i < len(line_data) - 1:
                     if ',' in line_data[i]:
@@ -337,8 +282,26 @@ class AnaPyzerAnalyzer:
             out_file.write(out_line + '\n')
         return True
 
+    # Writes a report to out_file as text, either the text of the report or an iterable of its ReportRecords
     @classmethod
     def save_report_to_file(cls, in_data, out_file):
-        for line in in_data:
-            out_file.write(line + '\n')
+        if isinstance(in_data, str):
+            out_file.write(in_data)
+        else:
+            write_report(in_data, TextSink(out_file))
         return True
+
+
+# Returns the text of the report of an accumulator, or writes the records of the report to sink and returns the number
+# of records if sink is given
+def _report(accumulator, sink):
+    if sink is None:
+        return accumulator.finalize()
+    return write_report(accumulator.records(), sink)
+
+
+# Returns the name that the connections per hour of the given precision are kept under in a parsed log's aggregates
+def _connections_per_hour_name(precision):
+    if precision is None:
+        return 'connections-per-hour'
+    return 'connections-per-hour-' + str(precision)
@@ -0,0 +1,217 @@
+# Import the hashlib library to fingerprint log files and name cache entries
+import hashlib
+# Import the os library to read file sizes and modification times and to replace cache entries atomically
+import os
+# Import the pathlib library for cross platform file path abstraction
+import pathlib
+# Import the pickle library to store parsed logs on disk
+import pickle
+
+# The version of the cache entry layout. Entries written with a different version are ignored
+CACHE_VERSION = 5
+# The file name suffix of a cache entry
+CACHE_SUFFIX = '.cache'
+# The directory the parse cache is stored in, unless another one is given
+DEFAULT_CACHE_DIR = pathlib.Path.home() / '.anapyzer' / 'cache'
+# The total size in bytes that the cache entries are kept under
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024
+# The environment variable that turns off the parse cache of the application when it is set to anything but empty
+CACHE_DISABLED_VARIABLE = 'ANAPYZER_NO_CACHE'
+# The number of bytes at the start and at the end of a log file that are hashed to fingerprint its contents
+FINGERPRINT_SIZE = 64 * 1024
+
+# The ways a file can have changed since its identity was taken, see compare_file_identity()
+FILE_UNCHANGED = 'unchanged'
+FILE_APPENDED = 'appended'
+FILE_CHANGED = 'changed'
+
+
+# Returns the hex digest of the bytes between the start and end offsets of an open file
+def _hash_range(log_file, start, end):
+    log_file.seek(start)
+    return hashlib.sha1(log_file.read(end - start)).hexdigest()
+
+
+# Returns the identity of the file at file_path as a dictionary of its absolute path, size, modification time,
+# inode, a fingerprint of the first and last FINGERPRINT_SIZE bytes of its contents and whether it ends with a
+# complete line. A file with the same identity as a cached one is assumed to have the same contents.
+# If size is given, the identity is of only the first size bytes of the file
+def file_identity(file_path, size=None):
+    file_path = os.path.abspath(str(file_path))
+    stat = os.stat(file_path)
+    if size is None:
+        size = stat.st_size
+    with open(file_path, 'rb') as log_file:
+        head_size = min(size, FINGERPRINT_SIZE)
+        tail_start = max(0, size - FINGERPRINT_SIZE)
+        log_file.seek(max(0, size - 1))
+        complete = size == 0 or log_file.read(1) == b'\n'
+        return {'path': file_path,
+                'size': size,
+                'mtime': stat.st_mtime_ns,
+                'inode': stat.st_ino,
+                'head': _hash_range(log_file, 0, head_size),
+                'tail': _hash_range(log_file, tail_start, size),
+                'complete': complete}
+
+
+# Compares a file with an identity taken earlier by file_identity(). Returns FILE_UNCHANGED if the file still has
+# the same identity, FILE_APPENDED if the same file has only had lines added to the end of it since, or
+# FILE_CHANGED if it was rewritten, truncated, rotated (replaced by a new file) or removed
+def compare_file_identity(identity):
+    try:
+        current_identity = file_identity(identity['path'])
+        if current_identity == identity:
+            return FILE_UNCHANGED
+        if current_identity['inode'] != identity['inode'] or current_identity['size'] <= identity['size'] \
+                or not identity['complete']:
+            return FILE_CHANGED
+        # The file has grown, check that what was there before has not changed
+        previous_identity = file_identity(identity['path'], identity['size'])
+    except OSError:
+        return FILE_CHANGED
+    if previous_identity['head'] == identity['head'] and previous_identity['tail'] == identity['tail']:
+        return FILE_APPENDED
+    return FILE_CHANGED
+
+
+# The AnaPyzerCache class stores parsed logs on disk so that logs that have already been parsed can be loaded
+# instead of being parsed again.
+# Each entry holds the ParsedLog for one set of input files parsed in one log format with one set of columns,
+# along with the parse state: a dictionary holding at least the identity of every input file, under 'identities'.
+# load() only returns an entry while every file still has the same identity, load_entry() returns it regardless,
+# so the caller can parse just the lines that were appended to a file since.
+# The cache is kept under max_size bytes by removing the least recently used entries
+class AnaPyzerCache:
+
+    # Constructor
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_CACHE_SIZE):
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.max_size = max_size
+
+    # Returns the prefix of the names of every entry for a set of input files
+    @staticmethod
+    def _paths_key(file_paths):
+        paths = [os.path.abspath(str(file_path)) for file_path in file_paths]
+        return hashlib.sha1(repr(paths).encode()).hexdigest()
+
+    # Returns the path of the entry for a set of input files parsed in a log format with the given columns
+    def _entry_path(self, file_paths, log_format, columns):
+        variant = repr((log_format, sorted(columns) if columns is not None else None))
+        variant_key = hashlib.sha1(variant.encode()).hexdigest()
+        return self.cache_dir / (self._paths_key(file_paths) + '-' + variant_key + CACHE_SUFFIX)
+
+    # Returns the cached ParsedLog for the input files parsed in the given log format, or None if there is no entry
+    # for the files or they have changed since they were cached.
+    # An entry with every column is used when there is none for the requested columns
+    def load(self, file_paths, log_format, columns=None):
+        for entry_columns in ([columns, None] if columns is not None else [None]):
+            entry = self.load_entry(file_paths, log_format, entry_columns)
+            if entry is None:
+                continue
+            state, parsed_log = entry
+            if all(compare_file_identity(identity) == FILE_UNCHANGED for identity in state['identities']):
+                return parsed_log
+            self._remove(self._entry_path(file_paths, log_format, entry_columns))
+        return None
+
+    # Returns the (parse state, ParsedLog) of the entry for the input files parsed in the given log format with
+    # the given columns, whether or not the files have changed since. Returns None if there is no readable entry
+    def load_entry(self, file_paths, log_format, columns=None):
+        entry_path = self._entry_path(file_paths, log_format, columns)
+        if not entry_path.is_file():
+            return None
+        # An entry that cannot be read, such as one written by a version of the code with classes or arguments that
+        # no longer exist, is treated as missing
+        try:
+            with open(entry_path, 'rb') as entry_file:
+                header = pickle.load(entry_file)
+                if header.get('version') != CACHE_VERSION:
+                    entry = None
+                else:
+                    entry = header['state'], pickle.load(entry_file)
+        except (OSError, EOFError, AttributeError, ImportError, KeyError, TypeError, ValueError,
+                pickle.UnpicklingError):
+            entry = None
+
+        if entry is None:
+            self._remove(entry_path)
+            return None
+        # Mark the entry as recently used
+        os.utime(entry_path)
+        return entry
+
+    # Stores the ParsedLog that was parsed from the input files in the given log format with the given columns,
+    # replacing any earlier entry for them, then removes the least recently used entries if the cache is too big.
+    # state is the parse state to store with it, the identities of the files are taken if it is not given
+    def store(self, file_paths, log_format, columns, parsed_log, state=None):
+        if state is None:
+            state = {'identities': [file_identity(file_path) for file_path in file_paths]}
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry_path = self._entry_path(file_paths, log_format, columns)
+        # Write to a temporary file first, so a partly written entry is never read
+        temp_path = entry_path.with_suffix('.tmp')
+        try:
+            with open(temp_path, 'wb') as entry_file:
+                pickle.dump({'version': CACHE_VERSION, 'state': state}, entry_file, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(parsed_log, entry_file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, entry_path)
+        finally:
+            self._remove(temp_path)
+        self._evict()
+
+    # Removes every entry for the given input files
+    def invalidate(self, file_paths):
+        if not self.cache_dir.is_dir():
+            return
+        for entry_path in self.cache_dir.glob(self._paths_key(file_paths) + '-*' + CACHE_SUFFIX):
+            self._remove(entry_path)
+
+    # Removes every entry in the cache
+    def clear(self):
+        for entry_path in self._entries():
+            self._remove(entry_path)
+
+    # Returns the total size in bytes of the entries in the cache
+    def get_size(self):
+        return sum(entry_path.stat().st_size for entry_path in self._entries())
+
+    # Returns the paths of every entry in the cache
+    def _entries(self):
+        if not self.cache_dir.is_dir():
+            return []
+        return list(self.cache_dir.glob('*' + CACHE_SUFFIX))
+
+    # Removes the least recently used entries until the cache is no bigger than max_size
+    def _evict(self):
+        entries = []
+        for entry_path in self._entries():
+            try:
+                stat = entry_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry_path))
+        entries.sort()
+
+        total_size = sum(size for mtime, size, entry_path in entries)
+        for mtime, size, entry_path in entries:
+            if total_size <= self.max_size:
+                break
+            self._remove(entry_path)
+            total_size -= size
+
+    # Removes a file from the cache directory if it exists
+    @staticmethod
+    def _remove(entry_path):
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:
+            pass
+
+
+# Returns the parse cache the application gives its model: an AnaPyzerCache in the default directory, or None if
+# the CACHE_DISABLED_VARIABLE is set in the environment
+def default_parse_cache(environ=os.environ):
+    if environ.get(CACHE_DISABLED_VARIABLE):
+        return None
+    return AnaPyzerCache()
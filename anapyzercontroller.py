@@ -5,6 +5,9 @@ from anapyzermodel import *
 
 
 class AnaPyzerController:
+    # The time in milliseconds between checks of a followed log for new lines
+    FOLLOW_POLL_INTERVAL_MS = 1000
+
     # Constructor
     # Takes a view and a model object
     def __init__(self, model, view):
@@ -12,6 +15,8 @@ class AnaPyzerController:
         self.model = model
         # Set the controller's reference to the application view object
         self.view = view
+        # The id of the scheduled check of a followed log for new lines, if there is one
+        self._follow_poll_id = None
 
     # Start the application
     def run(self):
@@ -37,6 +42,8 @@ class AnaPyzerController:
         self.view.set_file_read_option_changed_listener(self.file_read_option_changed)
         self.view.set_graph_mode_option_changed_listener(self.graph_mode_option_changed)
         self.view.set_report_mode_option_changed_listener(self.report_mode_option_changed)
+        self.view.set_follow_changed_listener(self.follow_changed)
+        self.view.set_skip_malformed_lines_changed_listener(self.skip_malformed_lines_changed)
 
     # Function for updating the state of the view based on what has been set in the model
     def update_view(self):
@@ -63,6 +70,11 @@ class AnaPyzerController:
             self.view.show_out_file_path_widgets()
             if self.model.in_file_path_is_valid() and self.model.out_file_path_is_valid():
                 self.view.enable_open_file_button()
+        elif self.model.get_file_parse_mode() == FileParseModes.REPORT_FILE:
+            self.view.show_report_mode_option_menu_widgets()
+            self.view.show_out_file_path_widgets()
+            if self.model.in_file_path_is_valid() and self.model.out_file_path_is_valid():
+                self.view.enable_open_file_button()
         
     # Listener for when the log type option menu has an item selected
     def log_type_option_changed(self, value):
@@ -84,6 +96,16 @@ class AnaPyzerController:
         self.model.set_report_mode(value)
         self.update_view()
 
+    # Handler for when the follow check button is checked or unchecked
+    def follow_changed(self, value):
+        self.model.set_follow(value)
+        if not value:
+            self._cancel_follow_poll()
+
+    # Handler for when the skip malformed lines check button is checked or unchecked
+    def skip_malformed_lines_changed(self, value):
+        self.model.set_skip_malformed_lines(value)
+
     # Function for handling when the in file "Browse..." button is pressed
     def in_file_browse_button_clicked(self):
         # Get a new file path by prompting the user with a file selection dialog
@@ -93,6 +115,12 @@ class AnaPyzerController:
 
         # Update the input file path to the one received from the user via the file dialog
         self.model.set_in_file_path(in_file_path)
+
+        # Pre-select the log type that the file appears to be
+        log_type = self.model.detect_log_type()
+        if log_type is not None:
+            self.model.set_log_type(log_type.value)
+            self.view.set_log_type(log_type.value)
         self.update_view()
 
     # Function for handling when the out file "Browse..." button is pressed
@@ -109,6 +137,7 @@ class AnaPyzerController:
     # Function for handling when the "Open" button is pressed
     def open_file_button_clicked(self):
         parse_mode = self.model.get_file_parse_mode()
+        self._cancel_follow_poll()
 
         if parse_mode == FileParseModes.GRAPH:
             try:
@@ -117,31 +146,25 @@ class AnaPyzerController:
                 self._on_error(e.message)
                 return False
 
-            # model.get_graph_data_split will check whether the graph data is split by date/time/any other delimiter
-            # and allow multiple graphs to be created if it is
-            # print(self.model.get_graph_data_split())
-            if len(self.model.get_graph_data_split()) > 0:
-                for value in self.model.get_graph_data_split():
-                    self.view.display_graph_view(self.model.get_graph_data_split_keys(value),
-                                                 self.model.get_graph_data_split_values(value),
-                                                 self.model.get_graph_data_x_label(),
-                                                 self.model.get_graph_data_y_label(),
-                                                 value)
-            else:
-                self.view.display_graph_view(self.model.get_graph_data_keys(),
-                                             self.model.get_graph_data_values(),
-                                             self.model.get_graph_data_x_label(),
-                                             self.model.get_graph_data_y_label(),
-                                             self.model.get_graph_data_title())
+            self._display_graph_data()
+            self._schedule_follow_poll()
 
         elif parse_mode == FileParseModes.REPORT:
             try:
-                self.model.create_report_data()
+                self._display_report_data()
             except AnaPyzerModelError as e:
                 self._on_error(e.message)
                 return False
 
-            self.view.display_report_view(self.model.get_report_data())
+            self._schedule_follow_poll()
+
+        elif parse_mode == FileParseModes.REPORT_FILE:
+            try:
+                if self.model.export_report():
+                    self._on_success("Saved the report successfully.")
+            except AnaPyzerModelError as e:
+                self._on_error(e.message)
+                return False
 
         elif parse_mode == FileParseModes.CSV:
             try:
@@ -151,6 +174,60 @@ class AnaPyzerController:
                 self._on_error(e.message)
                 return False
 
+    # Displays the model's current graph data in the view
+    def _display_graph_data(self):
+        # model.get_graph_data_split will check whether the graph data is split by date/time/any other delimiter
+        # and allow multiple graphs to be created if it is
+        # print(self.model.get_graph_data_split())
+        # The note is shown under every graph, such as the number of malformed lines that were skipped
+        note = self.model.get_graph_data_note()
+        if len(self.model.get_graph_data_split()) > 0:
+            for value in self.model.get_graph_data_split():
+                self.view.display_graph_view(self.model.get_graph_data_split_keys(value),
+                                             self.model.get_graph_data_split_values(value),
+                                             self.model.get_graph_data_x_label(),
+                                             self.model.get_graph_data_y_label(),
+                                             value,
+                                             note)
+        else:
+            self.view.display_graph_view(self.model.get_graph_data_keys(),
+                                         self.model.get_graph_data_values(),
+                                         self.model.get_graph_data_x_label(),
+                                         self.model.get_graph_data_y_label(),
+                                         self.model.get_graph_data_title(),
+                                         note)
+
+    # Displays the report of the model's current report mode in the view, adding it a chunk at a time as it is made
+    def _display_report_data(self):
+        self.view.open_report_view()
+        self.model.write_report_data(self.view.append_report_text)
+
+    # Schedules the next check of the log for new lines if the model is following it
+    def _schedule_follow_poll(self):
+        if self.model.get_follow():
+            self._follow_poll_id = self.view.after(AnaPyzerController.FOLLOW_POLL_INTERVAL_MS, self._follow_poll)
+
+    # Cancels the scheduled check of the log for new lines, if there is one
+    def _cancel_follow_poll(self):
+        if self._follow_poll_id is not None:
+            self.view.after_cancel(self._follow_poll_id)
+            self._follow_poll_id = None
+
+    # Checks the followed log for new lines and updates the open graphs or report if there were any
+    def _follow_poll(self):
+        self._follow_poll_id = None
+        try:
+            if self.model.poll_log_file_data():
+                if self.model.get_file_parse_mode() == FileParseModes.GRAPH:
+                    self._display_graph_data()
+                elif self.model.get_file_parse_mode() == FileParseModes.REPORT:
+                    self._display_report_data()
+        except AnaPyzerModelError as e:
+            self._on_error(e.message)
+            return
+
+        self._schedule_follow_poll()
+
     # Method to call when an error occurs
     def _on_error(self, message):
         self.view.display_error_message(message)
@@ -0,0 +1,295 @@
+# Import the compression libraries for reading rotated logs that have been compressed
+import bz2
+import gzip
+import lzma
+# Import the glob library to find the log files matched by a wildcard pattern
+import glob
+# Import the mmap library to map log files into memory instead of reading them through a text stream
+import mmap
+# Import the os library to get the size of an open file
+import os
+# Import the pathlib library for cross platform file path abstraction
+import pathlib
+# Import the queue and threading libraries to decompress logs on a background thread
+import queue
+import threading
+
+# The number of decompressed bytes the decompression thread reads at a time
+DECOMPRESS_CHUNK_SIZE = 1024 * 1024
+# The number of decompressed chunks that can be waiting to be parsed before the decompression thread waits
+DECOMPRESS_QUEUE_SIZE = 8
+
+# The number of bytes at the start of a log that are read as a sample of its lines, such as to detect its format
+SAMPLE_SIZE = 16 * 1024
+
+# The magic bytes at the start of each supported compressed file format, and the function that opens it
+_COMPRESSION_OPENERS = [(b'\x1f\x8b', gzip.open),
+                        (b'BZh', bz2.open),
+                        (b'\xfd7zXZ\x00', lzma.open)]
+
+
+# Returns the sorted list of log files at a path. The path can be a single file, a directory (every file in it
+# that is not hidden) or a glob pattern such as logs/u_ex*.log
+def expand_log_paths(path):
+    path = str(path)
+    if any(character in path for character in '*?['):
+        return sorted(file_path for file_path in glob.glob(path) if os.path.isfile(file_path))
+    log_path = pathlib.Path(path)
+    if log_path.is_dir():
+        return sorted(str(file_path) for file_path in log_path.iterdir()
+                      if file_path.is_file() and not file_path.name.startswith('.'))
+    if log_path.is_file():
+        return [path]
+    return []
+
+
+# Returns the byte offset just after the last newline in the file at file_path that is at or after the start
+# offset, or start if there is no newline after it. Lines before this offset are complete and can be parsed
+# without a later append changing them
+def complete_lines_end(file_path, start=0):
+    with open(file_path, 'rb') as log_file:
+        end = log_file.seek(0, os.SEEK_END)
+        while end > start:
+            block_start = max(start, end - DECOMPRESS_CHUNK_SIZE)
+            log_file.seek(block_start)
+            last_newline = log_file.read(end - block_start).rfind(b'\n')
+            if last_newline >= 0:
+                return block_start + last_newline + 1
+            end = block_start
+    return start
+
+
+# Returns the function that opens the file at file_path for decompression, or None if it is not compressed.
+# The format is found from the first bytes of the file instead of its suffix, so rotated logs with names like
+# access.log.1 are still recognised
+def get_compression_opener(file_path):
+    with open(file_path, 'rb') as log_file:
+        magic = log_file.read(6)
+    for prefix, opener in _COMPRESSION_OPENERS:
+        if magic.startswith(prefix):
+            return opener
+    return None
+
+
+# Returns True if the file at file_path is a gzip, bzip2 or xz compressed file
+def is_compressed(file_path):
+    return get_compression_opener(file_path) is not None
+
+
+# Returns the lines in the first size bytes of the log at file_path, decompressing it first if it is compressed.
+# A last line that was cut off by the end of the sample is left out.
+# Raises IOError if the file cannot be read or decompressed
+def read_log_sample(file_path, size=SAMPLE_SIZE):
+    opener = get_compression_opener(file_path) or open
+    try:
+        with opener(file_path, 'rb') as log_file:
+            data = log_file.read(size)
+    except (EOFError, lzma.LZMAError) as e:
+        raise IOError(None, "Could not decompress log: " + str(e), str(file_path))
+    lines = data.split(b'\n')
+    if len(data) >= size or not lines[-1]:
+        lines.pop()
+    return [str(line, 'utf-8', 'replace').rstrip('\r') for line in lines]
+
+
+# Opens a log file for parsing. Compressed logs are opened as a DecompressingLogFile, otherwise a MappedLogFile is
+# opened if memory_mapped is set (decoding only the given columns) or a text file is opened if it is not
+def open_log_file(file_path, columns=None, memory_mapped=False):
+    opener = get_compression_opener(file_path)
+    if opener is not None:
+        return DecompressingLogFile(file_path, opener)
+    if memory_mapped:
+        return MappedLogFile(file_path, columns)
+    return open(file_path, 'r')
+
+
+# The MappedLogFile class maps a log file into memory and scans it as bytes.
+# Line boundaries and field delimiters are found with find() on the mapped bytes, and fields are only decoded to
+# str when they are asked for, so the parsers can skip decoding the fields that an analysis does not need.
+# Iterating over a MappedLogFile yields each line decoded to a str, so it can also be used anywhere an open text
+# file can be used.
+# columns is the list of field names that should be decoded when the log is parsed, or None to decode every field
+class MappedLogFile:
+
+    # Constructor
+    def __init__(self, file_path, columns=None):
+        self.file_path = str(file_path)
+        self.columns = list(columns) if columns is not None else None
+        self._file = open(self.file_path, 'rb')
+        # mmap cannot map an empty file
+        if os.fstat(self._file.fileno()).st_size > 0:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)
+        else:
+            self._map = b''
+            self._view = memoryview(self._map)
+
+    # Unmaps and closes the file
+    def close(self):
+        if self._file is None:
+            return
+        self._view.release()
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Returns the mapped bytes of the file
+    def data(self):
+        return self._map
+
+    # Yields the (start, end) byte offsets of every line, not including the line ending
+    def iter_line_offsets(self):
+        data = self._map
+        size = len(data)
+        position = 0
+        while position < size:
+            end = data.find(b'\n', position)
+            if end < 0:
+                end = size
+            line_end = end
+            if line_end > position and data[line_end - 1] == 13:
+                line_end -= 1
+            yield position, line_end
+            position = end + 1
+
+    # Returns the bytes between the start and end offsets, decoded to a str
+    def decode(self, start, end):
+        return str(self._view[start:end], 'utf-8', 'replace')
+
+    # Returns the bytes between the start and end offsets
+    def line_bytes(self, start, end):
+        return self._map[start:end]
+
+    # Returns the decoded values of the space separated fields at the given positions of the line between the
+    # start and end offsets. Only the requested fields are decoded; a position that is past the end of the line or
+    # negative (a field that is not in the log) is None
+    def split_fields(self, start, end, positions):
+        data = self._map
+        view = self._view
+        last_position = max(positions, default=-1)
+        bounds = []
+        field_start = start
+        while len(bounds) <= last_position:
+            field_end = data.find(b' ', field_start, end)
+            if field_end < 0:
+                bounds.append((field_start, end))
+                break
+            bounds.append((field_start, field_end))
+            field_start = field_end + 1
+
+        values = []
+        for position in positions:
+            if 0 <= position < len(bounds):
+                field_start, field_end = bounds[position]
+                values.append(str(view[field_start:field_end], 'utf-8', 'replace'))
+            else:
+                values.append(None)
+        return values
+
+    # Iterates over every line of the file as a decoded str, including the newline like a text file would
+    def __iter__(self):
+        data = self._map
+        size = len(data)
+        position = 0
+        while position < size:
+            end = data.find(b'\n', position)
+            if end < 0:
+                end = size - 1
+            yield str(self._view[position:end + 1], 'utf-8', 'replace')
+            position = end + 1
+
+
+# The DecompressingLogFile class reads a gzip, bzip2 or xz compressed log as a stream.
+# A background thread decompresses the file a chunk at a time into a bounded queue while the lines of the chunks
+# before it are being parsed, so decompression overlaps with parsing without the whole file being decompressed
+# into memory or onto the disk. Iterating over a DecompressingLogFile yields each line as a str, like a text file
+class DecompressingLogFile:
+
+    # Constructor
+    def __init__(self, file_path, opener=None, chunk_size=DECOMPRESS_CHUNK_SIZE, queue_size=DECOMPRESS_QUEUE_SIZE):
+        self.file_path = str(file_path)
+        if opener is None:
+            opener = get_compression_opener(self.file_path)
+            if opener is None:
+                raise ValueError("Not a compressed file: " + self.file_path)
+        self._file = opener(self.file_path, 'rb')
+        self._chunk_size = chunk_size
+        self._queue = queue.Queue(queue_size)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._decompress, daemon=True)
+        self._thread.start()
+
+    # Runs on the background thread, putting decompressed chunks on the queue followed by None at the end of the
+    # file. An error while decompressing is put on the queue to be raised by the reader
+    def _decompress(self):
+        try:
+            while not self._stopped.is_set():
+                chunk = self._file.read(self._chunk_size)
+                if not chunk:
+                    break
+                self._put(chunk)
+        except (OSError, EOFError, lzma.LZMAError) as e:
+            self._put(IOError(None, "Could not decompress log: " + str(e), self.file_path))
+        self._put(None)
+
+    # Puts an item on the queue, giving up if the file is closed while waiting for space
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    # Yields the decompressed chunks of the file as bytes
+    def iter_chunks(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    # Stops the decompression thread and closes the file
+    def close(self):
+        if self._file is None:
+            return
+        self._stopped.set()
+        # Make room on the queue in case the thread is waiting to put a chunk
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Iterates over every line of the decompressed file as a str, including the newline like a text file would.
+    # Only whole lines are decoded, so a multi-byte character split between two chunks is decoded correctly
+    def __iter__(self):
+        partial = b''
+        for chunk in self.iter_chunks():
+            chunk = partial + chunk
+            last_newline = chunk.rfind(b'\n')
+            if last_newline < 0:
+                partial = chunk
+                continue
+            partial = chunk[last_newline + 1:]
+            for line in chunk[:last_newline].decode('utf-8', 'replace').split('\n'):
+                yield line + '\n'
+        if partial:
+            yield partial.decode('utf-8', 'replace')
@@ -0,0 +1,302 @@
+# Import the re library to compile a log format into a regular expression
+import re
+
+# Reference for the apache LogFormat directives:
+# https://httpd.apache.org/docs/2.4/mod/mod_log_config.html#formats
+
+# The value apache logs for a field that has no value
+_DASH = '-'
+
+# The directives of a LogFormat string: '%', any status code conditions and modifiers ('!404,500', '<' or '>'),
+# an optional {argument} and the directive letter itself, or '%%' for a literal percent sign
+_DIRECTIVE_PATTERN = re.compile(r'%(?:[<>!\d,]*)(?:\{([^}]*)\})?(?:[<>!\d,]*)([a-zA-Z%])')
+
+# The universal column name of each directive that is a single field. A name of None is matched but not kept
+_DIRECTIVE_COLUMNS = {
+    'a': 'client-ip',
+    'h': 'client-ip',
+    'A': 'server-ip',
+    'l': None,
+    'u': 'username',
+    's': 'sc-status',
+    'b': 'bytes-sent',
+    'B': 'bytes-sent',
+    'O': 'bytes-sent',
+    'I': 'bytes-received',
+    'S': 'bytes-transferred',
+    'D': 'time-taken',
+    'T': 'time-taken',
+    'v': 'host',
+    'V': 'server-name',
+    'p': 'server-port',
+    'P': 'process-id',
+    'm': 'method',
+    'U': 'uri-stem',
+    'q': 'uri-query',
+    'H': 'protocol',
+    'f': 'file-name',
+    'k': 'keepalive-requests',
+    'L': 'log-id',
+    'R': 'handler',
+    'X': 'connection-status',
+}
+
+# The universal column names of request headers that the W3C logs also record
+_HEADER_COLUMNS = {
+    'referer': 'referer',
+    'user-agent': 'user-agent',
+    'host': 'host',
+    'cookie': 'cookie',
+}
+
+# The column name prefix of the {argument} directives that are named after their argument, such as
+# %{X-Forwarded-For}i, which is stored as 'x-forwarded-for'
+_ARGUMENT_PREFIXES = {
+    'i': '',
+    'o': 'response-',
+    'e': 'env-',
+    'n': 'note-',
+    'C': 'cookie-',
+}
+
+# The regular expressions for the time, the request line, a quoted field and an unquoted field, with escaped
+# quotes allowed in the quoted fields or not. The time is split into the date, the time and the time zone, and the
+# request line into the method, the uri and the protocol, any of which may be missing ("-"), in the same way as
+# the built in apache patterns of the parser
+_TIME_PATTERN = r'\[([^:\]]+):([^ \]]+) ?([^\]]*)\]'
+_REQUEST_PATTERN = r'(?:([A-Za-z]+) )?([^" ]*)(?: ([^"]*))?'
+_ESCAPED_REQUEST_PATTERN = r'(?:([A-Za-z]+) )?([^"\\ ]*(?:\\.[^"\\ ]*)*)(?: ([^"]*))?'
+_QUOTED_PATTERN = r'([^"]*)'
+_ESCAPED_QUOTED_PATTERN = r'([^"\\]*(?:\\.[^"\\]*)*)'
+
+
+# Returns '-' for a part of the request line that is missing
+def _dash_if_missing(value):
+    return value or _DASH
+
+
+# Returns '0' for a number of bytes that apache logged as '-' because no bytes were sent
+def _zero_if_dash(value):
+    if value == _DASH:
+        return '0'
+    return value
+
+
+# Converts a time taken in microseconds (%D) into milliseconds, the unit of the W3C time-taken field
+def _microseconds_to_milliseconds(value):
+    if not value.isdigit():
+        return value
+    return str(int(value) // 1000)
+
+
+# Converts a time taken in seconds (%T) into milliseconds, the unit of the W3C time-taken field
+def _seconds_to_milliseconds(value):
+    if not value.isdigit():
+        return value
+    return str(int(value) * 1000)
+
+
+# The converter of a time taken directive, from its {unit} argument. Milliseconds are stored as they are logged
+_TIME_TAKEN_CONVERTERS = {
+    ('D', ''): _microseconds_to_milliseconds,
+    ('T', ''): _seconds_to_milliseconds,
+    ('T', 's'): _seconds_to_milliseconds,
+    ('T', 'ms'): None,
+    ('T', 'us'): _microseconds_to_milliseconds,
+}
+
+
+# Returns the literal text between two directives of a format string, raising a ValueError if it has a '%' in it,
+# which is the start of a directive that was not recognised
+def _check_literal(literal):
+    if '%' in literal:
+        raise ValueError("Unsupported log format directive: " + literal[literal.index('%'):])
+    return literal
+
+
+# Returns a format string as apache logs it. A format string copied from an apache configuration file, such as
+# "%h %l %u %t \"%r\" %>s %b", has its quotes escaped and may be in quotes itself
+def _unescape_format(format_string):
+    if '\\"' not in format_string:
+        return format_string
+    if len(format_string) > 1 and format_string[0] == '"' and format_string[-1] == '"' \
+            and format_string[-2] != '\\':
+        format_string = format_string[1:-1]
+    return format_string.replace('\\"', '"')
+
+
+# Returns the regular expression of an unquoted field that is followed by the given literal text, which is every
+# character up to the next space, or up to the first character of the literal text that follows it
+def _unquoted_pattern(following):
+    if not following:
+        return r'([^ \r\n]*)'
+    stop = following[0]
+    if stop in ' \r\n':
+        return r'([^ \r\n]*)'
+    return r'([^ \r\n' + re.escape(stop) + r']*)'
+
+
+# The ApacheLogFormat class is a LogFormat string compiled into a parser for the lines of a log written with it.
+# The whole format is compiled once into a single regular expression, where every group is one column, along with
+# the converters of the few fields that are not stored as they are logged (%D in microseconds is stored in
+# milliseconds, a bytes sent of '-' as '0').
+# columns are the universal names of the columns of a parsed row, in the order they are in the format, and
+# field_map maps each of them to its position in the row, as the parser's field maps do.
+# An ApacheLogFormat can be passed to AnaPyzerParser.iter_batches() as a log format, it is compared, hashed and
+# pickled by its format string, so it can be used as a parse cache key and be sent to parsing processes
+class ApacheLogFormat:
+
+    # Constructor. Raises a ValueError if the format string has a directive that is not supported
+    def __init__(self, format_string):
+        self.format_string = format_string
+        self.columns = []
+        self.converters = []
+        pattern, escaped_pattern = self._compile(_unescape_format(format_string))
+        self.pattern = re.compile(pattern)
+        self.escaped_pattern = re.compile(escaped_pattern)
+        self.field_map = {name: i for i, name in enumerate(self.columns)}
+
+    # Builds the plain and the escaped quote regular expressions of a format string, adding each column it has to
+    # columns and the converter of each column that needs one to converters
+    def _compile(self, format_string):
+        pattern = ''
+        escaped_pattern = ''
+        position = 0
+        directives = list(_DIRECTIVE_PATTERN.finditer(format_string))
+        for i, directive in enumerate(directives):
+            literal = _check_literal(format_string[position:directive.start()])
+            pattern += re.escape(literal)
+            escaped_pattern += re.escape(literal)
+            position = directive.end()
+
+            argument, letter = directive.groups()
+            if letter == '%':
+                pattern += '%'
+                escaped_pattern += '%'
+                continue
+
+            next_start = directives[i + 1].start() if i + 1 < len(directives) else len(format_string)
+            following = format_string[position:next_start]
+            quoted = literal.endswith('"') and following.startswith('"')
+            field_pattern, escaped_field_pattern = self._compile_directive(letter, argument, quoted, following,
+                                                                           directive.group(0))
+            pattern += field_pattern
+            escaped_pattern += escaped_field_pattern
+
+        literal = _check_literal(format_string[position:])
+        pattern += re.escape(literal)
+        escaped_pattern += re.escape(literal)
+        return pattern, escaped_pattern
+
+    # Adds the columns of a single directive and returns its plain and escaped quote regular expressions
+    def _compile_directive(self, letter, argument, quoted, following, directive):
+        if quoted:
+            field_pattern, escaped_field_pattern = _QUOTED_PATTERN, _ESCAPED_QUOTED_PATTERN
+        else:
+            field_pattern = escaped_field_pattern = _unquoted_pattern(following)
+
+        if letter == 't':
+            if argument:
+                raise ValueError("Unsupported log format directive: " + directive)
+            self._add_column('date')
+            self._add_column('timestamp')
+            self._add_column('time-zone')
+            return _TIME_PATTERN, _TIME_PATTERN
+        elif letter == 'r':
+            self._add_column('method', _dash_if_missing)
+            self._add_column('uri-stem')
+            self._add_column('protocol', _dash_if_missing)
+            # The request line has spaces in it, so it can only be told apart from the fields after it in quotes
+            if not quoted:
+                raise ValueError("The request line must be quoted: " + directive)
+            return _REQUEST_PATTERN, _ESCAPED_REQUEST_PATTERN
+        elif letter in ('i', 'o', 'e', 'n', 'C'):
+            if not argument:
+                raise ValueError("Log format directive needs a {name}: " + directive)
+            name = argument.lower()
+            if letter == 'i':
+                name = _HEADER_COLUMNS.get(name, name)
+            self._add_column(_ARGUMENT_PREFIXES[letter] + name)
+        elif letter in ('D', 'T'):
+            unit = (argument or '').lower()
+            if (letter, unit) not in _TIME_TAKEN_CONVERTERS:
+                raise ValueError("Unsupported log format directive: " + directive)
+            self._add_column(_DIRECTIVE_COLUMNS[letter], _TIME_TAKEN_CONVERTERS[letter, unit])
+        elif letter in _DIRECTIVE_COLUMNS:
+            name = _DIRECTIVE_COLUMNS[letter]
+            if name is None:
+                # Fields that are not kept are matched without a group
+                return field_pattern.replace('(', '(?:', 1), escaped_field_pattern.replace('(', '(?:', 1)
+            self._add_column(name, _zero_if_dash if letter in ('b', 'O') else None)
+        else:
+            raise ValueError("Unsupported log format directive: " + directive)
+        return field_pattern, escaped_field_pattern
+
+    # Adds a column with the given universal name and converter. A name that is already a column is numbered, so
+    # a format with both %h and %a has the columns 'client-ip' and 'client-ip-2'
+    def _add_column(self, name, converter=None):
+        column_name = name
+        number = 2
+        while column_name in self.columns:
+            column_name = name + '-' + str(number)
+            number += 1
+        if converter is not None:
+            self.converters.append((len(self.columns), converter))
+        self.columns.append(column_name)
+
+    # Splits a single line of a log written with this format into a row of values in the order of columns.
+    # Raises IndexError if the line is not in this format, as the parser's line parsers do
+    def parse_line(self, line):
+        row = self.match_line(line)
+        if row is None:
+            raise IndexError("Line is not in the log format " + self.format_string)
+        return row
+
+    # Splits a single line of a log written with this format into a row of values in the order of columns.
+    # Returns None if the line is not in this format
+    def match_line(self, line):
+        if '\\"' in line:
+            match = self.escaped_pattern.match(line)
+        else:
+            match = self.pattern.match(line)
+        if match is None:
+            return None
+        row = match.groups()
+        if self.converters:
+            row = list(row)
+            for index, converter in self.converters:
+                row[index] = converter(row[index])
+        return row
+
+    def __eq__(self, other):
+        return isinstance(other, ApacheLogFormat) and other.format_string == self.format_string
+
+    def __hash__(self):
+        return hash(self.format_string)
+
+    # The format is pickled as its format string, and compiled again when it is unpickled
+    def __reduce__(self):
+        return compile_log_format, (self.format_string,)
+
+    def __repr__(self):
+        return 'ApacheLogFormat(' + repr(self.format_string) + ')'
+
+
+# The compiled formats, by format string, so each format string is only compiled once
+_compiled_formats = {}
+
+
+# Compiles an apache LogFormat string, such as '%h %l %u %t "%r" %>s %b "%{Referer}i" %D', into an ApacheLogFormat.
+# Raises a ValueError if the format string has a directive that is not supported
+def compile_log_format(format_string):
+    log_format = _compiled_formats.get(format_string)
+    if log_format is None:
+        log_format = ApacheLogFormat(format_string)
+        _compiled_formats[format_string] = log_format
+    return log_format
+
+
+# The LogFormat strings of the formats that the built in apache parser reads
+COMMON_LOG_FORMAT = '%h %l %u %t "%r" %>s %b'
+COMBINED_LOG_FORMAT = '%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-agent}i"'
+VHOST_COMBINED_LOG_FORMAT = '%v:%p %h %l %u %t "%r" %>s %O "%{Referer}i" "%{User-Agent}i"'
@@ -1,8 +1,25 @@
 # Import the enum class for better readability
 import enum
+# Import the os library to count the processors available for parsing several files
+import os
 # Import the pathlib library for cross platform file path abstraction
 import pathlib
 
+# Import the parallel parser for parsing large logs on several processes
+import anapyzerparallel
+# Import the log file readers for memory mapped and compressed logs
+from anapyzerlogfile import MappedLogFile, open_log_file, expand_log_paths, complete_lines_end, is_compressed
+from anapyzerlogfile import read_log_sample
+# Import the file identities used to tell whether a parsed log file has changed since
+from anapyzercache import file_identity, compare_file_identity, FILE_UNCHANGED, FILE_APPENDED
+from anapyzerparser import LOG_FORMAT_APACHE, LOG_FORMAT_W3C, MalformedLines, detect_log_format
+# Import the compiler for the LogFormat strings of apache logs with custom configurations
+from anapyzerlogformat import compile_log_format
+# Import the records and sinks that reports are written to files with
+from anapyzerreport import ReportRecord, HEADING, ChunkSink, report_sink, write_report
+# Import the precision check of the sketches that unique ips can be counted approximately with
+from anapyzersketch import check_precision
+
 
 # Enumeration for the accepted log types
 class AcceptedLogTypes(enum.Enum):
@@ -14,12 +31,17 @@ class AcceptedLogTypes(enum.Enum):
 # Enumeration for the accepted file formats
 class AcceptedFileFormats(enum.Enum):
     LOG = ('log files', '*.log')
+    GZIP = ('gzip compressed log files', '*.gz')
+    BZIP2 = ('bzip2 compressed log files', '*.bz2')
+    XZ = ('xz compressed log files', '*.xz')
     DEFAULT = LOG
 
 
 # Enumeration for the output file formats
 class OutputFileFormats(enum.Enum):
     CSV = ('CSV (Comma delimited)', '*.csv')
+    TEXT = ('Text', '*.txt')
+    JSON_LINES = ('JSON Lines', '*.jsonl')
     DEFAULT = CSV
 
 
@@ -28,6 +50,7 @@ class FileParseModes(enum.Enum):
     GRAPH = 'Generate graph'
     REPORT = 'Generate report'
     CSV = 'Convert to csv'
+    REPORT_FILE = 'Save report to file'
     DEFAULT = GRAPH
 
 
@@ -37,6 +60,22 @@ class GraphModes(enum.Enum):
     IP_CONNECTIONS = 'Connections by Country'
     DEFAULT = CON_PER_HOUR
 
+    # The fields of the parsed log that the graph reads, so only those fields need to be parsed
+    @property
+    def columns(self):
+        return {
+            GraphModes.CON_PER_HOUR: ['date', 'timestamp', 'time-zone', 'client-ip'],
+            GraphModes.IP_CONNECTIONS: ['date', 'timestamp', 'time-zone', 'client-ip'],
+        }[self]
+
+    # The name of the analysis that makes the graph, see AnaPyzerAnalyzer.get_analyses
+    @property
+    def analysis(self):
+        return {
+            GraphModes.CON_PER_HOUR: 'connections-per-hour',
+            GraphModes.IP_CONNECTIONS: 'ip-connections',
+        }[self]
+
 
 # Enumeration for the report output modes
 class ReportModes(enum.Enum):
@@ -45,6 +84,24 @@ class ReportModes(enum.Enum):
     CONN_LENGTH = 'Connection length report'
     DEFAULT = URL_RPT
 
+    # The fields of the parsed log that the report reads, so only those fields need to be parsed
+    @property
+    def columns(self):
+        return {
+            ReportModes.URL_RPT: ['uri-stem', 'bytes-sent'],
+            ReportModes.SUSP_ACT: ['client-ip', 'date', 'timestamp', 'time-zone', 'uri-stem'],
+            ReportModes.CONN_LENGTH: ['client-ip', 'date', 'timestamp', 'time-zone', 'bytes-sent'],
+        }[self]
+
+    # The name of the analysis that makes the report, see AnaPyzerAnalyzer.get_analyses
+    @property
+    def analysis(self):
+        return {
+            ReportModes.URL_RPT: 'web-pages',
+            ReportModes.SUSP_ACT: 'suspicious-activity',
+            ReportModes.CONN_LENGTH: 'connection-length',
+        }[self]
+
 
 class AnaPyzerModelError(Exception):
     def __init__(self, message):
@@ -66,6 +123,17 @@ class AnaPyzerModel:
         self._graph_data = None
         self._report_data = None
         self._in_file_path_has_changed = False
+        self._streaming = False
+        self._parse_workers = 1
+        self._memory_mapped = False
+        self._parsed_log_columns = None
+        self._parse_cache = None
+        self._parse_state = None
+        self._follow = False
+        self._apache_log_format = None
+        self._skip_malformed_lines = False
+        self._malformed_lines = None
+        self._unique_ip_precision = None
         self._analyzer = analyzer
         self._parser = parser
 
@@ -92,8 +160,17 @@ class AnaPyzerModel:
         return in_file_path
 
     # Validation method that determines whether the input file path that is currently set in the model is valid
+    # The input file path can be a single file, a directory of logs or a glob pattern matching several logs
     def in_file_path_is_valid(self):
-        return pathlib.Path(self._in_file_path).is_file()
+        return len(expand_log_paths(self._in_file_path)) > 0
+
+    # Returns the list of log files that the input file path refers to. If it does not refer to any files, the input
+    # file path itself is returned so that opening it reports why it could not be read
+    def _get_in_file_paths(self):
+        in_file_paths = expand_log_paths(self._in_file_path)
+        if not in_file_paths:
+            in_file_paths = [self.get_in_file_path()]
+        return in_file_paths
 
     # Setter for the file path to the input file
     # Takes a string for the file path
@@ -168,9 +245,176 @@ class AnaPyzerModel:
     def get_report_mode(self):
         return self._report_mode
 
+    # Setter for whether the input file is analyzed as a stream of batches instead of being parsed into memory
+    def set_streaming(self, streaming):
+        self._streaming = bool(streaming)
+
+    # Getter for whether the input file is analyzed as a stream of batches
+    def get_streaming(self):
+        return self._streaming
+
+    # Setter for the number of worker processes used to parse the input file and to find its suspicious activity
+    # A value of 1 parses the file in this process
+    def set_parse_workers(self, parse_workers):
+        self._parse_workers = max(1, int(parse_workers))
+
+    # Getter for the number of worker processes used to parse the input file
+    def get_parse_workers(self):
+        return self._parse_workers
+
+    # Setter for whether the input file is memory mapped and parsed as bytes, only decoding the fields that the
+    # selected graph or report needs
+    def set_memory_mapped(self, memory_mapped):
+        self._memory_mapped = bool(memory_mapped)
+
+    # Getter for whether the input file is memory mapped and parsed as bytes
+    def get_memory_mapped(self):
+        return self._memory_mapped
+
+    # Setter for whether the input file is followed as it grows: poll_log_file_data() then parses only the lines
+    # appended to it since it was last parsed, and the graph and report data are built from the parsed log in
+    # memory even when streaming is on
+    def set_follow(self, follow):
+        self._follow = bool(follow)
+
+    # Getter for whether the input file is followed as it grows
+    def get_follow(self):
+        return self._follow
+
+    # Setter for the apache LogFormat string that the input log was written with, such as
+    # '%h %l %u %t "%r" %>s %b "%{Referer}i" %D', for apache logs with a custom configuration.
+    # None or an empty string reads the common, combined and vhost combined formats
+    def set_apache_log_format(self, format_string):
+        if format_string:
+            try:
+                self._apache_log_format = compile_log_format(format_string)
+            except ValueError as e:
+                raise AnaPyzerModelError("Invalid log format:\n" + str(e))
+        else:
+            self._apache_log_format = None
+        self._in_file_path_has_changed = True
+
+    # Setter for the precision of the HyperLogLog sketches that the unique ips of the connections per hour graph are
+    # counted approximately with, which keeps memory use fixed for logs with very many ips. None counts them exactly
+    def set_unique_ip_precision(self, precision):
+        if precision is not None:
+            try:
+                precision = check_precision(precision)
+            except ValueError as e:
+                raise AnaPyzerModelError(str(e))
+        self._unique_ip_precision = precision
+
+    # Getter for the precision of the approximate unique ip counts, or None if they are counted exactly
+    def get_unique_ip_precision(self):
+        return self._unique_ip_precision
+
+    # Getter for the apache LogFormat string that the input log was written with, or None for the built in formats
+    def get_apache_log_format(self):
+        if self._apache_log_format is None:
+            return None
+        return self._apache_log_format.format_string
+
+    # Setter for whether lines of the input file that cannot be parsed are skipped and counted, instead of the whole
+    # file being rejected as not in the format of the current log type
+    def set_skip_malformed_lines(self, skip_malformed_lines):
+        self._skip_malformed_lines = bool(skip_malformed_lines)
+        self._in_file_path_has_changed = True
+
+    # Getter for whether lines of the input file that cannot be parsed are skipped
+    def get_skip_malformed_lines(self):
+        return self._skip_malformed_lines
+
+    # Getter for the MalformedLines of the lines that were skipped by the last parse of the input file, or None if
+    # malformed lines were not being skipped
+    def get_malformed_lines(self):
+        return self._malformed_lines
+
+    # Returns a description of the lines skipped by the last parse of the input file, or an empty string if none were
+    def get_malformed_lines_summary(self):
+        if self._malformed_lines is None:
+            return ''
+        return self._malformed_lines.summary()
+
+    # Returns a new MalformedLines to count the skipped lines of a parse in, or None if lines are not being skipped
+    def _new_malformed_lines(self):
+        if self._skip_malformed_lines:
+            return MalformedLines()
+        return None
+
+    # Opens an input file for parsing. Compressed files are decompressed as they are read. Otherwise a memory
+    # mapped file is opened when memory mapping is on, and only the given columns will be decoded from it
+    # (or every column if columns is None)
+    def _open_log_file(self, file_path, columns=None):
+        return open_log_file(file_path, columns, self._memory_mapped)
+
+    # Setter for the on-disk cache of parsed logs, an AnaPyzerCache. Logs that are in the cache are loaded from it
+    # instead of being parsed again. None turns off the cache
+    def set_parse_cache(self, parse_cache):
+        self._parse_cache = parse_cache
+
+    # Getter for the on-disk cache of parsed logs
+    def get_parse_cache(self):
+        return self._parse_cache
+
+    # Removes the cached parse results of the current input file, so it is parsed again the next time it is used
+    def invalidate_parse_cache(self):
+        if self._parse_cache is not None:
+            self._parse_cache.invalidate(self._get_in_file_paths())
+        self._parse_state = None
+        self._in_file_path_has_changed = True
+
+    # Removes every cached parse result
+    def clear_parse_cache(self):
+        if self._parse_cache is not None:
+            self._parse_cache.clear()
+        self._parse_state = None
+        self._in_file_path_has_changed = True
+
+    # Detects the type of the input log from a sample of the first lines of its first file, without parsing it.
+    # Returns the AcceptedLogTypes value of the log, or None if its format was not recognised
+    def detect_log_type(self):
+        in_file_paths = expand_log_paths(self._in_file_path)
+        if not in_file_paths:
+            return None
+        try:
+            log_format, columns = detect_log_format(read_log_sample(in_file_paths[0]))
+        except IOError:
+            return None
+        if log_format == LOG_FORMAT_W3C:
+            return AcceptedLogTypes.IIS
+        elif log_format == LOG_FORMAT_APACHE:
+            return AcceptedLogTypes.APACHE
+        return None
+
+    # Raises an AnaPyzerModelError if a sample of the input log shows that it is not of the current log type, so
+    # a log of the wrong type is caught before any time is spent parsing it
+    def _check_log_type(self):
+        log_type = self.detect_log_type()
+        if log_type is not None and log_type is not self._log_type:
+            raise AnaPyzerModelError(self._get_log_format_error_message() + "\nIt appears to be an " +
+                                     log_type.value + " log")
+
+    # Returns the parser's name for the format of the current log type, or the compiled LogFormat of an apache log
+    # with a custom configuration
+    def _get_log_format(self):
+        if self._log_type is AcceptedLogTypes.IIS:
+            return LOG_FORMAT_W3C
+        if self._apache_log_format is not None:
+            return self._apache_log_format
+        return LOG_FORMAT_APACHE
+
+    # Returns the error message shown when the input file is not in the format of the current log type
+    def _get_log_format_error_message(self):
+        if self._log_type is AcceptedLogTypes.IIS:
+            return "Log file does not appear to be in IIS / W3C log format"
+        if self._apache_log_format is not None:
+            return "Log file does not appear to be in the log format " + self._apache_log_format.format_string
+        return "Log file does not appear to be in Apache / Common log format"
+
     # Reads from the input file, converts to csv, and writes to the output file
     def export_log_to_csv(self):
-        self._parse_log_file_data()
+        if not self._streaming:
+            self._parse_log_file_data()
 
         try:
             out_file = open(self._out_file_path, 'w')
@@ -178,7 +422,14 @@ class AnaPyzerModel:
             raise AnaPyzerModelError("Could not write to file:\n" + e.filename + "\n" + e.strerror)
 
         try:
-            self._analyzer.write_parsed_log_to_csv(self._parsed_log_data, out_file)
+            if self._streaming:
+                def write_batches(batches):
+                    for batch in batches:
+                        self._analyzer.write_parsed_log_to_csv(batch, out_file)
+
+                self._stream_log_file_data(write_batches)
+            else:
+                self._analyzer.write_parsed_log_to_csv(self._parsed_log_data, out_file)
         except IOError as e:
             raise AnaPyzerModelError("Error encountered with file:\n" + e.filename + "\n" + e.strerror)
         finally:
@@ -187,62 +438,451 @@ class AnaPyzerModel:
         return True
 
     def create_report_data(self):
-        self._parse_log_file_data()
+        if self._report_is_streamed():
+            self._create_streamed_report_data()
+            return
+        self._parse_log_file_data(self._report_mode.columns)
         if self._report_mode is ReportModes.URL_RPT:
             self._report_data = self._analyzer.get_web_pages(self._parsed_log_data)
         elif self._report_mode is ReportModes.SUSP_ACT:
-            self._report_data = self._analyzer.malicious_activity_report(self._parsed_log_data)
+            self._report_data = self._analyzer.malicious_activity_report(self._parsed_log_data,
+                                                                        worker_count=self._parse_workers)
         elif self._report_mode is ReportModes.CONN_LENGTH:
             self._report_data = self._analyzer.get_connection_length_report(self._parsed_log_data)
+        self._report_data = self._with_malformed_lines_summary(self._report_data)
+
+    # Returns report text with the description of the lines skipped by the parse added to the end of it, or graph
+    # data with the description under 'note', so an analysis is never shown without saying that some of the log
+    # was left out of it
+    def _with_malformed_lines_summary(self, data):
+        summary = self.get_malformed_lines_summary()
+        if summary and isinstance(data, str):
+            return data + "\n\n" + summary
+        if summary and isinstance(data, dict):
+            data['note'] = summary
+        return data
+
+    # Creates the report data by streaming batches of the input file through the analyzer
+    # The suspicious activity report needs every line of the log at once, so it is always parsed into memory
+    def _create_streamed_report_data(self):
+        columns = self._report_mode.columns
+        if self._report_mode is ReportModes.URL_RPT:
+            self._report_data = self._stream_log_file_data(self._analyzer.stream_web_pages, columns)
+        elif self._report_mode is ReportModes.CONN_LENGTH:
+            self._report_data = self._stream_log_file_data(self._analyzer.stream_connection_length_report, columns)
+        self._report_data = self._with_malformed_lines_summary(self._report_data)
 
     def get_report_data(self):
         return self._report_data
 
+    # Returns True if the report of the current report mode is made by streaming batches of the input file through
+    # the analyzer rather than from the parsed log. The suspicious activity report needs every line of the log at once
+    def _report_is_streamed(self):
+        return self._streaming and not self._follow and self._report_mode is not ReportModes.SUSP_ACT
+
+    # Passes the text of the report of the current report mode to write_chunk a chunk of about REPORT_CHUNK_SIZE
+    # characters at a time as its records are made, such as to add it to the report view, so the text of the whole
+    # report is never built
+    def write_report_data(self, write_chunk):
+        streamed = self._report_is_streamed()
+        if not streamed:
+            self._parse_log_file_data(self._report_mode.columns)
+        self._write_report_records(ChunkSink(write_chunk), streamed)
+
+    # Writes the report of the current report mode to the output file as its records are made, so the text of the
+    # whole report is never built. The file is written as CSV or JSON Lines if it has a .csv or .jsonl suffix, and as
+    # text otherwise, see anapyzerreport
+    def export_report(self):
+        streamed = self._report_is_streamed()
+        if not streamed:
+            self._parse_log_file_data(self._report_mode.columns)
+
+        try:
+            out_file = open(self._out_file_path, 'w', newline='')
+        except IOError as e:
+            raise AnaPyzerModelError("Could not write to file:\n" + e.filename + "\n" + e.strerror)
+
+        try:
+            self._write_report_records(report_sink(out_file, self._out_file_path), streamed)
+        except IOError as e:
+            raise AnaPyzerModelError("Error encountered with file:\n" + str(e.filename) + "\n" + e.strerror)
+        finally:
+            out_file.close()
+
+        return True
+
+    # Writes the records of the report of the current report mode to sink, either by streaming batches of the input
+    # file through the analyzer or from the parsed log, which must already have been parsed
+    def _write_report_records(self, sink, streamed):
+        if streamed:
+            self._stream_report_to_sink(sink)
+        elif self._report_mode is ReportModes.URL_RPT:
+            self._analyzer.get_web_pages(self._parsed_log_data, sink=sink)
+        elif self._report_mode is ReportModes.SUSP_ACT:
+            self._analyzer.malicious_activity_report(self._parsed_log_data, worker_count=self._parse_workers, sink=sink)
+        elif self._report_mode is ReportModes.CONN_LENGTH:
+            self._analyzer.get_connection_length_report(self._parsed_log_data, sink=sink)
+
+        # The report says when some of the log was left out of it, as the report text does
+        summary = self.get_malformed_lines_summary()
+        if summary:
+            write_report([ReportRecord(HEADING, {'note': summary}, "\n\n" + summary)], sink)
+
+    # Writes the records of the report of the current report mode to sink by streaming batches of the input file
+    # through the analyzer
+    def _stream_report_to_sink(self, sink):
+        columns = self._report_mode.columns
+        if self._report_mode is ReportModes.URL_RPT:
+            self._stream_log_file_data(lambda batches: self._analyzer.stream_web_pages(batches, sink=sink), columns)
+        elif self._report_mode is ReportModes.CONN_LENGTH:
+            self._stream_log_file_data(
+                lambda batches: self._analyzer.stream_connection_length_report(batches, sink=sink), columns)
+
+    # Creates the graph or report data of each of the given GraphModes and ReportModes, or of every mode, from a
+    # single parse of the input files and returns a dictionary of each mode to its data. The fields of every mode are
+    # parsed together and each batch of the log is folded into the analyses of all of the modes as it is read, so
+    # the data of every mode takes about as long to make as the data of one
+    def create_all_data(self, modes=None):
+        if modes is None:
+            modes = list(GraphModes) + list(ReportModes)
+        columns = []
+        for mode in modes:
+            columns.extend(column for column in mode.columns if column not in columns)
+        names = [mode.analysis for mode in modes]
+
+        if self._streaming and not self._follow:
+            results = self._stream_log_file_data(
+                lambda batches: self._analyzer.stream_analyses(batches, names, self._unique_ip_precision), columns)
+        else:
+            self._parse_log_file_data(columns)
+            results = self._analyzer.get_analyses(self._parsed_log_data, names, self._unique_ip_precision)
+        return {mode: self._with_malformed_lines_summary(results[mode.analysis]) for mode in modes}
+
+    # _stream_log_file_data opens the current in_file and passes an iterator of parsed batches of it to the
+    # analysis function, so the log never has to be held in memory at once. Returns the result of the analysis.
+    # columns are the fields the analysis reads, which are the only fields that are parsed.
+    # When the input is several files, their batches are merged in timestamp order as they are read
+    def _stream_log_file_data(self, analysis, columns=None):
+        self._check_log_type()
+        log_files = []
+        try:
+            for file_path in self._get_in_file_paths():
+                log_files.append(self._open_log_file(file_path, columns))
+        except IOError as e:
+            for log_file in log_files:
+                log_file.close()
+            raise AnaPyzerModelError("Could not read from " + str(e.filename) + "\n" + str(e.strerror))
+
+        try:
+            sources = []
+            # Each file counts its own malformed lines, as the batches of several files are read in turn
+            file_malformed_lines = [self._new_malformed_lines() for log_file in log_files]
+            for log_file, malformed_lines in zip(log_files, file_malformed_lines):
+                if self._log_type is AcceptedLogTypes.IIS:
+                    sources.append(self._parser.iter_w3c_batches(log_file, requested_parameters=columns,
+                                                                 malformed_lines=malformed_lines))
+                elif self._apache_log_format is not None:
+                    sources.append(self._parser.iter_log_format_batches(log_file, self._apache_log_format,
+                                                                        requested_parameters=columns,
+                                                                        malformed_lines=malformed_lines))
+                else:
+                    sources.append(self._parser.iter_common_apache_batches(log_file, requested_parameters=columns,
+                                                                           malformed_lines=malformed_lines))
+            if len(sources) == 1:
+                batches = sources[0]
+            else:
+                batches = anapyzerparallel.iter_merged_batches(sources)
+            try:
+                result = analysis(batches)
+                self._malformed_lines = self._merge_malformed_lines(self._get_in_file_paths(),
+                                                                    file_malformed_lines)
+                return result
+            except IndexError:
+                raise AnaPyzerModelError(self._get_log_format_error_message())
+            except IOError as e:
+                raise AnaPyzerModelError("Could not read from " + str(e.filename) + "\n" + str(e.strerror))
+        finally:
+            for log_file in log_files:
+                log_file.close()
+
+    # Returns the MalformedLines of several input files merged into one, with the sampled line numbers labelled by
+    # their file if there is more than one, or None if malformed lines are not being skipped
+    @staticmethod
+    def _merge_malformed_lines(in_file_paths, file_malformed_lines):
+        if len(file_malformed_lines) == 1 or None in file_malformed_lines:
+            return file_malformed_lines[0]
+        malformed_lines = MalformedLines()
+        for file_path, file_lines in zip(in_file_paths, file_malformed_lines):
+            malformed_lines.extend(file_lines, file_path)
+        return malformed_lines
+
     # get_parsed_log_file opens the current in_file and attempts to parse it, determining the log type
-    # based on the current state of the UI
-    def _parse_log_file_data(self):
-        if self._in_file_path_has_changed or self._parsed_log_data is None:
+    # based on the current state of the UI.
+    # columns are the fields that will be read from the parsed log, or None for every field. Only those fields are
+    # kept in the parsed log, so the log is parsed again if a later analysis needs a field that was left out.
+    # A log that was already parsed, in this session or into the parse cache, is reused if it has not changed, and
+    # only the new lines are parsed if lines were appended to it since
+    def _parse_log_file_data(self, columns=None):
+        has_columns = self._parsed_log_columns is None or (
+            columns is not None and set(columns) <= set(self._parsed_log_columns))
+        if self._in_file_path_has_changed or self._parsed_log_data is None or not has_columns:
             parsed_log = None
             self._in_file_path_has_changed = False
+            in_file_paths = self._get_in_file_paths()
+            if self._reuse_parsed_log_file_data(in_file_paths, columns):
+                return True
+            self._check_log_type()
+
+            # A followed log is parsed up to the end of its last complete line, so the parse can be carried on from
+            # there while lines are still being written to it
+            if self._follow and len(in_file_paths) == 1 and not is_compressed(in_file_paths[0]):
+                state = {'paths': in_file_paths,
+                         'log_format': self._get_log_format(),
+                         'columns': columns,
+                         'identities': [{'size': 0}],
+                         'fields_line': None,
+                         'malformed_lines': self._new_malformed_lines()}
+                if self._parse_appended_log_file_data(state, None):
+                    return True
+
+            # The identities are taken before parsing, so a file that changes while it is parsed is noticed
+            identities = self._get_file_identities(in_file_paths)
+            malformed_lines = self._new_malformed_lines()
+            if self._parse_workers > 1 or len(in_file_paths) > 1:
+                parsed_log = self._parse_log_file_in_parallel(in_file_paths, columns, malformed_lines)
+                if parsed_log is None:
+                    raise AnaPyzerModelError("Log was unable to be parsed.")
+                self._set_parsed_log_file_data(parsed_log, in_file_paths, columns, identities, malformed_lines)
+                return True
+
             try:
-                log_file = open(self.get_in_file_path(), 'r')
+                log_file = self._open_log_file(in_file_paths[0], columns)
                 if self._log_type is AcceptedLogTypes.IIS:
                     # print("parsing IIS")
                     try:
-                        parsed_log = self._parser.parse_w3c_to_list(log_file)
+                        if columns is None:
+                            parsed_log = self._parser.parse_w3c_to_list(log_file, malformed_lines=malformed_lines)
+                        else:
+                            parsed_log = self._parser.parse_w3c_requested_to_list(log_file, columns,
+                                                                                  malformed_lines=malformed_lines)
                     except IndexError as e:
                         raise AnaPyzerModelError("Log file does not appear to be in IIS / W3C log format")
                 elif self._log_type is AcceptedLogTypes.APACHE:
                     # print("parsing Apache")
                     try:
-                        parsed_log = self._parser.parse_common_apache_to_list(log_file)
+                        if self._apache_log_format is not None:
+                            parsed_log = self._parser.parse_log_format_to_list(log_file, self._apache_log_format,
+                                                                               columns, malformed_lines)
+                        elif columns is None:
+                            parsed_log = self._parser.parse_common_apache_to_list(log_file,
+                                                                                  malformed_lines=malformed_lines)
+                        else:
+                            parsed_log = self._parser.parse_common_apache_requested_to_list(
+                                log_file, columns, malformed_lines=malformed_lines)
                     except IndexError as e:
-                        raise AnaPyzerModelError("Log file does not appear to be in Apache / Common log format")
+                        raise AnaPyzerModelError(self._get_log_format_error_message())
             except IOError as e:
                 raise AnaPyzerModelError("Could not read from " + e.filename + "\n" + e.strerror)
 
             log_file.close()
 
             if parsed_log is not None:
-                self._parsed_log_data = parsed_log
+                self._set_parsed_log_file_data(parsed_log, in_file_paths, columns, identities, malformed_lines)
                 return True
             else:
                 raise AnaPyzerModelError("Log was unable to be parsed.")
 
+    # Returns the identity of each input file, or None if any of them cannot be read
+    @staticmethod
+    def _get_file_identities(in_file_paths):
+        try:
+            return [file_identity(file_path) for file_path in in_file_paths]
+        except OSError:
+            return None
+
+    # Stores a newly parsed log of the input files as the current parsed log.
+    # If none of the files changed while they were parsed, the parse state is remembered and stored in the parse
+    # cache along with the parsed log: the identity of each file, which is also the byte offset parsing stopped at,
+    # and for a W3C log the '#Fields' line in effect at that offset, along with the MalformedLines of the lines that
+    # were skipped if malformed lines were being skipped
+    def _set_parsed_log_file_data(self, parsed_log, in_file_paths, columns, identities, malformed_lines=None):
+        self._parsed_log_data = parsed_log
+        self._parsed_log_columns = columns
+        self._malformed_lines = malformed_lines
+        self._parse_state = None
+        if identities is None or identities != self._get_file_identities(in_file_paths):
+            return
+
+        fields_line = None
+        if self._get_log_format() == LOG_FORMAT_W3C and len(in_file_paths) == 1 and \
+                not is_compressed(in_file_paths[0]):
+            headers = anapyzerparallel.find_w3c_headers(in_file_paths[0], 0, identities[0]['size'])
+            if headers:
+                fields_line = headers[-1][1]
+        self._parse_state = {'paths': in_file_paths,
+                             'log_format': self._get_log_format(),
+                             'columns': columns,
+                             'identities': identities,
+                             'fields_line': fields_line,
+                             'malformed_lines': malformed_lines}
+        self._store_cached_log_file_data()
+
+    # Yields the (parse state, parsed log) of the earlier parses of the input files that can give the given
+    # columns: the current parsed log first, then the entries in the parse cache
+    def _iter_previous_parses(self, in_file_paths, columns):
+        state = self._parse_state
+        if state is not None and self._parsed_log_data is not None and state['paths'] == in_file_paths and \
+                state['log_format'] == self._get_log_format() and self._can_reuse_malformed_lines(state) and \
+                (state['columns'] is None or (columns is not None and set(columns) <= set(state['columns']))):
+            yield state, self._parsed_log_data
+
+        if self._parse_cache is not None:
+            for entry_columns in ([columns, None] if columns is not None else [None]):
+                entry = self._parse_cache.load_entry(in_file_paths, self._get_log_format(), entry_columns)
+                # Only entries stored by the model have the whole parse state
+                if entry is not None and 'fields_line' in entry[0] and self._can_reuse_malformed_lines(entry[0]):
+                    yield entry
+
+    # Returns whether an earlier parse can be reused with the current setting for skipping malformed lines: a parse
+    # that skipped lines cannot be used when they are not being skipped, and a parse that did not count its skipped
+    # lines cannot be carried on when they are
+    def _can_reuse_malformed_lines(self, state):
+        malformed_lines = state.get('malformed_lines')
+        if self._skip_malformed_lines:
+            return malformed_lines is not None
+        return malformed_lines is None or malformed_lines.total == 0
+
+    # Reuses an earlier parse of the input files if none of them have changed since, or parses only the lines that
+    # were appended to a single log file since it was parsed. Returns True if an earlier parse was reused
+    def _reuse_parsed_log_file_data(self, in_file_paths, columns):
+        for state, parsed_log in self._iter_previous_parses(in_file_paths, columns):
+            changes = [compare_file_identity(identity) for identity in state['identities']]
+            if all(change == FILE_UNCHANGED for change in changes):
+                self._parsed_log_data = parsed_log
+                self._parsed_log_columns = state['columns']
+                self._malformed_lines = state.get('malformed_lines') if self._skip_malformed_lines else None
+                self._parse_state = state
+                return True
+            if changes == [FILE_APPENDED] and not is_compressed(in_file_paths[0]):
+                return self._parse_appended_log_file_data(state, parsed_log)
+        return False
+
+    # Parses the lines that were appended to the input file since the parse described by state, and adds them to
+    # the end of that parse's parsed log, or makes them the parsed log if parsed_log is None. Aggregates kept with
+    # the parsed log fold in the new rows the next time they are used. Returns True once the parse is updated
+    def _parse_appended_log_file_data(self, state, parsed_log):
+        file_path = state['paths'][0]
+        start = state['identities'][0]['size']
+        # The lines are counted on from the earlier parse, in a copy so the earlier parse is left as it was
+        malformed_lines = self._new_malformed_lines()
+        if malformed_lines is not None:
+            malformed_lines.extend(state['malformed_lines'])
+        try:
+            end = complete_lines_end(file_path, start)
+            appended_log = anapyzerparallel.parse_file_range(file_path, start, end, state['log_format'],
+                                                             state['fields_line'], state['columns'], malformed_lines)
+            identity = file_identity(file_path, end)
+        except IndexError:
+            raise AnaPyzerModelError(self._get_log_format_error_message())
+        except IOError as e:
+            raise AnaPyzerModelError("Could not read from " + str(e.filename) + "\n" + str(e.strerror))
+
+        if parsed_log is None:
+            if appended_log is None:
+                raise AnaPyzerModelError("Log was unable to be parsed.")
+            parsed_log = appended_log
+        elif appended_log is not None:
+            # The appended lines may be a new W3C segment with other fields, which extend() matches up by name
+            parsed_log.extend(appended_log)
+
+        fields_line = state['fields_line']
+        if state['log_format'] == LOG_FORMAT_W3C:
+            headers = anapyzerparallel.find_w3c_headers(file_path, start, end)
+            if headers:
+                fields_line = headers[-1][1]
+
+        self._parsed_log_data = parsed_log
+        self._parsed_log_columns = state['columns']
+        self._malformed_lines = malformed_lines
+        self._parse_state = dict(state, identities=[identity], fields_line=fields_line,
+                                 malformed_lines=malformed_lines)
+        self._store_cached_log_file_data()
+        return True
+
+    # Checks whether the input files have changed since they were last parsed, and if they have, parses only the
+    # lines appended to them and updates the graph data of the graph parse mode, or the parsed log that
+    # write_report_data writes the report from in the report parse mode. A log that was rewritten, truncated or
+    # rotated is parsed again from the start.
+    # Returns True if the graph or report data was updated
+    def poll_log_file_data(self):
+        if self._file_parse_mode in (FileParseModes.CSV, FileParseModes.REPORT_FILE):
+            return False
+        state = self._parse_state
+        if state is not None and self._parsed_log_data is not None and \
+                all(compare_file_identity(identity) == FILE_UNCHANGED for identity in state['identities']):
+            return False
+
+        previous_log = self._parsed_log_data
+        previous_length = previous_log.length if previous_log is not None else 0
+        self._in_file_path_has_changed = True
+        if self._file_parse_mode is FileParseModes.GRAPH:
+            self.create_graph_data()
+        else:
+            self._parse_log_file_data(self._report_mode.columns)
+        return self._parsed_log_data is not previous_log or self._parsed_log_data.length != previous_length
+
+    # Stores the current parsed log and parse state in the parse cache.
+    # The cache is only an optimisation, so failing to write to it is not an error
+    def _store_cached_log_file_data(self):
+        if self._parse_cache is None or self._parse_state is None:
+            return
+        state = self._parse_state
+        try:
+            self._parse_cache.store(state['paths'], state['log_format'], state['columns'], self._parsed_log_data,
+                                    state)
+        except OSError:
+            pass
+
+    # Parses the input files in worker processes, keeping only the given columns (or every column if columns is None)
+    # A single file is split between self._parse_workers processes. Several files are each parsed in their own
+    # process, using every processor unless the number of workers was set, and merged in timestamp order
+    def _parse_log_file_in_parallel(self, in_file_paths, columns=None, malformed_lines=None):
+        try:
+            if len(in_file_paths) > 1:
+                worker_count = self._parse_workers if self._parse_workers > 1 else os.cpu_count() or 1
+                return anapyzerparallel.parse_log_files(in_file_paths, self._get_log_format(), worker_count, columns,
+                                                        malformed_lines)
+            return anapyzerparallel.parse_log_file(in_file_paths[0], self._get_log_format(),
+                                                   self._parse_workers, columns, malformed_lines)
+        except IndexError:
+            raise AnaPyzerModelError(self._get_log_format_error_message())
+        except IOError as e:
+            raise AnaPyzerModelError("Could not read from " + str(e.filename) + "\n" + str(e.strerror))
+
     # create_graph_data attempts to extract graphable data from the current report_data dictionary
     def create_graph_data(self):
-        self._parse_log_file_data()
         graph_data = None
+        columns = self._graph_mode.columns
+        if self._streaming and not self._follow:
+            if self._graph_mode is GraphModes.CON_PER_HOUR:
+                graph_data = self._stream_log_file_data(
+                    lambda batches: self._analyzer.stream_connections_per_hour(batches, self._unique_ip_precision),
+                    columns)
+            elif self._graph_mode is GraphModes.IP_CONNECTIONS:
+                graph_data = self._stream_log_file_data(self._analyzer.stream_ip_connection_report, columns)
+            if graph_data is not None:
+                self._graph_data = self._with_malformed_lines_summary(graph_data)
+            return
+
+        self._parse_log_file_data(columns)
         if self._graph_mode is GraphModes.CON_PER_HOUR:
-            print("Creating Connections Per Hour Report")
-            graph_data = self._analyzer.get_connections_per_hour(self._parsed_log_data)
+            graph_data = self._analyzer.get_connections_per_hour(self._parsed_log_data, self._unique_ip_precision)
 
         elif self._graph_mode is GraphModes.IP_CONNECTIONS:
-            print("Creating IP Connections Report")
             graph_data = self._analyzer.ip_connection_report(self._parsed_log_data)
 
         if graph_data is not None:
-            self._graph_data = graph_data
+            self._graph_data = self._with_malformed_lines_summary(graph_data)
 
     # Print method for testing, outputs current delimited graph data to console
     def print_current_graph_data_split(self):
@@ -257,11 +897,9 @@ class AnaPyzerModel:
     def print_current_report_data(self):
         print("printing _report_data")
         print(self._parsed_log_data)
-        if self._parsed_log_data['length'] > 0:
-            i = 0
-            while i < self._parsed_log_data['length']:
-                print(self._parsed_log_data[i])
-                i += 1
+        if self._parsed_log_data is not None:
+            for row in self._parsed_log_data.rows():
+                print(row)
 
     # Returns an array of the graph data dictionary's keys which contain
     # values that are also dictionaries or arrays.
@@ -315,6 +953,11 @@ class AnaPyzerModel:
         else:
             return 'Y Axis'
 
+    # Getter method for the note shown under the graph, such as the number of malformed lines that were skipped,
+    # or None if there is none
+    def get_graph_data_note(self):
+        return self._graph_data.get('note')
+
     # Getter method for graph title
     def get_graph_data_title(self):
         if self._graph_data.get('title'):
@@ -0,0 +1,55 @@
+# The NumPy backend of the accumulators. The resource counts of the web site resource report are made here as array
+# operations over the dictionary codes of a batch, and give exactly the same result, in the same order, as the
+# python counts they stand in for. NumPy is optional: WebPagesAccumulator uses these counts when it is installed and
+# its own python counts when it is not, see is_enabled().
+# The ip group-bys of the other accumulators are left in python, as the NumPy versions of them were slower
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Whether the accumulators use the NumPy counts, which they do whenever NumPy is installed
+_enabled = numpy is not None
+
+# Sums of bytes below this are exact in the float64 sums of bincount
+_EXACT_FLOAT_SUM = 2 ** 53
+
+
+# Returns True if the accumulators use the NumPy counts
+def is_enabled():
+    return _enabled
+
+
+# Turns the NumPy counts on or off, such as to compare them with the python ones, and returns whether they were
+# on before. Raises an ImportError if they are turned on when NumPy is not installed
+def set_enabled(enabled):
+    global _enabled
+    if enabled and numpy is None:
+        raise ImportError("NumPy is not installed")
+    previous = _enabled
+    _enabled = bool(enabled)
+    return previous
+
+
+# Counts the rows of a batch of each code and returns a dictionary of each code to its count, in the order the codes
+# are first seen, along with a dictionary of each code to the sum of the values of its rows.
+# values are the number of each value code, and value_codes the value code of each row, or None to sum nothing.
+# The codes are numbered from 0, so they are counted and summed with bincount without sorting them. The sums are
+# made in float64, which is exact as long as the bytes of the batch add up to less than 2 ** 53, and in int64
+# otherwise
+def code_counts(codes, values=None, value_codes=None):
+    code_array = numpy.frombuffer(codes, dtype=numpy.uint32)
+    distinct_codes, first_rows = numpy.unique(code_array, return_index=True)
+    distinct_codes = distinct_codes[numpy.argsort(first_rows, kind='stable')]
+    code_list = distinct_codes.tolist()
+    hits = dict(zip(code_list, numpy.bincount(code_array)[distinct_codes].tolist()))
+    if values is None:
+        return hits, dict.fromkeys(code_list, 0)
+
+    row_values = numpy.array(values, dtype=numpy.int64)[numpy.frombuffer(value_codes, dtype=numpy.uint32)]
+    if int(row_values.sum()) < _EXACT_FLOAT_SUM:
+        sums = numpy.rint(numpy.bincount(code_array, weights=row_values)).astype(numpy.int64)
+    else:
+        sums = numpy.zeros(int(distinct_codes.max()) + 1, dtype=numpy.int64)
+        numpy.add.at(sums, code_array, row_values)
+    return hits, dict(zip(code_list, sums[distinct_codes].tolist()))
@@ -0,0 +1,335 @@
+# Import the concurrent.futures library to run the parsers in worker processes
+import concurrent.futures
+# Import the heapq library to merge the rows of several logs in timestamp order
+import heapq
+# Import the itertools library to put the W3C header in front of each worker's lines
+import itertools
+# Import the mmap library to search the whole log for W3C headers without reading it into memory
+import mmap
+# Import the operator library to get the sort key of a merged row
+import operator
+# Import the os library to get the size of the log file
+import os
+
+from anapyzerlogfile import DecompressingLogFile, is_compressed, open_log_file
+from anapyzerparsedlog import ParsedLog, LogSchema, MISSING_EPOCH
+from anapyzerparser import AnaPyzerParser, MalformedLines, LOG_FORMAT_W3C, PENDING_ROWS
+
+# The number of bytes each worker reads from its part of the log file at a time
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+# split_file_ranges splits the file at file_path into at most chunk_count (start, end) byte ranges.
+# Every range starts at the beginning of a line and ends just after a newline or at the end of the file,
+# so no line is ever split between two ranges
+def split_file_ranges(file_path, chunk_count):
+    file_size = os.path.getsize(file_path)
+    if file_size == 0:
+        return []
+
+    boundaries = [0]
+    with open(file_path, 'rb') as log_file:
+        for i in range(1, chunk_count):
+            offset = file_size * i // chunk_count
+            if offset <= boundaries[-1]:
+                continue
+            # Move to the start of the next line, starting one byte back in case offset is already at a line start
+            log_file.seek(offset - 1)
+            log_file.readline()
+            boundary = log_file.tell()
+            if boundary >= file_size:
+                break
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+    boundaries.append(file_size)
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+# find_w3c_headers returns a list of (offset, line) tuples for every '#Fields' header line in the W3C log at
+# file_path, or only the ones that start between the start and end byte offsets if they are given.
+# The search runs over a memory map of the file, so it does not have to decode any of the data lines
+def find_w3c_headers(file_path, start=0, end=None):
+    headers = []
+    if os.path.getsize(file_path) == 0:
+        return headers
+
+    with open(file_path, 'rb') as log_file:
+        with mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as log_map:
+            if end is None:
+                end = len(log_map)
+            position = log_map.find(b'#Fields', start, end)
+            while position >= 0:
+                line_end = log_map.find(b'\n', position)
+                if line_end < 0:
+                    line_end = len(log_map)
+                # Only count the directive if it is at the start of a line
+                if position == 0 or log_map[position - 1] == ord('\n'):
+                    headers.append((position, log_map[position:line_end].decode('utf-8', 'replace')))
+                position = log_map.find(b'#Fields', line_end, end)
+    return headers
+
+
+# Returns the header line that is in effect at the start of a range, which is the last header before it
+def _header_for_offset(headers, offset):
+    header_line = None
+    for header_offset, line in headers:
+        if header_offset >= offset:
+            break
+        header_line = line
+    return header_line
+
+
+# Yields the decoded lines of the file between the start and end byte offsets, reading BLOCK_SIZE bytes at a time
+def _iter_range_lines(log_file, start, end):
+    log_file.seek(start)
+    remaining = end - start
+    partial = b''
+    while remaining > 0:
+        block = log_file.read(min(BLOCK_SIZE, remaining))
+        if not block:
+            break
+        remaining -= len(block)
+        block = partial + block
+        # Hold back the incomplete line at the end of the block until the next block is read
+        last_newline = block.rfind(b'\n')
+        if last_newline < 0:
+            partial = block
+            continue
+        partial = block[last_newline + 1:]
+        for line in block[:last_newline].decode('utf-8', 'replace').split('\n'):
+            yield line
+    if partial:
+        yield partial.decode('utf-8', 'replace')
+
+
+# Parses the lines between the start and end byte offsets of the file into a single ParsedLog.
+# header_line is the W3C '#Fields' line in effect at the start offset, or None.
+# If malformed_lines is given, the lines that cannot be parsed are skipped and counted in it, numbered from the
+# line after the last one it has counted.
+# This runs inside a worker process, so it takes only picklable arguments and returns a picklable result
+def parse_file_range(file_path, start, end, log_format, header_line=None, requested_parameters=None,
+                     malformed_lines=None):
+    parsed_log = None
+    with open(file_path, 'rb') as log_file:
+        lines = _iter_range_lines(log_file, start, end)
+        if header_line is not None:
+            lines = itertools.chain([header_line], lines)
+            # The header line is not one of the lines of the range
+            if malformed_lines is not None:
+                malformed_lines.line_count -= 1
+        for parsed_log in AnaPyzerParser.iter_batches(lines, log_format, None, requested_parameters,
+                                                      malformed_lines):
+            pass
+    return parsed_log
+
+
+# Parses the lines between the start and end byte offsets of the file in the same way as parse_file_range, skipping
+# the lines that cannot be parsed. Returns the ParsedLog along with the MalformedLines of the range, numbered from
+# the first line of the range, since a worker process cannot add to the caller's MalformedLines
+def _parse_file_range_leniently(file_path, start, end, log_format, header_line, requested_parameters):
+    malformed_lines = MalformedLines()
+    parsed_log = parse_file_range(file_path, start, end, log_format, header_line, requested_parameters,
+                                  malformed_lines)
+    return parsed_log, malformed_lines
+
+
+# parse_log_file parses the log at file_path in the given log format using worker_count processes.
+# The file is split into byte ranges aligned to line boundaries, each range is parsed in its own worker, and the
+# parsed ranges are joined back together in their original order. For W3C logs the '#Fields' header that is in
+# effect at the start of each range is found first and passed to the worker that parses it.
+# A compressed log cannot be split into byte ranges, so it is decompressed and parsed in this process instead.
+# If requested_parameters is given, only those fields are kept in each row. If malformed_lines is given, the lines
+# that cannot be parsed are skipped and counted in it, otherwise an IndexError is raised at the first of them.
+# Returns a ParsedLog, or None if the log had no data lines
+def parse_log_file(file_path, log_format, worker_count, requested_parameters=None, malformed_lines=None):
+    file_path = str(file_path)
+    if is_compressed(file_path):
+        parsed_log = None
+        with DecompressingLogFile(file_path) as log_file:
+            for parsed_log in AnaPyzerParser.iter_batches(log_file, log_format, None, requested_parameters,
+                                                          malformed_lines):
+                pass
+        return parsed_log
+
+    ranges = split_file_ranges(file_path, max(1, worker_count))
+    if log_format == LOG_FORMAT_W3C:
+        headers = find_w3c_headers(file_path)
+    else:
+        headers = []
+
+    if worker_count <= 1 or len(ranges) <= 1:
+        results = [parse_file_range(file_path, start, end, log_format, _header_for_offset(headers, start),
+                                     requested_parameters, malformed_lines)
+                   for start, end in ranges]
+    elif malformed_lines is None:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=worker_count) as executor:
+            futures = [executor.submit(parse_file_range, file_path, start, end, log_format,
+                                       _header_for_offset(headers, start), requested_parameters)
+                       for start, end in ranges]
+            results = [future.result() for future in futures]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=worker_count) as executor:
+            futures = [executor.submit(_parse_file_range_leniently, file_path, start, end, log_format,
+                                       _header_for_offset(headers, start), requested_parameters)
+                       for start, end in ranges]
+            results = []
+            # The malformed lines of each range are numbered on from the lines of the ranges before it
+            for future in futures:
+                result, range_malformed_lines = future.result()
+                malformed_lines.extend(range_malformed_lines)
+                results.append(result)
+
+    parsed_log = None
+    for result in results:
+        if result is None:
+            continue
+        if parsed_log is None:
+            parsed_log = result
+        else:
+            parsed_log.extend(result)
+    return parsed_log
+
+
+# Parses the whole log file at file_path into a single ParsedLog. Compressed files are decompressed as they are read.
+# If lenient is True, the lines that cannot be parsed are skipped, and the MalformedLines of the file is returned
+# along with the ParsedLog.
+# This runs inside a worker process, so it takes only picklable arguments and returns a picklable result
+def _parse_whole_file(file_path, log_format, requested_parameters=None, lenient=False):
+    parsed_log = None
+    malformed_lines = MalformedLines() if lenient else None
+    log_file = open_log_file(file_path)
+    try:
+        for parsed_log in AnaPyzerParser.iter_batches(log_file, log_format, None, requested_parameters,
+                                                      malformed_lines):
+            pass
+    finally:
+        log_file.close()
+    if lenient:
+        return parsed_log, malformed_lines
+    return parsed_log
+
+
+# parse_log_files parses several log files in the given log format, such as a directory of daily IIS logs or a set
+# of rotated apache logs. Each file is parsed in its own process from a pool of at most worker_count processes,
+# and the parsed files are then merged into a single ParsedLog in timestamp order.
+# If requested_parameters is given, only those fields are kept in each row. If malformed_lines is given, the lines
+# that cannot be parsed are skipped and counted in it, with the sampled line numbers labelled by their file.
+# Returns a ParsedLog, or None if none of the logs had data lines
+def parse_log_files(file_paths, log_format, worker_count, requested_parameters=None, malformed_lines=None):
+    file_paths = [str(file_path) for file_path in file_paths]
+    lenient = malformed_lines is not None
+    if worker_count <= 1 or len(file_paths) <= 1:
+        results = [_parse_whole_file(file_path, log_format, requested_parameters, lenient)
+                   for file_path in file_paths]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(worker_count, len(file_paths))) as executor:
+            futures = [executor.submit(_parse_whole_file, file_path, log_format, requested_parameters, lenient)
+                       for file_path in file_paths]
+            results = [future.result() for future in futures]
+
+    if lenient:
+        for file_path, (parsed_log, file_malformed_lines) in zip(file_paths, results):
+            malformed_lines.extend(file_malformed_lines, file_path)
+        results = [parsed_log for parsed_log, file_malformed_lines in results]
+    return merge_parsed_logs(results)
+
+
+# Merges several ParsedLogs into one, with the rows of all of them in timestamp order.
+# Returns None if there were no logs with data
+def merge_parsed_logs(parsed_logs):
+    merged_log = None
+    for merged_log in iter_merged_batches([[parsed_log] for parsed_log in parsed_logs if parsed_log is not None],
+                                          None):
+        pass
+    return merged_log
+
+
+# Adds the named columns of a batch that the schema of a merged log does not have yet to the right of its columns,
+# and points each field of the batch's field map that the merged schema does not have at its column in the merged rows
+def _widen_schema(schema, batch):
+    columns = schema.columns
+    for name in batch.schema.columns:
+        if name is not None and name not in columns:
+            columns.append(name)
+
+    field_map = schema.field_map
+    for name, index in batch.schema.field_map.items():
+        if field_map.get(name, -1) >= 0:
+            continue
+        column_name = batch.schema.columns[index] if 0 <= index < len(batch.schema.columns) else None
+        field_map[name] = columns.index(column_name) if column_name is not None else -1
+
+
+# Returns the schema of a merged log: every named column of the given batches in the order they are first seen,
+# with each field of their field maps pointing at its column in the merged rows
+def _merged_schema(batches):
+    schema = LogSchema([], {}, batches[0].schema.headers)
+    for batch in batches:
+        _widen_schema(schema, batch)
+    return schema
+
+
+# Yields an (epoch seconds, row) tuple for every row of a sequence of batches, with the values of each row in the
+# order of the columns of the merged schema. The merged schema is widened with the columns of each batch as it is
+# reached, such as a W3C segment whose #Fields added columns. Columns that a batch does not have are None, and rows
+# without a time, or batches without a date and a time, have MISSING_EPOCH
+def _iter_keyed_rows(batches, schema):
+    for batch in batches:
+        _widen_schema(schema, batch)
+        batch_columns = [batch.column(name) for name in schema.columns]
+        epochs = batch.epoch_column()
+        epochs = epochs.values() if epochs is not None else itertools.repeat(MISSING_EPOCH, batch.length)
+        for i, epoch in zip(range(0, batch.length), epochs):
+            yield epoch, [column[i] if column is not None else None for column in batch_columns]
+
+
+# Appends rows of the merged schema to a merged batch, first adding any columns the schema gained since the batch was
+# made. Rows made before the schema gained them are shorter, and get None in the new columns
+def _append_merged_rows(log_data, schema, rows):
+    for name in schema.columns[len(log_data.schema.columns):]:
+        log_data.add_column(name)
+    log_data.schema.field_map.update(schema.field_map)
+    log_data.append_rows(rows)
+
+
+# iter_merged_batches merges several sources of ParsedLog batches, such as the iter_*_batches of several log files,
+# with a streaming k-way merge on the epoch seconds of each row, so logs in different time zones are merged in the
+# order their requests were made. Each source is expected to be in time order already, as a log file is, so only
+# the next row of each source has to be held while merging. Columns that the later batches of a source add, such as
+# those of a new W3C #Fields segment, are added to the right of the columns of the merged batches from then on.
+# Rows with the same time keep the order of their sources. Yields ParsedLog batches of at most batch_size rows,
+# or a single ParsedLog if batch_size is None
+def iter_merged_batches(sources, batch_size=AnaPyzerParser.DEFAULT_BATCH_SIZE):
+    first_batches = []
+    iterators = []
+    for source in sources:
+        iterator = iter(source)
+        first_batch = next(iterator, None)
+        if first_batch is not None:
+            first_batches.append(first_batch)
+            iterators.append(itertools.chain([first_batch], iterator))
+    if not first_batches:
+        return
+
+    schema = _merged_schema(first_batches)
+    keyed_rows = [_iter_keyed_rows(iterator, schema) for iterator in iterators]
+    # The merged batches share their symbol tables, so a value has the same code in every batch
+    symbol_tables = {}
+    log_data = ParsedLog(LogSchema(schema.columns, schema.field_map, schema.headers), symbol_tables)
+    rows = []
+    pending_rows = PENDING_ROWS if batch_size is None else min(batch_size, PENDING_ROWS)
+
+    for key, row in heapq.merge(*keyed_rows, key=operator.itemgetter(0)):
+        rows.append(row)
+        if len(rows) >= pending_rows:
+            _append_merged_rows(log_data, schema, rows)
+            rows = []
+
+            if batch_size is not None and log_data.length >= batch_size:
+                yield log_data
+                log_data = ParsedLog(LogSchema(schema.columns, schema.field_map, schema.headers), symbol_tables)
+
+    _append_merged_rows(log_data, schema, rows)
+    if log_data.length > 0:
+        yield log_data
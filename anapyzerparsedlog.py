@@ -0,0 +1,513 @@
+# Import the array library for compact, typed storage of column data
+import array
+# Import the calendar library to convert dates to epoch seconds
+import calendar
+# Import the operator library to combine the parts of each row's epoch seconds without a python loop
+import operator
+
+# The name of the column of epoch seconds that every log with a date and a time has, see ParsedLog.epoch_column()
+EPOCH_COLUMN = 'epoch'
+# The epoch seconds given to rows whose date or time cannot be read
+MISSING_EPOCH = -2 ** 63
+# The number of each month in the abbreviated month names of apache dates
+MONTH_NUMBERS = {'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+                 'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12}
+
+
+# Returns the epoch seconds of the start of a date in the W3C (yyyy-mm-dd) or apache (dd/Mon/yyyy) format,
+# or None if it is not a date
+def date_epoch(date):
+    try:
+        if '/' in date:
+            day, month, year = date.split('/')
+            month = MONTH_NUMBERS[month]
+        else:
+            year, month, day = date.split('-')
+        return calendar.timegm((int(year), int(month), int(day), 0, 0, 0))
+    except (TypeError, ValueError, KeyError):
+        return None
+
+
+# Returns the number of seconds into the day of a HH:MM:SS time, ignoring any fraction of a second,
+# or None if it is not a time
+def seconds_of_day(time):
+    try:
+        return int(time[0:2]) * 3600 + int(time[3:5]) * 60 + int(time[6:8])
+    except (TypeError, ValueError):
+        return None
+
+
+# Returns the offset in seconds from UTC of an apache time zone such as -0700, or 0 if there is none
+def zone_offset(zone):
+    try:
+        offset = int(zone[1:3]) * 3600 + int(zone[3:5]) * 60
+    except (TypeError, ValueError):
+        return 0
+    return -offset if zone[0] == '-' else offset
+
+
+# The SymbolTable class holds the distinct values of a dictionary-encoded column, each stored once and numbered
+# by its code in the order it was first seen. A symbol table can be shared by the columns of the same field in
+# several ParsedLogs, such as the batches of one parse, so a value has the same code in all of them and analyses
+# can count codes from one batch to the next instead of hashing strings.
+class SymbolTable:
+
+    # Constructor
+    def __init__(self):
+        self.symbols = []
+        self._lookup = {}
+        self._derived = {}
+
+    # Returns the table of the code for each value, building it first if the table was unpickled
+    def _get_lookup(self):
+        if self._lookup is None:
+            self._lookup = {value: code for code, value in enumerate(self.symbols)}
+        return self._lookup
+
+    # Returns the code of a value, adding the value to the table if it is new
+    def code(self, value):
+        lookup = self._get_lookup()
+        code = lookup.get(value)
+        if code is None:
+            code = len(self.symbols)
+            lookup[value] = code
+            self.symbols.append(value)
+        return code
+
+    # Returns the list of the codes of a sequence of values, adding any new values to the table
+    # New values are added to the table first, so the codes can then be looked up in a single pass
+    def codes(self, values):
+        lookup = self._get_lookup()
+        symbols = self.symbols
+        new_values = [value for value in dict.fromkeys(values) if value not in lookup]
+        lookup.update(zip(new_values, range(len(symbols), len(symbols) + len(new_values))))
+        symbols.extend(new_values)
+        return list(map(lookup.__getitem__, values))
+
+    # Returns a list of function(symbol) for every symbol, indexed by code, so a value derived from a column's
+    # values (such as a number parsed from them) is worked out once per distinct value instead of once per row.
+    # The list is kept under key and only extended with the symbols added to the table since it was last asked for
+    def derived(self, key, function):
+        derived_values = self._derived.get(key)
+        if derived_values is None:
+            derived_values = []
+            self._derived[key] = derived_values
+        if len(derived_values) < len(self.symbols):
+            derived_values.extend(map(function, self.symbols[len(derived_values):]))
+        return derived_values
+
+    # Only the symbols are pickled, so the lookup and derived tables are not sent between processes or written to
+    # the parse cache. They are rebuilt from the symbols when they are next needed
+    def __getstate__(self):
+        return self.symbols
+
+    def __setstate__(self, state):
+        self.symbols = state
+        self._lookup = None
+        self._derived = {}
+
+    def __len__(self):
+        return len(self.symbols)
+
+
+# The StringColumn class stores one column of a parsed log as a dictionary-encoded array.
+# Each distinct value is stored once in the column's symbol table and every row only holds a small integer code
+# pointing into it, which is far cheaper than keeping a separate str object per row.
+# symbol_table is the SymbolTable to encode the values with, a new one is made for the column if it is not given
+class StringColumn:
+
+    # Constructor
+    def __init__(self, symbol_table=None):
+        self.codes = array.array('I')
+        self.symbol_table = symbol_table if symbol_table is not None else SymbolTable()
+
+    # The distinct values of the column's symbol table, indexed by code
+    @property
+    def symbols(self):
+        return self.symbol_table.symbols
+
+    # Adds a single value to the end of the column
+    def append(self, value):
+        self.codes.append(self.symbol_table.code(value))
+
+    # Adds a sequence of values to the end of the column
+    def extend_values(self, values):
+        self.codes.fromlist(self.symbol_table.codes(values))
+
+    # Adds a run of missing (None) values, used when a column appears after rows were already stored
+    def append_missing(self, count):
+        if count > 0:
+            self.codes.extend(array.array('I', [self.symbol_table.code(None)]) * count)
+
+    # Appends all the values of another StringColumn. The codes are copied as they are if both columns share a
+    # symbol table, otherwise they are re-mapped into this column's symbol table
+    def extend(self, other):
+        if other.symbol_table is self.symbol_table:
+            self.codes.extend(other.codes)
+            return
+        remap = [self.symbol_table.code(value) for value in other.symbols]
+        self.codes.fromlist(list(map(remap.__getitem__, other.codes)))
+
+    # Returns the values of the column between the start and end rows
+    def values(self, start=0, end=None):
+        return map(self.symbols.__getitem__, self.codes[start:end])
+
+    def __getitem__(self, index):
+        return self.symbols[self.codes[index]]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        symbols = self.symbols
+        return (symbols[code] for code in self.codes)
+
+
+# The IntColumn class stores a column of 64 bit integers, such as the epoch seconds of each row of a log
+class IntColumn:
+
+    # Constructor
+    def __init__(self):
+        self.data = array.array('q')
+
+    # Adds a sequence of values to the end of the column
+    def extend_values(self, values):
+        self.data.fromlist(values)
+
+    # Appends all the values of another IntColumn
+    def extend(self, other):
+        self.data.extend(other.data)
+
+    # Returns the values of the column between the start and end rows
+    def values(self, start=0, end=None):
+        return self.data[start:end]
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+
+# The LogSchema class holds the header metadata of a parsed log.
+# columns is the list of column names in the order they appear on each row,
+# field_map maps every known field name (both the log's own names and the universal names) to a column index,
+# or -1 if the field is not present in the log,
+# headers holds any header lines / flags that were read from the log (such as the W3C '#Fields:' line)
+class LogSchema:
+
+    # Constructor
+    def __init__(self, columns, field_map=None, headers=None):
+        self.columns = list(columns)
+        self.field_map = dict(field_map) if field_map is not None else {}
+        self.headers = headers if headers is not None else {}
+
+    # Returns the column index of the named field, or -1 if the field is not present
+    def index(self, name):
+        index = self.field_map.get(name)
+        if index is None:
+            if name in self.columns:
+                return self.columns.index(name)
+            return -1
+        return index
+
+    # Returns the header metadata in the shape of the original dictionary parse result
+    def to_dict(self):
+        metadata = dict(self.headers)
+        metadata.update(self.field_map)
+        return metadata
+
+
+# The ParsedLog class is the result of parsing a log file.
+# Each column is stored separately as a StringColumn, and the header metadata is stored in a LogSchema.
+# For compatibility with code written against the original dictionary parse result, a ParsedLog can still be
+# indexed like that dictionary: parsed_log[i] returns row i as a list, parsed_log['length'] returns the number
+# of rows, and parsed_log['client-ip'] returns the column index of the client ip field.
+# aggregates holds the accumulators of analyses that have been run on the log, see aggregate(). They are not pickled
+# symbol_tables maps column names to the SymbolTable their values are encoded with. Passing the symbol_tables of
+# one ParsedLog to the next, as the parsers do for the batches of a log, makes their columns share symbol tables
+class ParsedLog:
+
+    # Constructor
+    def __init__(self, schema, symbol_tables=None):
+        self.schema = schema
+        self.symbol_tables = symbol_tables if symbol_tables is not None else {}
+        self._columns = [self._new_column(name) for name in schema.columns]
+        self._length = 0
+        self._epoch = None
+        self.aggregates = {}
+
+    # Returns a new empty column for the named field, sharing the log's symbol table for that field
+    # Unnamed columns get their own symbol table
+    def _new_column(self, name):
+        if name is None:
+            return StringColumn()
+        symbol_table = self.symbol_tables.get(name)
+        if symbol_table is None:
+            symbol_table = SymbolTable()
+            self.symbol_tables[name] = symbol_table
+        return StringColumn(symbol_table)
+
+    # Creates a ParsedLog from a dictionary in the shape of the original parse result
+    @classmethod
+    def from_dict(cls, log_data):
+        if log_data is None:
+            return None
+
+        headers = {}
+        field_map = {}
+        for key, value in log_data.items():
+            if isinstance(key, int) or key == 'length':
+                continue
+            if str(key).startswith('#') or key == 'fields' or not isinstance(value, int):
+                headers[key] = value
+            else:
+                field_map[key] = value
+
+        length = log_data.get('length', 0)
+        width = 0
+        for i in range(0, length):
+            width = max(width, len(log_data[i]))
+
+        # Name each column after the field that points at it, preferring the names on a W3C '#Fields:' line
+        columns = [None] * width
+        if '#Fields:' in headers:
+            for j, name in enumerate(headers['#Fields:'][1:width + 1]):
+                columns[j] = name
+        for name, index in field_map.items():
+            if 0 <= index < width and columns[index] is None:
+                columns[index] = name
+
+        parsed_log = cls(LogSchema(columns, field_map, headers))
+        for i in range(0, length):
+            parsed_log.append_row(log_data[i])
+        return parsed_log
+
+    # Returns the given parse result as a ParsedLog, converting it if it is in the original dictionary shape
+    @classmethod
+    def coerce(cls, parsed_log):
+        if parsed_log is None or isinstance(parsed_log, ParsedLog):
+            return parsed_log
+        return cls.from_dict(parsed_log)
+
+    # Adds a row of values to the end of the log
+    def append_row(self, values):
+        columns = self._columns
+        # Rows that are wider than the schema get extra, unnamed columns
+        while len(values) > len(columns):
+            column = StringColumn()
+            column.append_missing(self._length)
+            columns.append(column)
+            self.schema.columns.append(None)
+
+        for column, value in zip(columns, values):
+            column.append(value)
+        for column in columns[len(values):]:
+            column.append(None)
+        self._length += 1
+
+    # Adds a list of rows to the end of the log
+    # Rows that all have one value per column are stored a column at a time, which is much faster than
+    # adding them one row at a time
+    def append_rows(self, rows):
+        if not rows:
+            return
+        if set(map(len, rows)) != {len(self._columns)}:
+            for values in rows:
+                self.append_row(values)
+            return
+
+        for column, values in zip(self._columns, zip(*rows)):
+            column.extend_values(values)
+        self._length += len(rows)
+
+    # Adds a column for the named field to the right of the others, with a missing value for every row stored so far
+    def add_column(self, name):
+        column = self._new_column(name)
+        column.append_missing(self._length)
+        self._columns.append(column)
+        self.schema.columns.append(name)
+        return column
+
+    # Appends every row of another ParsedLog. A log whose columns start with the columns of this one, or the other
+    # way around, is appended column by column. Otherwise its columns are matched to these by name, as for the
+    # segments of a W3C log that changed its fields, and columns that only one of the logs has are filled with
+    # missing values. The field names of the other log are pointed at the columns they name in this one, and its
+    # headers, which were read further on in the log, replace these
+    def extend(self, other):
+        if other is None:
+            return
+        names = self.schema.columns
+        other_names = other.schema.columns
+        width = min(len(names), len(other_names))
+        if names[:width] == other_names[:width]:
+            for i in range(len(names), len(other_names)):
+                self.add_column(other_names[i])
+            other_columns = other._columns + [None] * (len(names) - len(other_names))
+        else:
+            for name in other_names:
+                if name is not None and name not in names:
+                    self.add_column(name)
+            other_columns = [other._columns[other_names.index(name)] if name is not None and name in other_names
+                             else None for name in names]
+
+        for column, other_column in zip(self._columns, other_columns):
+            if other_column is not None:
+                column.extend(other_column)
+            else:
+                column.append_missing(other._length)
+        for name, index in other.schema.field_map.items():
+            if 0 <= index < len(other_names) and other_names[index] is not None and self.schema.index(name) < 0:
+                self.schema.field_map[name] = names.index(other_names[index])
+        self.schema.headers.update(other.schema.headers)
+        # The epoch seconds of the other log are kept if both logs have all of theirs, otherwise the missing ones are
+        # worked out the next time they are needed
+        if self._epoch is not None and len(self._epoch) == self._length and \
+                other._epoch is not None and len(other._epoch) == other._length:
+            self._epoch.extend(other._epoch)
+        self._length += other._length
+
+    # Returns an IntColumn of the epoch seconds (UTC) of every row, from its date and time and, for logs that record
+    # one, its time zone. The column is kept with the log and only the rows added since it was last asked for are
+    # worked out. The start of each distinct date, the seconds of each distinct time and the offset of each distinct
+    # zone are only converted once, through the symbol tables of their columns.
+    # Rows whose date or time cannot be read get MISSING_EPOCH. Returns None if the log has no date or no time
+    def epoch_column(self):
+        dates = self.column('date')
+        times = self.column('timestamp')
+        if dates is None or times is None:
+            return None
+        if self._epoch is None:
+            self._epoch = IntColumn()
+        start = len(self._epoch)
+        if start >= self._length:
+            return self._epoch
+
+        day_starts = dates.symbol_table.derived('day-start', date_epoch)
+        seconds = times.symbol_table.derived('seconds', seconds_of_day)
+        zones = self.column('time-zone')
+        offsets = zones.symbol_table.derived('offset', zone_offset) if zones is not None else []
+        date_codes = dates.codes[start:]
+        time_codes = times.codes[start:]
+
+        if None in day_starts or None in seconds or len(set(offsets)) > 1:
+            zone_codes = zones.codes[start:] if zones is not None else [0] * len(date_codes)
+            offsets = offsets or [0]
+            epochs = []
+            for date_code, time_code, zone_code in zip(date_codes, time_codes, zone_codes):
+                day = day_starts[date_code]
+                second = seconds[time_code]
+                if day is None or second is None:
+                    epochs.append(MISSING_EPOCH)
+                else:
+                    epochs.append(day + second - offsets[zone_code])
+        else:
+            # Every row is in the same time zone, so its offset is taken off the start of each date instead
+            offset = offsets[0] if offsets else 0
+            day_starts = [day - offset for day in day_starts]
+            epochs = list(map(operator.add, map(day_starts.__getitem__, date_codes),
+                              map(seconds.__getitem__, time_codes)))
+        self._epoch.extend_values(epochs)
+        return self._epoch
+
+    # Returns the accumulator stored under name, first folding in any rows that were added to the log since it was
+    # last updated. The accumulator is made by calling create() the first time.
+    # Accumulators are kept with the log, so running an analysis again, or after new rows were appended by an
+    # incremental parse, only has to process the rows it has not seen. They are not pickled with the log, see
+    # __getstate__
+    def aggregate(self, name, create):
+        accumulator = self.aggregates.get(name)
+        if accumulator is None:
+            accumulator = create()
+            self.aggregates[name] = accumulator
+        if accumulator.row_count < self._length:
+            accumulator.update(self, accumulator.row_count)
+        return accumulator
+
+    # Returns the column for the named field, or None if the log does not contain that field
+    # The EPOCH_COLUMN is the IntColumn returned by epoch_column()
+    def column(self, name):
+        index = self.schema.index(name)
+        if index < 0 or index >= len(self._columns):
+            if name == EPOCH_COLUMN:
+                return self.epoch_column()
+            return None
+        return self._columns[index]
+
+    # Returns row i as a list of values, in the same order as the columns
+    def row(self, index):
+        if index < 0:
+            index += self._length
+        if index < 0 or index >= self._length:
+            raise IndexError(index)
+        values = [column[index] for column in self._columns]
+        # Drop the padding added for rows that were narrower than the schema
+        while values and values[-1] is None:
+            values.pop()
+        return values
+
+    # Iterates over every row of the log as a list of values
+    def rows(self):
+        for i in range(0, self._length):
+            yield self.row(i)
+
+    # Returns the log in the shape of the original dictionary parse result
+    def to_dict(self):
+        log_data = self.schema.to_dict()
+        for i in range(0, self._length):
+            log_data[i] = self.row(i)
+        log_data['length'] = self._length
+        return log_data
+
+    # Dictionary style access for code written against the original parse result
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except (KeyError, IndexError):
+            return default
+
+    @property
+    def length(self):
+        return self._length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self.row(key)
+        if key == 'length':
+            return self._length
+        if key in self.schema.field_map:
+            return self.schema.field_map[key]
+        return self.schema.headers[key]
+
+    def __contains__(self, key):
+        if isinstance(key, int):
+            return 0 <= key < self._length
+        return key == 'length' or key in self.schema.field_map or key in self.schema.headers
+
+    # The aggregates are not pickled, so they are not written to the parse cache or sent between processes. Some of
+    # them hold state that does not unpickle reliably, such as the id() keyed remaps of a ColumnRecoder, and an
+    # analysis that is run again on an unpickled log builds its accumulator from the rows
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['aggregates'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.aggregates = {}
+
+    def __eq__(self, other):
+        if isinstance(other, ParsedLog):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return 'ParsedLog(columns=' + repr(self.schema.columns) + ', length=' + str(self._length) + ')'
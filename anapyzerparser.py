@@ -1,12 +1,376 @@
 # Import the pathlib library for cross platform file path abstraction
 import pathlib
+# Import the operator library for fast reordering of matched fields
+import operator
 # Import the re library to support regular expressions
 import re
+# Import the ParsedLog container that parse results are stored in
+from anapyzerparsedlog import ParsedLog, LogSchema
+# Import the memory mapped log file that can be parsed as bytes
+from anapyzerlogfile import MappedLogFile
+# Import the compiled apache LogFormat strings that logs with custom configurations are parsed with
+from anapyzerlogformat import ApacheLogFormat
+
+# Names for the log formats that the parser can read
+LOG_FORMAT_APACHE = 'apache'
+LOG_FORMAT_W3C = 'w3c'
+
+# The number of parsed rows collected before they are stored in a ParsedLog
+PENDING_ROWS = 4096
+
+# The fields of a parsed apache log, in the order they are stored in each row
+APACHE_COLUMNS = ['date', 'timestamp', 'client-ip', 'method', 'uri-stem', 'sc-status', 'bytes-sent', 'referer',
+                  'user-agent', 'protocol', 'username', 'host', 'time-zone']
+
+
+# Builds the precompiled patterns for each of the supported apache log formats, from the pattern used for a quoted
+# field and the pattern used for the quoted request line. Returns a tuple of the (common, combined, vhost combined)
+# patterns. Reference for the formats:
+# https://httpd.apache.org/docs/2.4/logs.html#accesslog
+def _compile_apache_patterns(quoted, request):
+    # Common: %h %l %u %t "%r" %>s %b
+    common = r'([^ ]+) [^ ]+ ([^ ]+) \[([^:\]]+):([^ \]]+) ?([^\]]*)\] ' + request + r' ([^ ]+) ([^ \r\n]+)'
+    # Combined: %h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-agent}i"
+    combined = common + ' ' + quoted + ' ' + quoted
+    # Combined with virtual host: %v:%p %h %l %u %t "%r" %>s %O "%{Referer}i" "%{User-Agent}i"
+    vhost_combined = r'([^ ]+) ' + combined
+    return re.compile(common), re.compile(combined), re.compile(vhost_combined)
+
+
+# The patterns used for almost every line, where quoted fields do not contain any quotes themselves.
+# The request line is split into the method, the uri and the protocol, any of which may be missing ("-")
+APACHE_PATTERNS = _compile_apache_patterns(r'"([^"]*)"', r'"(?:([A-Za-z]+) )?([^" ]*)(?: ([^"]*))?"')
+APACHE_COMMON_PATTERN, APACHE_COMBINED_PATTERN, APACHE_VHOST_COMBINED_PATTERN = APACHE_PATTERNS
+
+# The slower patterns for lines with backslash escaped quotes in a quoted field,
+# such as a user agent of "Mozilla \"compatible\""
+APACHE_ESCAPED_PATTERNS = _compile_apache_patterns(r'"([^"\\]*(?:\\.[^"\\]*)*)"',
+                                                   r'"(?:([A-Za-z]+) )?([^"\\ ]*(?:\\.[^"\\ ]*)*)(?: ([^"]*))?"')
+
+
+# Builds a single precompiled pattern that matches a line of any of the supported apache log formats, from the
+# pattern used for a quoted field and the pattern used for the quoted request line, and the pattern of what may
+# follow the line. The host and port of the vhost combined format are a fourth optional token before the timestamp,
+# and the referer and user agent of the combined formats are optional groups, so a line is parsed with one match
+# whatever format it is in. The quantifiers are possessive, as a field never has to give characters back
+def _compile_apache_line_pattern(quoted, request, end=''):
+    return re.compile(r'([^ ]++) ([^ ]++) ([^ ]++) (?:([^ \[]++) )?\[([^:\]]++):([^ \]]++) ?([^\]]*+)\] ' + request +
+                      r' ([^ ]++) ([^ \r\n]++)(?: ' + quoted + ' ' + quoted + ')?' + end)
+
+
+# The line pattern used for almost every line, where quoted fields do not contain any quotes themselves. It only
+# matches a whole line, so a line with escaped quotes in it, which this pattern would cut short, does not match it
+APACHE_LINE_PATTERN = _compile_apache_line_pattern(r'"([^"]*+)"', r'"(?:([A-Za-z]++) )?([^" ]*+)(?: ([^"]*+))?"',
+                                                   r'(?![^\r\n])')
+# The slower line pattern for the lines that do not match the whole line pattern, such as lines with backslash
+# escaped quotes in a quoted field, or lines with more fields after the ones of their format
+APACHE_ESCAPED_LINE_PATTERN = _compile_apache_line_pattern(
+    r'"([^"\\]*+(?:\\.[^"\\]*+)*+)"', r'"(?:([A-Za-z]++) )?([^"\\ ]*+(?:\\.[^"\\ ]*+)*+)(?: ([^"]*+))?"')
+
+# Functions that reorder the groups matched by the line pattern into the order of APACHE_COLUMNS, for the common and
+# combined formats and for the vhost combined format. The common and combined formats have no host, which is taken
+# from the fourth token group that only the vhost combined format has, so it is '-' like the other missing fields
+_APACHE_LINE_ROW = operator.itemgetter(4, 5, 0, 7, 8, 10, 11, 12, 13, 9, 2, 3, 6)
+_APACHE_VHOST_LINE_ROW = operator.itemgetter(4, 5, 1, 7, 8, 10, 11, 12, 13, 9, 3, 0, 6)
+
+# The same line patterns compiled for matching lines read as bytes from a memory mapped file
+APACHE_LINE_BYTES_PATTERN = re.compile(APACHE_LINE_PATTERN.pattern.encode())
+APACHE_ESCAPED_LINE_BYTES_PATTERN = re.compile(APACHE_ESCAPED_LINE_PATTERN.pattern.encode())
+
+# The fields that can be found in a W3C / IIS log, using the official IIS naming convention
+W3C_PARAMETERS = ['date', 'time', 's-sitename', 's-computername', 's-ip', 'cs-method', 'cs-uri-stem',
+                  'cs-uri-query', 's-port', 'cs-username', 'c-ip', 'cs(UserAgent)', 'cs(Cookie)',
+                  'cs(Referer)', 'cs-host', 'sc-status', 'sc-substatus', 'sc-win32-status', 'sc-bytes',
+                  'cs-bytes', 'time-taken']
+
+# The universal name used by the analyzers for each of the W3C_PARAMETERS above
+UNIVERSAL_NAMES = ['date', 'timestamp', 'service-name', 'server-name', 'server-ip', 'method', 'uri-stem',
+                   'uri-query', 'server-port', 'username', 'client-ip', 'user-agent', 'cookie',
+                   'referer', 'host', 'http-status', 'protocol-substatus', 'win32-status', 'bytes-sent',
+                   'bytes-received', 'time-taken']
+
+
+# The fields of APACHE_COLUMNS that each apache log format does not record
+_APACHE_COMMON_MISSING = ['referer', 'user-agent', 'host']
+_APACHE_COMBINED_MISSING = ['host']
+
+
+# Returns the columns of APACHE_COLUMNS that an apache log line records, found from the format it is in:
+# common, combined or vhost combined. Returns None if the line is not in any of them
+def _apache_line_columns(line):
+    patterns = APACHE_ESCAPED_PATTERNS if '\\"' in line else APACHE_PATTERNS
+    common, combined, vhost_combined = patterns
+    if vhost_combined.match(line):
+        missing = []
+    elif combined.match(line):
+        missing = _APACHE_COMBINED_MISSING
+    elif common.match(line):
+        missing = _APACHE_COMMON_MISSING
+    else:
+        return None
+    return [name for name in APACHE_COLUMNS if name not in missing]
+
+
+# Detects the format of a log from a sample of its first lines, such as the ones read by read_log_sample().
+# A W3C '#Fields' header marks a W3C / IIS log, otherwise the log is taken to be an apache log if most of its
+# lines are in the common, combined or vhost combined format.
+# Returns the log format (LOG_FORMAT_W3C or LOG_FORMAT_APACHE) and the universal names of the fields the log
+# records, or (None, None) if the format was not recognised
+def detect_log_format(lines):
+    line_count = 0
+    apache_columns = set()
+    apache_line_count = 0
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.startswith('#Fields:'):
+            fields = line.split(' ')[1:]
+            names = dict(zip(W3C_PARAMETERS, UNIVERSAL_NAMES))
+            return LOG_FORMAT_W3C, [names.get(field, field) for field in fields]
+        if not line or line.startswith('#'):
+            continue
+
+        line_count += 1
+        columns = _apache_line_columns(line)
+        if columns is not None:
+            apache_line_count += 1
+            apache_columns.update(columns)
+
+    if apache_line_count > 0 and apache_line_count * 2 >= line_count:
+        return LOG_FORMAT_APACHE, [name for name in APACHE_COLUMNS if name in apache_columns]
+    return None, None
+
+
+# The categories of malformed lines counted by MalformedLines
+MALFORMED_BLANK = 'blank line'
+MALFORMED_NO_TIMESTAMP = 'no timestamp'
+MALFORMED_TRUNCATED = 'truncated line'
+MALFORMED_UNRECOGNISED = 'unrecognised format'
+MALFORMED_NO_FIELDS = 'no #Fields header'
+MALFORMED_FIELD_COUNT = 'wrong number of fields'
+
+# The number of malformed line numbers that MalformedLines keeps as a sample
+MALFORMED_SAMPLE_SIZE = 20
+
+
+# The MalformedLines class counts the lines that a lenient parse skipped because they could not be parsed.
+# Passing a MalformedLines to a parse method makes the parse lenient: instead of raising an IndexError at the first
+# line that cannot be parsed, the line is skipped and counted here by its category, and the line numbers of the
+# first sample_size of them are kept so they can be found in the log.
+# line_count is the number of lines read so far, so the same MalformedLines can be passed to the parses of the
+# consecutive parts of a log, such as the lines appended to it since it was last parsed
+class MalformedLines:
+
+    # Constructor
+    def __init__(self, sample_size=MALFORMED_SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self.counts = {}
+        self.sample = []
+        self.line_count = 0
+
+    # Counts a skipped line. line_number counts from 1 at the first line of the log.
+    # Each line of the sample is a (source, line number, category) tuple, see extend()
+    def add(self, line_number, category):
+        self.counts[category] = self.counts.get(category, 0) + 1
+        if len(self.sample) < self.sample_size:
+            self.sample.append((None, line_number, category))
+
+    # Adds the skipped lines of other, which counted the lines that come after the lines counted by this one.
+    # source names the log file that other counted the lines of, when a parse reads several files
+    def extend(self, other, source=None):
+        for category, count in other.counts.items():
+            self.counts[category] = self.counts.get(category, 0) + count
+        for sample_source, line_number, category in other.sample[:max(0, self.sample_size - len(self.sample))]:
+            if source is not None:
+                self.sample.append((source, line_number, category))
+            else:
+                self.sample.append((sample_source, self.line_count + line_number, category))
+        if source is None:
+            self.line_count += other.line_count
+
+    # The total number of lines that were skipped
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    # Returns a description of the skipped lines to show with a report or graph, or an empty string if none were
+    def summary(self):
+        if not self.counts:
+            return ''
+        summary = "Skipped " + str(self.total) + " malformed line" + ("s" if self.total != 1 else "") + " ("
+        summary += ", ".join(str(count) + " " + category for category, count in
+                             sorted(self.counts.items(), key=lambda t: t[1], reverse=True))
+        summary += ")\nSample of malformed lines: "
+        summary += ", ".join((str(source) + ":" if source is not None else "") + str(line_number)
+                             for source, line_number, category in self.sample)
+        if self.total > len(self.sample):
+            summary += ", ..."
+        return summary
+
+    def __eq__(self, other):
+        return isinstance(other, MalformedLines) and (self.counts, self.sample, self.line_count) == (
+            other.counts, other.sample, other.line_count)
+
+    def __repr__(self):
+        return 'MalformedLines(' + repr(self.counts) + ', ' + repr(self.sample) + ')'
+
+
+# Returns the MALFORMED_ category of an apache log line that could not be parsed
+def _apache_malformed_category(line):
+    if isinstance(line, bytes):
+        line = line.decode('utf-8', 'replace')
+    line = line.rstrip('\r\n')
+    if not line.strip():
+        return MALFORMED_BLANK
+    timestamp_start = line.find(' [')
+    if timestamp_start < 0 or line.find(']', timestamp_start) < 0:
+        return MALFORMED_NO_TIMESTAMP
+    # A line cut off part of the way through has a quoted field that is never closed
+    if (line.count('"') - line.count('\\"')) % 2 == 1 or line.endswith(' '):
+        return MALFORMED_TRUNCATED
+    return MALFORMED_UNRECOGNISED
+
+
+# Returns the MALFORMED_ category of a split W3C data line that does not have the field_count fields of its header
+def _w3c_malformed_category(split_line, field_count):
+    if split_line == ['']:
+        return MALFORMED_BLANK
+    if len(split_line) < field_count:
+        return MALFORMED_TRUNCATED
+    return MALFORMED_FIELD_COUNT
+
+
+# Projects a field_map onto the requested field names.
+# Returns the names of the requested fields that are present in the log, the position of each of those fields in
+# a full row, and a field_map with every field pointing at its index in the projected row, or -1 if it was dropped
+def _project_field_map(field_map, requested):
+    names = []
+    positions = []
+    for name in requested:
+        position = field_map.get(name, -1)
+        if position >= 0 and position not in positions:
+            names.append(name)
+            positions.append(position)
+
+    projected_field_map = {}
+    for name, position in field_map.items():
+        projected_field_map[name] = positions.index(position) if position in positions else -1
+    return names, positions, projected_field_map
+
+
+# The universal name of each W3C field, used to tell whether a requested field is already a column under its other name
+_W3C_UNIVERSAL_NAMES = dict(zip(W3C_PARAMETERS, UNIVERSAL_NAMES))
+
+
+# Adds the columns of a W3C '#Fields' header that are not columns yet to the right of columns, which is the single
+# column layout that every segment of the log is stored in, and returns the position in the header's lines of each
+# of the columns, or -1 for a column that the segment does not record.
+# Without requested_parameters every field of the header is a column, otherwise only the requested fields are, under
+# the name they were requested by. field_map holds the positions of the header's fields, see _read_w3c_header
+def _w3c_segment_positions(split_line, field_map, columns, requested_parameters):
+    header_positions = {}
+    for position, field in enumerate(split_line[1:]):
+        header_positions.setdefault(field, position)
+
+    if requested_parameters is None:
+        columns.extend(field for field in header_positions if field not in columns)
+    else:
+        covered = {_W3C_UNIVERSAL_NAMES.get(name, name) for name in columns}
+        for name in requested_parameters:
+            universal_name = _W3C_UNIVERSAL_NAMES.get(name, name)
+            if universal_name not in covered and header_positions.get(name, field_map.get(name, -1)) >= 0:
+                columns.append(name)
+                covered.add(universal_name)
+    return [header_positions.get(name, field_map.get(name, -1)) for name in columns]
+
+
+# Returns the field map of the single column layout of a W3C log, which points both the W3C name and the universal
+# name of each field at the column that holds it, whichever of the two the column is named by, or at -1
+def _w3c_columns_field_map(columns):
+    field_map = {}
+    for parameter, universal_name in zip(W3C_PARAMETERS, UNIVERSAL_NAMES):
+        index = -1
+        if parameter in columns:
+            index = columns.index(parameter)
+        elif universal_name in columns:
+            index = columns.index(universal_name)
+        field_map[parameter] = index
+        field_map[universal_name] = index
+    return field_map
+
+
+# Returns a function that picks the values at the given positions out of a split line, in order.
+# A position that is negative or past the end of a short line gives None
+def _row_projector(positions):
+    getter = operator.itemgetter(*positions) if len(positions) > 1 and min(positions) >= 0 else None
+
+    def project(values):
+        if getter is not None:
+            try:
+                return getter(values)
+            except IndexError:
+                pass
+        return [values[position] if 0 <= position < len(values) else None for position in positions]
+
+    return project
+
+
+# Works out the epoch seconds of the rows of a parsed batch before it is yielded, so every parsed log has its
+# epoch column computed once while it is being parsed, see ParsedLog.epoch_column()
+def _with_epochs(log_data):
+    log_data.epoch_column()
+    return log_data
+
+
+# Counts a line that could not be parsed in malformed_lines, or raises an IndexError if the parse is not lenient
+def _skip_malformed_line(malformed_lines, line_number, category):
+    if malformed_lines is None:
+        raise IndexError("Line " + str(line_number) + " could not be parsed: " + category)
+    malformed_lines.add(line_number, category)
+
+
+# Parses the lines of a log that has a single line format, such as an apache log, into ParsedLog batches of the
+# given schema with at most batch_size rows, or a single ParsedLog if batch_size is None.
+# match_line returns the row of values of a line, or None if the line cannot be parsed, and malformed_category
+# returns the MALFORMED_ category of a line that could not be
+def _iter_matched_batches(in_file, match_line, malformed_category, schema, batch_size, malformed_lines):
+    # The batches share their symbol tables, so a value has the same code in every batch
+    symbol_tables = {}
+    log_data = ParsedLog(LogSchema(schema.columns, schema.field_map), symbol_tables)
+    rows = []
+    pending_rows = PENDING_ROWS if batch_size is None else min(batch_size, PENDING_ROWS)
+    first_line = malformed_lines.line_count if malformed_lines is not None else 0
+    line_number = first_line
+
+    # as long as there are lines in the log
+    for line_number, line in enumerate(in_file, first_line + 1):
+        row = match_line(line)
+        if row is None:
+            _skip_malformed_line(malformed_lines, line_number, malformed_category(line))
+            continue
+        rows.append(row)
+
+        # Parsed rows are stored in the log a block at a time
+        if len(rows) >= pending_rows:
+            log_data.append_rows(rows)
+            rows = []
+
+            if batch_size is not None and log_data.length >= batch_size:
+                yield _with_epochs(log_data)
+                log_data = ParsedLog(LogSchema(schema.columns, schema.field_map), symbol_tables)
+
+    if malformed_lines is not None:
+        malformed_lines.line_count = line_number
+    log_data.append_rows(rows)
+    if log_data.length > 0:
+        yield _with_epochs(log_data)
+
 
 # The AnaPyzerParser class contains all methods involved in parsing information from a text or log file.
 
 
 class AnaPyzerParser:
+    # The number of rows in each batch yielded by the iter_*_batches methods
+    DEFAULT_BATCH_SIZE = 65536
 
     # Constructor
     def __init__(self):
@@ -15,77 +379,196 @@ class AnaPyzerParser:
         self._error_listener = None
         self._success_listener = None
 
-    # parse_common_apache_to_list() parses an apache log that has been exported in the common, default format by an
-    #  apache web server. This method is in need of additional work that will make it functional with logs
-    # that have custom configurations
+    # iter_batches() yields ParsedLog batches from a log file in the given log format (LOG_FORMAT_APACHE,
+    # LOG_FORMAT_W3C or an ApacheLogFormat compiled from a custom LogFormat string) using the matching
+    # iter_*_batches method.
+    # If malformed_lines is given, lines that cannot be parsed are skipped and counted in it instead of raising an
+    # IndexError, see MalformedLines. The same goes for every parse method of the parser
+    @classmethod
+    def iter_batches(cls, in_file, log_format, batch_size=DEFAULT_BATCH_SIZE, requested_parameters=None,
+                     malformed_lines=None):
+        if isinstance(log_format, ApacheLogFormat):
+            return cls.iter_log_format_batches(in_file, log_format, batch_size, requested_parameters,
+                                               malformed_lines)
+        elif log_format == LOG_FORMAT_W3C:
+            return cls.iter_w3c_batches(in_file, batch_size, requested_parameters, malformed_lines)
+        elif log_format == LOG_FORMAT_APACHE:
+            return cls.iter_common_apache_batches(in_file, batch_size, requested_parameters, malformed_lines)
+        raise ValueError("Unknown log format: " + str(log_format))
+
+    # parse_common_apache_to_list() parses an apache log that has been exported in the common, combined or
+    # vhost combined format by an apache web server. Logs with other custom configurations are parsed by
+    # parse_log_format_to_list() instead.
     # Reference for Common Log Format:
     # https://httpd.apache.org/docs/1.3/logs.html#common
 
-    @staticmethod
-    def parse_common_apache_to_list(in_file):
+    @classmethod
+    def parse_common_apache_to_list(cls, in_file, malformed_lines=None):
         if not in_file:
             return None
-        log_data = {}
-
-        # universal_names = ['date', 'timestamp', 'service-name', 'server-name', 'server-ip', 'method', 'uri-stem',
-        #                   'uri-query', 'server-port', 'username', 'client-ip', 'user-agent', 'cookie',
-        #                   'referrer', 'host', 'http-status', 'protocol-substatus', 'win32-status', 'bytes-sent',
-        #                   'bytes-received', 'time-taken'] - Dan unused variable
 
-        # initialize placeholder variables in log_data array representing each of the w3c format parameters
-
-        i = 0
-        # as long as there are lines in the log
-        # Split string into list of individual words with space as delimiter lines in the file, loop:
-        for line in in_file:
-            # Use split to cut date/timestamp combined line out of data line
-            date_ts = line.split('[', 1)
-            # Use split to separate date and timestamp
-            date_ts = date_ts[1].split(":", 1)
-            # Isolate timestamp from remaining information in line
-            date_ts[1] = date_ts[1].split(' ', 1)[0]
-
-            # Create new split line for extracting other data
-            split_line = line.split(' ')
-
-            request_info = line.split('"', 2)[1]
-            referer = "-"
-            method = request_info.split('/', 1)[0]
-            # if the request was a GET method, then uri-stem server-client status and bytes received data should exist
-            if "GET" in method:
-                uri_stem = request_info.split(' ')[1]
-                sc_status = split_line[8]
-                bytes_received = split_line[9]
+        # A batch size of None collects the whole log into a single parsed log
+        log_data = None
+        for log_data in cls.iter_common_apache_batches(in_file, None, None, malformed_lines):
+            pass
 
-            else:
-                uri_stem = '-'
-                sc_status = '-'
-                bytes_received = '0'
-
-            client_ip = split_line[0]
+        # return the parsed log, or None if there were no lines of DATA in the log
+        return log_data
 
-            data = [date_ts[0], date_ts[1], client_ip, method, uri_stem, sc_status, bytes_received, referer]
+    # parse_common_apache_requested_to_list() parses an apache log in the same way as parse_common_apache_to_list,
+    # but only keeps the requested fields (by their names in APACHE_COLUMNS) in each row, in the requested order
+    @classmethod
+    def parse_common_apache_requested_to_list(cls, in_file, requested_parameters, malformed_lines=None):
+        if not in_file:
+            return None
 
-            log_data[i] = data
+        log_data = None
+        for log_data in cls.iter_common_apache_batches(in_file, None, requested_parameters, malformed_lines):
+            pass
+        return log_data
 
-            i += 1
+    # iter_common_apache_batches() parses an apache log in the same way as parse_common_apache_to_list, but yields
+    # the parsed lines as ParsedLog batches of at most batch_size rows while the file is still being read,
+    # so the whole log never has to be held in memory at once.
+    # If requested_parameters is given, only those fields are kept in each row
+    @classmethod
+    def iter_common_apache_batches(cls, in_file, batch_size=DEFAULT_BATCH_SIZE, requested_parameters=None,
+                                   malformed_lines=None):
+        # universal_names = ['date', 'timestamp', 'service-name', 'server-name', 'server-ip', 'method', 'uri-stem',
+        #                   'uri-query', 'server-port', 'username', 'client-ip', 'user-agent', 'cookie',
+        #                   'referrer', 'host', 'http-status', 'protocol-substatus', 'win32-status', 'bytes-sent',
+        #                   'bytes-received', 'time-taken'] - Dan unused variable
 
-        # length represents the number of lines of DATA present in returned parsed list
-        log_data['length'] = i
-        log_data['date'] = 0
-        log_data['timestamp'] = 1
-        log_data['client-ip'] = 2
-        log_data['method'] = 3
-        log_data['uri-stem'] = 4
-        log_data['sc-status'] = 5
-        log_data['bytes-sent'] = 6
-        log_data['referer'] = 7
+        # the position of each field in a parsed row
+        field_map = {name: i for i, name in enumerate(APACHE_COLUMNS)}
+        # A memory mapped file that only needs some of the fields is matched as bytes
+        if isinstance(in_file, MappedLogFile):
+            if requested_parameters is None:
+                requested_parameters = in_file.columns
+            if requested_parameters is not None:
+                yield from cls._iter_mapped_apache_batches(in_file, field_map, batch_size, requested_parameters,
+                                                           malformed_lines)
+                return
+
+        columns = APACHE_COLUMNS
+        match_line = cls._match_common_apache_line
+        if requested_parameters is not None:
+            columns, positions, field_map = _project_field_map(field_map, requested_parameters)
+            project = _row_projector(positions)
+
+            def match_line(line):
+                row = cls._match_common_apache_line(line)
+                return project(row) if row is not None else None
+
+        yield from _iter_matched_batches(in_file, match_line, _apache_malformed_category, LogSchema(columns, field_map),
+                                         batch_size, malformed_lines)
+
+    # Parses an apache log from a MappedLogFile, matching each line as bytes and only decoding the requested fields
+    @classmethod
+    def _iter_mapped_apache_batches(cls, in_file, field_map, batch_size, requested_parameters, malformed_lines=None):
+        columns, positions, projected_field_map = _project_field_map(field_map, requested_parameters)
+        # The batches share their symbol tables, so a value has the same code in every batch
+        symbol_tables = {}
+        log_data = ParsedLog(LogSchema(columns, projected_field_map), symbol_tables)
+        match_line = cls._match_common_apache_line
+        data = in_file.data()
+        rows = []
+        pending_rows = PENDING_ROWS if batch_size is None else min(batch_size, PENDING_ROWS)
+        first_line = malformed_lines.line_count if malformed_lines is not None else 0
+        line_number = first_line
+
+        for line_number, (start, end) in enumerate(in_file.iter_line_offsets(), first_line + 1):
+            row = match_line(data[start:end], APACHE_LINE_BYTES_PATTERN, APACHE_ESCAPED_LINE_BYTES_PATTERN, b'-', b'0')
+            if row is None:
+                _skip_malformed_line(malformed_lines, line_number, _apache_malformed_category(data[start:end]))
+                continue
+            rows.append([str(row[position], 'utf-8', 'replace') for position in positions])
+
+            if len(rows) >= pending_rows:
+                log_data.append_rows(rows)
+                rows = []
+
+                if batch_size is not None and log_data.length >= batch_size:
+                    yield _with_epochs(log_data)
+                    log_data = ParsedLog(LogSchema(columns, projected_field_map), symbol_tables)
+
+        if malformed_lines is not None:
+            malformed_lines.line_count = line_number
+        log_data.append_rows(rows)
+        if log_data.length > 0:
+            yield _with_epochs(log_data)
+
+    # parse_log_format_to_list() parses an apache log written with a custom LogFormat configuration, given as an
+    # ApacheLogFormat from anapyzerlogformat.compile_log_format(). If requested_parameters is given, only those
+    # fields (by their names in the log format's columns) are kept in each row, in the requested order
+    @classmethod
+    def parse_log_format_to_list(cls, in_file, log_format, requested_parameters=None, malformed_lines=None):
+        if not in_file:
+            return None
 
-        if log_data['length'] is 0:
-            log_data = None
-        # return the list containing data
+        log_data = None
+        for log_data in cls.iter_log_format_batches(in_file, log_format, None, requested_parameters,
+                                                    malformed_lines):
+            pass
         return log_data
 
+    # iter_log_format_batches() parses an apache log written with a custom LogFormat configuration in the same way
+    # as parse_log_format_to_list, but yields the parsed lines as ParsedLog batches of at most batch_size rows.
+    # Each line is matched against the single regular expression the format was compiled into, so a custom format
+    # is parsed as fast as the built in ones
+    @classmethod
+    def iter_log_format_batches(cls, in_file, log_format, batch_size=DEFAULT_BATCH_SIZE, requested_parameters=None,
+                                malformed_lines=None):
+        if isinstance(in_file, MappedLogFile) and requested_parameters is None:
+            requested_parameters = in_file.columns
+
+        columns = log_format.columns
+        field_map = dict(log_format.field_map)
+        match_line = log_format.match_line
+        if requested_parameters is not None:
+            columns, positions, field_map = _project_field_map(field_map, requested_parameters)
+            project = _row_projector(positions)
+
+            def match_line(line):
+                row = log_format.match_line(line)
+                return project(row) if row is not None else None
+
+        yield from _iter_matched_batches(in_file, match_line, _apache_malformed_category, LogSchema(columns, field_map),
+                                         batch_size, malformed_lines)
+
+    # Splits a single line of an apache common, combined or vhost combined format log into a row of values
+    # in the order of APACHE_COLUMNS, see _match_common_apache_line(). Raises IndexError if the line cannot be parsed
+    @staticmethod
+    def _parse_common_apache_line(line, pattern=APACHE_LINE_PATTERN, escaped_pattern=APACHE_ESCAPED_LINE_PATTERN,
+                                  dash='-', zero='0'):
+        row = AnaPyzerParser._match_common_apache_line(line, pattern, escaped_pattern, dash, zero)
+        if row is None:
+            raise IndexError("Line is not in an apache log format")
+        return row
+
+    # Splits a single line of an apache common, combined or vhost combined format log into a row of values
+    # in the order of APACHE_COLUMNS. Fields that the line's format does not record are set to '-'.
+    # Every format is matched by the one precompiled whole line pattern, so almost every line is run against a single
+    # regular expression, and only the lines that do not match it are tried against the slower escaped pattern.
+    # The line is normally a str, but a bytes line can be parsed by passing the bytes patterns and dash and zero.
+    # Returns None if the line cannot be parsed, so a lenient parse can skip it without raising an exception
+    @staticmethod
+    def _match_common_apache_line(line, pattern=APACHE_LINE_PATTERN, escaped_pattern=APACHE_ESCAPED_LINE_PATTERN,
+                                  dash='-', zero='0'):
+        match = pattern.match(line) or escaped_pattern.match(line)
+        if match is None:
+            return None
+        # The groups of the fields that the line's format does not record, and of a missing method or protocol, are
+        # '-'. apache logs a '-' instead of 0 when no bytes were sent
+        fields = match.groups(dash)
+        row = _APACHE_LINE_ROW(fields) if match.start(4) < 0 else _APACHE_VHOST_LINE_ROW(fields)
+        if fields[11] == dash or not fields[9]:
+            row = list(row)
+            row[9] = row[9] or dash
+            if row[6] == dash:
+                row[6] = zero
+        return row
+
     # parse_w3c_to_list will parse all information from an IIS/W3C format log into a list
     # With the locations of each field denoted in the parsed_log['parameter'] field
     # For instance, if c-ip is parsed into the 2 index of each line, requesting parsed_log['c-ip'] will return 2
@@ -94,139 +577,220 @@ class AnaPyzerParser:
     # https://stackify.com/how-to-interpret-iis-logs/
 
     @classmethod
-    def parse_w3c_to_list(cls, in_file):
+    def parse_w3c_to_list(cls, in_file, malformed_lines=None):
         if not in_file:
             return None
-        log_data = {}
-        potential_parameters = ['date', 'time', 's-sitename', 's-computername', 's-ip', 'cs-method', 'cs-uri-stem',
-                                'cs-uri-query', 's-port', 'cs-username', 'c-ip', 'cs(UserAgent)', 'cs(Cookie)',
-                                'cs(Referer)', 'cs-host', 'sc-status', 'sc-substatus', 'sc-win32-status', 'sc-bytes',
-                                'cs-bytes', 'time-taken']
-        universal_names = ['date', 'timestamp', 'service-name', 'server-name', 'server-ip', 'method', 'uri-stem',
-                           'uri-query', 'server-port', 'username', 'client-ip', 'user-agent', 'cookie',
-                           'referer', 'host', 'http-status', 'protocol-substatus', 'win32-status', 'bytes-sent',
-                           'bytes-received', 'time-taken']
-
-        log_data['fields'] = -1
-        # initialize placeholder variables in log_data array representing each of the w3c format parameters
-        for parameter in potential_parameters:
-            log_data[parameter] = -1
-
-        i = 0
+
+        # A batch size of None collects the whole log into a single parsed log
+        log_data = None
+        for log_data in cls.iter_w3c_batches(in_file, None, None, malformed_lines):
+            pass
+
+        # return the parsed log, or None if there were no lines of DATA in the log
+        return log_data
+
+    # iter_w3c_batches() parses an IIS/W3C log in the same way as parse_w3c_to_list, but yields the parsed lines
+    # as ParsedLog batches of at most batch_size rows while the file is still being read.
+    # IIS writes a new '#Fields' line whenever logging restarts with different fields, which starts a new segment of
+    # the log. The rows of every segment are stored in a single column layout: the fields of each new '#Fields' line
+    # that are not columns yet are added to the right of the columns, with missing values for the rows before them,
+    # and the fields a segment does not record are missing from its rows. The columns are carried over from batch to
+    # batch, so a later batch only ever has more columns than an earlier one, to the right of them.
+    # If requested_parameters is given, only those fields are kept in each row, in the requested order.
+    # A lenient parse also skips the data lines that do not have the number of fields of the '#Fields' header
+    @classmethod
+    def iter_w3c_batches(cls, in_file, batch_size=DEFAULT_BATCH_SIZE, requested_parameters=None,
+                         malformed_lines=None):
+        # A memory mapped file that only needs some of the fields is split as bytes
+        if isinstance(in_file, MappedLogFile):
+            if requested_parameters is None:
+                requested_parameters = in_file.columns
+            if requested_parameters is not None:
+                yield from cls._iter_mapped_w3c_batches(in_file, batch_size, requested_parameters, malformed_lines)
+                return
+
+        # The batches share their symbol tables, so a value has the same code in every batch
+        symbol_tables = {}
+        log_data = None
+        columns = []
+        schema_field_map = None
+        project = None
+        rows = []
+        pending_rows = PENDING_ROWS if batch_size is None else min(batch_size, PENDING_ROWS)
+        headers = {'fields': -1}
+        field_map = cls._new_w3c_field_map()
+        field_count = None
+        first_line = malformed_lines.line_count if malformed_lines is not None else 0
+        line_number = first_line
+
         # as long as there are lines in the file, loop:
-        for line in in_file:
+        for line_number, line in enumerate(in_file, first_line + 1):
             # Split string into list of individual words with space as delimiter
-            split_line = line.split(' ')
+            split_line = line.rstrip('\r\n').split(' ')
 
             # Every header line at the top of the log will start with a #, making it
             # easy to differentiate between data and the header
             if '#' in split_line[0]:
-                log_data[str(split_line[0])] = split_line
-
-                if '#Date' in split_line[0] and log_data['date'] == -1:
-                    log_data['date'] = split_line[1]
-
-                if '#Fields' in split_line[0]:
-                    # Check the fields line for all available data being logged
-                    log_data['fields'] = 1
-                    j = 0
-                    for element in split_line:
-                        for parameter in potential_parameters:
-
-                            if element == parameter:
-                                log_data[parameter] = j - 1
-                        j += 1
+                if '#Fields' in split_line[0] and log_data is not None:
+                    # Store the rows read so far before the field positions change
+                    log_data.append_rows(rows)
+                    rows = []
+
+                if cls._read_w3c_header(split_line, headers, field_map):
+                    field_count = len(split_line) - 1
+                    positions = _w3c_segment_positions(split_line, field_map, columns, requested_parameters)
+                    schema_field_map = _w3c_columns_field_map(columns)
+                    # A line of a segment whose fields are the columns, in order, is stored as it is split
+                    if positions == list(range(field_count)):
+                        project = None
+                    else:
+                        project = _row_projector(positions)
+                    if log_data is not None:
+                        cls._add_w3c_segment_columns(log_data, columns, schema_field_map)
             else:
-                if log_data['fields'] == -1:
-                    raise IndexError()
-                log_data[i] = split_line
-
-                i += 1
-        # once log file is parsed, assign the new positions of each requested parameter in the log_data list
-        # this will prevent issues when using methods that rely on tagged element values representing element
-        # placement in array
-
-        k = 0
-        for parameter in potential_parameters:
-            # add an index in the log_data array representing the universal name for each field
-            log_data[universal_names[k]] = log_data[parameter]
-            k += 1
-        # length represents the number of lines of DATA present in returned parsed list
-        log_data['length'] = i
-
-        if log_data['length'] is 0:
-            log_data = None
-        # return the list containing CSV data
-        return log_data
+                if schema_field_map is None:
+                    _skip_malformed_line(malformed_lines, line_number, MALFORMED_NO_FIELDS)
+                    continue
+                if malformed_lines is not None and len(split_line) != field_count:
+                    malformed_lines.add(line_number, _w3c_malformed_category(split_line, field_count))
+                    continue
+                if log_data is None:
+                    log_data = ParsedLog(LogSchema(columns, schema_field_map, headers), symbol_tables)
+                rows.append(split_line if project is None else project(split_line))
+
+                # Parsed rows are stored in the log a block at a time
+                if len(rows) >= pending_rows:
+                    log_data.append_rows(rows)
+                    rows = []
+
+                    if batch_size is not None and log_data.length >= batch_size:
+                        yield _with_epochs(log_data)
+                        log_data = None
+
+        if malformed_lines is not None:
+            malformed_lines.line_count = line_number
+        if log_data is not None:
+            log_data.append_rows(rows)
+            if log_data.length > 0:
+                yield _with_epochs(log_data)
+
+    # Parses an IIS/W3C log from a MappedLogFile. Field delimiters are found in the mapped bytes and only the fields
+    # requested are decoded, so each row only holds the projected columns.
+    # Header lines are decoded and read in the same way as iter_w3c_batches
+    @classmethod
+    def _iter_mapped_w3c_batches(cls, in_file, batch_size, requested_parameters, malformed_lines=None):
+        # The batches share their symbol tables, so a value has the same code in every batch
+        symbol_tables = {}
+        log_data = None
+        columns = []
+        schema_field_map = None
+        positions = None
+        rows = []
+        pending_rows = PENDING_ROWS if batch_size is None else min(batch_size, PENDING_ROWS)
+        headers = {'fields': -1}
+        field_map = cls._new_w3c_field_map()
+        data = in_file.data()
+        split_fields = in_file.split_fields
+        field_count = None
+        first_line = malformed_lines.line_count if malformed_lines is not None else 0
+        line_number = first_line
+
+        for line_number, (start, end) in enumerate(in_file.iter_line_offsets(), first_line + 1):
+            first_field_end = data.find(b' ', start, end)
+            if data.find(b'#', start, end if first_field_end < 0 else first_field_end) >= 0:
+                split_line = in_file.decode(start, end).split(' ')
+                if '#Fields' in split_line[0] and log_data is not None:
+                    log_data.append_rows(rows)
+                    rows = []
+
+                if cls._read_w3c_header(split_line, headers, field_map):
+                    field_count = len(split_line) - 1
+                    positions = _w3c_segment_positions(split_line, field_map, columns, requested_parameters)
+                    schema_field_map = _w3c_columns_field_map(columns)
+                    if log_data is not None:
+                        cls._add_w3c_segment_columns(log_data, columns, schema_field_map)
+            else:
+                if schema_field_map is None:
+                    _skip_malformed_line(malformed_lines, line_number, MALFORMED_NO_FIELDS)
+                    continue
+                if malformed_lines is not None and data.count(b' ', start, end) + 1 != field_count:
+                    split_line = in_file.decode(start, end).split(' ')
+                    malformed_lines.add(line_number, _w3c_malformed_category(split_line, field_count))
+                    continue
+                if log_data is None:
+                    log_data = ParsedLog(LogSchema(columns, schema_field_map, headers), symbol_tables)
+                rows.append(split_fields(start, end, positions))
+
+                if len(rows) >= pending_rows:
+                    log_data.append_rows(rows)
+                    rows = []
+
+                    if batch_size is not None and log_data.length >= batch_size:
+                        yield _with_epochs(log_data)
+                        log_data = None
+
+        if malformed_lines is not None:
+            malformed_lines.line_count = line_number
+        if log_data is not None:
+            log_data.append_rows(rows)
+            if log_data.length > 0:
+                yield _with_epochs(log_data)
+
+    # Adds the columns that a new W3C segment added to the single column layout to a log that has the rows of the
+    # earlier segments, and points its field map at the columns
+    @staticmethod
+    def _add_w3c_segment_columns(log_data, columns, field_map):
+        for name in columns:
+            if name not in log_data.schema.columns:
+                log_data.add_column(name)
+        log_data.schema.field_map = dict(field_map)
+
+    # Returns a field map with a placeholder position for each of the w3c format parameters
+    @staticmethod
+    def _new_w3c_field_map():
+        field_map = {}
+        for parameter in W3C_PARAMETERS:
+            field_map[parameter] = -1
+        return field_map
+
+    # Stores a split W3C header line in headers. If it is a '#Fields' line, the position of each field is
+    # stored in field_map, along with the universal name of each field, and True is returned
+    @staticmethod
+    def _read_w3c_header(split_line, headers, field_map):
+        headers[str(split_line[0])] = split_line
+        if '#Fields' not in split_line[0]:
+            return False
+
+        # Check the fields line for all available data being logged. Fields of an earlier '#Fields' line that this
+        # one does not have are no longer in the lines
+        headers['fields'] = 1
+        for parameter in W3C_PARAMETERS:
+            field_map[parameter] = -1
+        j = 0
+        for element in split_line:
+            if element in field_map:
+                field_map[element] = j - 1
+            j += 1
+        # add an index representing the universal name for each field
+        for parameter, universal_name in zip(W3C_PARAMETERS, UNIVERSAL_NAMES):
+            field_map[universal_name] = field_map[parameter]
+        return True
 
     # requested parameters list can consist of the following, using the official IIS naming convention found in header
+    # or the universal names used by the analyzers. Only the requested fields are kept in each row, in the order
+    # they were requested, and parsed_log[parameter] gives the position of each of them in a row.
+    # Requested fields that are not in the log are left out and their position is -1.
     # For information on what each tag means refer to:
     # https://stackify.com/how-to-interpret-iis-logs/
 
     @classmethod
-    def parse_w3c_requested_to_list(cls, in_file, requested_parameters):
+    def parse_w3c_requested_to_list(cls, in_file, requested_parameters, malformed_lines=None):
         if not in_file:
             return None
 
-        log_data = {}
-        potential_parameters = ['date', 'time', 's-sitename', 's-computername', 's-ip', 'cs-method', 'cs-uri-stem',
-                                'cs-uri-query', 's-port', 'cs-username', 'c-ip', 'cs(UserAgent)', 'cs(Cookie)',
-                                'cs(Referer)', 'cs-host', 'sc-status', 'sc-substatus', 'sc-win32-status', 'sc-bytes',
-                                'cs-bytes', 'time-taken']
-
-        log_data['header'] = False
-        # initialize placeholder variables in log_data array representing each of the w3c format parameters
-        for parameter in potential_parameters:
-            log_data[parameter] = -1
+        log_data = None
+        for log_data in cls.iter_w3c_batches(in_file, None, requested_parameters, malformed_lines):
+            pass
 
-        i = 0
-        # as long as there are lines in the file, loop:
-        for line in in_file:
-            # Split string into list of individual words with space as delimiter
-            split_line = line.split(' ')
-
-            # Every header line at the top of the log will start with a #, making it
-            # easy to differentiate between data and the header
-            if '#' in split_line[0]:
-                log_data[str(split_line[0])] = split_line
-                log_data['header'] = True
-                if '#Date' in split_line[0] and log_data['date'] == -1:
-                    log_data['date'] = split_line[1]
-
-                if '#Fields' in split_line[0]:
-                    # Check the fields line for all available data being logged
-                    # j keeps count of the placement of each parameter in the split line
-                    j = 0
-                    for element in split_line:
-                        # iterate through list of potential parameters
-                        for parameter in potential_parameters:
-                            # mark the location of each parameter present in relation to the list to be created
-                            if element == parameter:
-                                log_data[parameter] = j
-                                j += 1
-            else:
-                if not log_data['header']:
-                    return None
-
-                # initialize log_data[i] as a blank list to allow for use of append method
-                log_data[i] = []
-
-                # iterate through array of requested_parameters and add the information requested to the parsed list
-                for parameter in requested_parameters:
-                    if log_data.get(parameter):
-                        log_data[i].append(split_line[log_data[parameter]])
-                    else:
-                        pass
-
-                i += 1
-
-        # once log file is parsed, assign the new positions of each requested parameter in the log_data list to
-        # prevent issues when using methods that rely on tagged element values representing element placement in array
-        k = 0
-        for parameter in requested_parameters:
-            log_data[parameter] = k
-            k += 1
-        # length represents the number of lines of DATA present in returned parsed list
-        log_data['length'] = i
-        # return the list containing w3c data
-        return log_data
\ No newline at end of file
+        # return the parsed log, or None if there were no lines of DATA in the log
+        return log_data
@@ -0,0 +1,131 @@
+# Import the csv library to write the rows of a report as CSV
+import csv
+# Import the json library to write the records of a report as JSON Lines
+import json
+# Import the pathlib library to pick the sink of a report file from its suffix
+import pathlib
+
+# The kind of the records that describe a report or a part of it, rather than being one of its rows
+HEADING = 'heading'
+
+# The number of characters of report text that a ChunkSink gathers before handing them on
+REPORT_CHUNK_SIZE = 64 * 1024
+
+
+# The ReportRecord class is one record of a report, such as a resource of the web site resource report or a session
+# of the connection length report. kind names what the record is, fields holds its values by name and text is how it
+# reads in the text of the report, which is the text of all of its records one after the other.
+# Records of the HEADING kind, such as the number of entries at the top of a report, are not rows of the report
+class ReportRecord:
+
+    # Constructor
+    def __init__(self, kind, fields, text):
+        self.kind = kind
+        self.fields = fields
+        self.text = text
+
+    def __eq__(self, other):
+        return isinstance(other, ReportRecord) and (other.kind, other.fields, other.text) == \
+            (self.kind, self.fields, self.text)
+
+    def __repr__(self):
+        return 'ReportRecord(' + repr(self.kind) + ', ' + repr(self.fields) + ', ' + repr(self.text) + ')'
+
+
+# The TextSink class writes the text of each record of a report to a file, in the same way as the report's text
+class TextSink:
+
+    # Constructor
+    def __init__(self, out_file):
+        self.out_file = out_file
+
+    def write(self, record):
+        self.out_file.write(record.text)
+
+    def flush(self):
+        self.out_file.flush()
+
+
+# The JsonLinesSink class writes each record of a report to a file as a JSON object on a line of its own, with the
+# kind of the record under 'record' and its fields after it
+class JsonLinesSink:
+
+    # Constructor
+    def __init__(self, out_file):
+        self.out_file = out_file
+
+    def write(self, record):
+        line = {'record': record.kind}
+        line.update(record.fields)
+        self.out_file.write(json.dumps(line) + '\n')
+
+    def flush(self):
+        self.out_file.flush()
+
+
+# The CsvSink class writes the rows of a report to a file as CSV, with a header line of the field names of the first
+# row. Records of the HEADING kind are left out. The file should be opened with newline='', as for csv.writer
+class CsvSink:
+
+    # Constructor
+    def __init__(self, out_file):
+        self.out_file = out_file
+        self._writer = None
+
+    def write(self, record):
+        if record.kind == HEADING:
+            return
+        if self._writer is None:
+            self._writer = csv.DictWriter(self.out_file, list(record.fields), extrasaction='ignore')
+            self._writer.writeheader()
+        self._writer.writerow(record.fields)
+
+    def flush(self):
+        self.out_file.flush()
+
+
+# The ChunkSink class gathers the text of the records of a report and passes it on to write_chunk a chunk of about
+# chunk_size characters at a time, such as to add a long report to the report view without holding all of it at once
+class ChunkSink:
+
+    # Constructor
+    def __init__(self, write_chunk, chunk_size=REPORT_CHUNK_SIZE):
+        self.write_chunk = write_chunk
+        self.chunk_size = chunk_size
+        self._texts = []
+        self._size = 0
+
+    def write(self, record):
+        self._texts.append(record.text)
+        self._size += len(record.text)
+        if self._size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._texts:
+            self.write_chunk(''.join(self._texts))
+            self._texts = []
+            self._size = 0
+
+
+# The sink of a report file with each suffix. Files with any other suffix are written as text
+_SUFFIX_SINKS = {
+    '.csv': CsvSink,
+    '.jsonl': JsonLinesSink,
+}
+
+
+# Returns the sink that writes a report to out_file in the format of the suffix of its file_path
+def report_sink(out_file, file_path):
+    return _SUFFIX_SINKS.get(pathlib.PurePath(file_path).suffix.lower(), TextSink)(out_file)
+
+
+# Writes every record of an iterable of ReportRecords to a sink as they are made, flushes the sink and returns the
+# number of records written
+def write_report(records, sink):
+    record_count = 0
+    for record in records:
+        sink.write(record)
+        record_count += 1
+    sink.flush()
+    return record_count
@@ -0,0 +1,150 @@
+# Import the hashlib library for a hash of each value that is the same in every process
+import hashlib
+# Import the heapq library to find the smallest and largest counters of a Space-Saving sketch
+import heapq
+# Import the itertools library to number the counters of a Space-Saving sketch in the order they were made
+import itertools
+# Import the math library for the logarithm of the small count estimate
+import math
+# Import the operator library to rank the counters of a Space-Saving sketch by their counts
+import operator
+
+# The smallest and largest precisions of a HyperLogLog sketch, which has 2 ** precision registers
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+# The precision used when none is given, which counts to within about 1.6% using 4KB per sketch
+DEFAULT_PRECISION = 12
+
+# The number of bits in the hash of a value
+_HASH_BITS = 64
+
+
+# Returns the 64 bit hash of a value that a HyperLogLog sketch adds. Python's own hash() of a str changes from one
+# process to the next, so sketches made in different processes could not be merged with it
+def sketch_hash(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode('utf-8', 'surrogateescape'), digest_size=8).digest(),
+                          'big')
+
+
+# Returns the precision of a HyperLogLog sketch, raising a ValueError if it is not a whole number between
+# MIN_PRECISION and MAX_PRECISION
+def check_precision(precision):
+    if not isinstance(precision, int) or not MIN_PRECISION <= precision <= MAX_PRECISION:
+        raise ValueError("HyperLogLog precision must be between " + str(MIN_PRECISION) + " and " +
+                         str(MAX_PRECISION))
+    return precision
+
+
+# The HyperLogLog class is a sketch that estimates the number of distinct values added to it in a fixed amount of
+# memory, however many values there are. It has 2 ** precision registers, each holding the longest run of leading
+# zero bits seen in the hashes of the values that fall in it, and the estimate has a standard error of about
+# 1.04 / sqrt(2 ** precision).
+# Sketches of the same precision can be merged, so the sketches of several files or parsing processes add up to the
+# sketch of all of their values. Reference for the algorithm:
+# https://algo.inria.fr/flajolet/Publications/FlFuGaMe07.pdf
+class HyperLogLog:
+
+    # Constructor. Raises a ValueError if the precision is outside MIN_PRECISION and MAX_PRECISION
+    def __init__(self, precision=DEFAULT_PRECISION):
+        self.precision = check_precision(precision)
+        self.registers = bytearray(1 << precision)
+
+    # Adds a value to the sketch
+    def add(self, value):
+        self.add_hash(sketch_hash(value))
+
+    # Adds a value to the sketch by its sketch_hash(), so the hash of a value that is added many times can be
+    # worked out once
+    def add_hash(self, value_hash):
+        value_bits = _HASH_BITS - self.precision
+        index = value_hash >> value_bits
+        rank = value_bits - (value_hash & ((1 << value_bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    # Adds the values of another sketch of the same precision to this one.
+    # Raises a ValueError if the precisions are different
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precisions")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    # Returns the estimated number of distinct values added to the sketch
+    def count(self):
+        register_count = len(self.registers)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(register_count, 0.7213 / (1 + 1.079 / register_count))
+        estimate = alpha * register_count * register_count / sum(2.0 ** -rank for rank in self.registers)
+
+        # Small counts leave many registers empty, and are estimated better from the number that are
+        empty_registers = self.registers.count(0)
+        if estimate <= 2.5 * register_count and empty_registers:
+            return register_count * math.log(register_count / empty_registers)
+        return estimate
+
+    def __eq__(self, other):
+        return isinstance(other, HyperLogLog) and other.registers == self.registers
+
+    def __repr__(self):
+        return 'HyperLogLog(precision=' + str(self.precision) + ', count=' + str(round(self.count())) + ')'
+
+
+# The SpaceSaving class keeps the approximate counts of the most frequent items of a stream in a fixed number of
+# counters, however many distinct items there are. An item that is not counted yet takes over the counter of the
+# item with the smallest count, which it starts from, so a count is never under the true count and is over it by at
+# most the error kept for it. Every item whose true count is more than the total of all counts / capacity is sure
+# to have a counter. Reference for the algorithm:
+# https://www.cs.ucsb.edu/sites/default/files/documents/2005-23.pdf
+class SpaceSaving:
+
+    # Constructor. Raises a ValueError if the capacity is not a positive whole number
+    def __init__(self, capacity):
+        if not isinstance(capacity, int) or capacity < 1:
+            raise ValueError("Space-Saving capacity must be a positive whole number")
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # The counters by count, smallest first. A counter's entry is only brought up to date when it reaches the
+        # top of the heap, so counting an item that already has a counter does not touch the heap
+        self._heap = []
+        self._order = itertools.count()
+
+    # Adds weight to the count of an item. Returns the item whose counter was taken over, or None
+    def add(self, item, weight=1):
+        counts = self.counts
+        if item in counts:
+            counts[item] += weight
+            return None
+        if len(counts) < self.capacity:
+            counts[item] = weight
+            self.errors[item] = 0
+            heapq.heappush(self._heap, (weight, next(self._order), item))
+            return None
+
+        evicted, minimum = self._pop_minimum()
+        counts[item] = minimum + weight
+        self.errors[item] = minimum
+        heapq.heappush(self._heap, (minimum + weight, next(self._order), item))
+        return evicted
+
+    # Removes the counter with the smallest count and returns its item and count
+    def _pop_minimum(self):
+        heap = self._heap
+        counts = self.counts
+        while True:
+            count, order, item = heap[0]
+            current = counts[item]
+            if current == count:
+                heapq.heappop(heap)
+                del counts[item]
+                del self.errors[item]
+                return item, count
+            heapq.heapreplace(heap, (current, order, item))
+
+    # Returns a list of the (item, count, error) of the k items with the largest counts, largest first
+    def top(self, k):
+        errors = self.errors
+        return [(item, count, errors[item]) for item, count in heapq.nlargest(k, self.counts.items(),
+                                                                               key=operator.itemgetter(1))]
+
+    def __len__(self):
+        return len(self.counts)
@@ -37,6 +37,10 @@ class AnaPyzerView(tkinter.ttk.Frame):
         # Set the geometry manager for the main window to use the grid layout
         self.grid()
 
+        # The open graph views by their title and the open report view, which are updated in place
+        self._graph_views = {}
+        self._report_view = None
+
         # Tell the view to create the widgets and populate the window with them
         self._create_widgets()
 
@@ -79,6 +83,25 @@ class AnaPyzerView(tkinter.ttk.Frame):
             'Browse...',
             self)
         self._out_file_path_field_widgets.grid(sticky=AnaPyzerView.DEFAULT_STICKY_DIRECTION)
+
+        # Create a check button to keep the graphs and reports updated as lines are added to the log
+        self._follow_check_button = AnaPyzerView.CheckButton(
+            'Follow log as it grows',
+            self)
+        self._follow_check_button.grid(
+            sticky=AnaPyzerView.DEFAULT_STICKY_DIRECTION,
+            padx=AnaPyzerView.WIDGET_X_PAD, pady=AnaPyzerView.WIDGET_Y_PAD,  # Give it the global widget padding
+        )
+
+        # Create a check button to skip and count the lines of the log that cannot be parsed
+        self._skip_malformed_lines_check_button = AnaPyzerView.CheckButton(
+            'Skip malformed lines',
+            self)
+        self._skip_malformed_lines_check_button.grid(
+            sticky=AnaPyzerView.DEFAULT_STICKY_DIRECTION,
+            padx=AnaPyzerView.WIDGET_X_PAD, pady=AnaPyzerView.WIDGET_Y_PAD,  # Give it the global widget padding
+        )
+
         # Create a Button object to open the file specified in the file_path_field entry box
         self._open_file_button = AnaPyzerView.Button(
             'Open',
@@ -99,15 +122,33 @@ class AnaPyzerView(tkinter.ttk.Frame):
     def display_success_message(message):
         tkinter.messagebox.showinfo("Success", message)
 
-    # Method to create a new graph view from x and y plot data
-    def display_graph_view(self, x_data, y_data, x_label, y_label, title):
-        self._graph_view = AnaPyzerView.GraphView(self)
-        self._graph_view.configure_graph(x_data, y_data, x_label, y_label, title)
-
-    # Method to create a new graph view from x and y plot data
+    # Method to display x and y plot data in a graph view, with an optional note shown under the graph
+    # A graph view that is already open with the same title is redrawn with the new data instead of opening another
+    def display_graph_view(self, x_data, y_data, x_label, y_label, title, note=None):
+        graph_view = self._graph_views.get(title)
+        if graph_view is not None and graph_view.winfo_exists():
+            graph_view.update_graph(x_data, y_data, x_label, y_label, title, note)
+        else:
+            graph_view = AnaPyzerView.GraphView(self)
+            graph_view.configure_graph(x_data, y_data, x_label, y_label, title, note)
+            self._graph_views[title] = graph_view
+
+    # Method to display report text in the report view, opening one if it is not already open
     def display_report_view(self, report_text):
-        self._report_view = AnaPyzerView.ReportView(self)
-        self._report_view.set_text(report_text)
+        self.open_report_view()
+        self.append_report_text(report_text)
+
+    # Method to open an empty report view, or to empty the one that is already open, for a report to be added to it
+    # with append_report_text
+    def open_report_view(self):
+        if self._report_view is None or not self._report_view.winfo_exists():
+            self._report_view = AnaPyzerView.ReportView(self)
+        self._report_view.clear()
+
+    # Method to add report text to the end of the report view, such as a chunk of a report from an
+    # anapyzerreport.ChunkSink as it is made
+    def append_report_text(self, text):
+        self._report_view.append_text(text)
 
     # Method to tell the view to prompt the user to select a file
     # Takes a string for the starting directory,
@@ -138,6 +179,10 @@ class AnaPyzerView(tkinter.ttk.Frame):
         # Set new options
         self._log_type_menu_widgets.set_menu(log_type_options)
 
+    # Method to select a log type in the log type options menu
+    def set_log_type(self, log_type):
+        self._log_type_menu_widgets.set_selection(log_type)
+
     # Method to set the file read mode options in the file read options menu
     def set_file_read_options(self, file_read_options):
         # Set new options
@@ -215,6 +260,12 @@ class AnaPyzerView(tkinter.ttk.Frame):
     def set_open_file_button_clicked_listener(self, listener):
         self._open_file_button.set_on_button_clicked_action(listener)
 
+    def set_follow_changed_listener(self, listener):
+        self._follow_check_button.set_checked_changed_listener(listener)
+
+    def set_skip_malformed_lines_changed_listener(self, listener):
+        self._skip_malformed_lines_check_button.set_checked_changed_listener(listener)
+
     class OptionMenuWidgetGroup(tkinter.ttk.Frame):
         def __init__(self, label_text, master=None):
             tkinter.ttk.Frame.__init__(self, master)
@@ -254,6 +305,10 @@ class AnaPyzerView(tkinter.ttk.Frame):
             self._menu.set_menu(menu_options[0], *menu_options)
             self._on_menu_selection_changed_action(menu_options[0])
 
+        # Selects one of the options without calling the selection changed listener
+        def set_selection(self, value):
+            self._menu_selection.set(value)
+
     class FilePathWidgetGroup(tkinter.ttk.Frame):
         def __init__(self, label_text, button_text, master=None):
             tkinter.ttk.Frame.__init__(self, master)
@@ -326,10 +381,32 @@ class AnaPyzerView(tkinter.ttk.Frame):
         def disable(self):
             self.configure(state=tkinter.DISABLED)
 
+    class CheckButton(tkinter.ttk.Checkbutton):
+        def __init__(self, button_text, master=None):
+            self._checked = tkinter.BooleanVar(master, False)
+            # Call the tkinter ttk Checkbutton base class constructor
+            tkinter.ttk.Checkbutton.__init__(
+                self,
+                master,
+                text=button_text,
+                variable=self._checked,
+                command=self._on_checked_changed_action)
+
+            self._checked_changed_action = None
+
+        def _on_checked_changed_action(self):
+            if self._checked_changed_action:
+                self._checked_changed_action(self._checked.get())
+
+        def set_checked_changed_listener(self, action):
+            self._checked_changed_action = action
+
     # Class definition for the Graph View child window class
     # Extends the tkinter.ttk.Frame object
     class GraphView(tkinter.Toplevel):
         CANVAS_W, CANVAS_H = 300, 300
+        # The least time in milliseconds between redraws of a graph that is being updated
+        REDRAW_INTERVAL_MS = 500
 
         def __init__(self, master=None):
             # Call the tkinter ttk Toplevel base class constructor
@@ -344,12 +421,39 @@ class AnaPyzerView(tkinter.ttk.Frame):
             self._canvas = FigureCanvasTkAgg(self._figure, self)
             self._canvas.get_tk_widget().pack(side=tkinter.TOP, fill=tkinter.BOTH, expand=tkinter.TRUE)
 
-        def configure_graph(self, x_data, y_data, x_label, y_label, title):
-            self._axes.plot(x_data, y_data)
+            # The latest graph data given to update_graph() and whether a redraw of it has been scheduled
+            self._pending_graph = None
+            self._redraw_scheduled = False
+
+        # Draws the graph straight away
+        def configure_graph(self, x_data, y_data, x_label, y_label, title, note=None):
+            self._axes.clear()
+            # Remove the legend and note of the previous graph
+            del self._figure.legends[:]
+            for text in list(self._figure.texts):
+                text.remove()
+            self._axes.plot(list(x_data), list(y_data))
             self._axes.set_xlabel(x_label)
             self._axes.set_ylabel(y_label)
             self._figure.legend(title=title)
-            self._canvas.draw()
+            if note:
+                self._figure.text(0.01, 0.01, note, fontsize='small', wrap=True)
+            self._canvas.draw_idle()
+
+        # Redraws the graph with new data at most once every REDRAW_INTERVAL_MS, so a graph that is updated many
+        # times a second does not keep the window busy. Only the latest data is drawn
+        def update_graph(self, x_data, y_data, x_label, y_label, title, note=None):
+            self._pending_graph = (list(x_data), list(y_data), x_label, y_label, title, note)
+            if not self._redraw_scheduled:
+                self._redraw_scheduled = True
+                self.after(AnaPyzerView.GraphView.REDRAW_INTERVAL_MS, self._redraw)
+
+        def _redraw(self):
+            self._redraw_scheduled = False
+            if self._pending_graph is not None and self.winfo_exists():
+                pending_graph = self._pending_graph
+                self._pending_graph = None
+                self.configure_graph(*pending_graph)
 
     # Class definition for the Report View child window class
     # Extends the tkinter.ttk.Frame object
@@ -370,7 +474,15 @@ class AnaPyzerView(tkinter.ttk.Frame):
             self._text_box.config(yscrollcommand=self._text_box_scrollbar.set)
 
         def set_text(self, text):
+            self.clear()
+            self.append_text(text)
+
+        def clear(self):
             # Clear the text field
             self._text_box.delete(1.0, tkinter.END)
-            # Insert the new text in the text field
-            self._text_box.insert(tkinter.END, text)
\ No newline at end of file
+
+        # Adds text to the end of the text field, such as a chunk of a report from an anapyzerreport.ChunkSink, and
+        # redraws the window so a long report is shown as it is added
+        def append_text(self, text):
+            self._text_box.insert(tkinter.END, text)
+            self._text_box.update_idletasks()
\ No newline at end of file
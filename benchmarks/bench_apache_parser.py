@@ -0,0 +1,103 @@
+# Benchmark for the apache log line parser
+# Generates a multi-million line apache log and compares the lines per second of the original split based
+# line parser against the precompiled regular expression parser used by AnaPyzerParser.
+# Run from the project root directory with:
+# python benchmarks/bench_apache_parser.py --lines 2000000
+import argparse
+import pathlib
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from anapyzerparser import AnaPyzerParser
+
+METHODS = ['GET', 'GET', 'GET', 'GET', 'POST', 'HEAD']
+RESOURCES = ['/', '/index.html', '/css/style.css', '/js/app.js', '/images/logo.png', '/login', '/api/items?page=2']
+AGENTS = ['Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/65.0 Safari/537.36',
+          'curl/7.58.0',
+          'Googlebot/2.1 (+http://www.google.com/bot.html)']
+# The number of times each line parser is run over the log, of which the fastest run is reported
+TIMING_RUNS = 3
+
+
+# Writes a log of line_count generated lines, mixing common and combined format lines, to the out_file
+def generate_log(out_file, line_count, seed=0):
+    rand = random.Random(seed)
+    for i in range(0, line_count):
+        ip = '10.' + str(rand.randrange(256)) + '.' + str(rand.randrange(256)) + '.' + str(rand.randrange(256))
+        timestamp = '%02d/Apr/2018:%02d:%02d:%02d +0000' % (1 + i // 86400 % 28, i // 3600 % 24, i // 60 % 60, i % 60)
+        request = rand.choice(METHODS) + ' ' + rand.choice(RESOURCES) + ' HTTP/1.1'
+        line = ip + ' - - [' + timestamp + '] "' + request + '" 200 ' + str(rand.randrange(20000))
+        if i % 4:
+            line += ' "http://www.example.com/" "' + rand.choice(AGENTS) + '"'
+        out_file.write(line + '\n')
+
+
+# The original split based line parser, kept here as the baseline to compare against
+def legacy_parse_common_apache_line(line):
+    date_ts = line.split('[', 1)
+    date_ts = date_ts[1].split(":", 1)
+    date_ts[1] = date_ts[1].split(' ', 1)[0]
+    split_line = line.split(' ')
+    request_info = line.split('"', 2)[1]
+    referer = "-"
+    method = request_info.split('/', 1)[0]
+    if "GET" in method:
+        uri_stem = request_info.split(' ')[1]
+        sc_status = split_line[8]
+        bytes_received = split_line[9]
+    else:
+        uri_stem = '-'
+        sc_status = '-'
+        bytes_received = '0'
+    client_ip = split_line[0]
+    return [date_ts[0], date_ts[1], client_ip, method, uri_stem, sc_status, bytes_received, referer]
+
+
+# Times parse_line over every line of the log file and returns the number of lines parsed per second.
+# The lines are read into memory first, and the best of TIMING_RUNS runs is kept, so the rate is only the parser's
+def time_line_parser(log_path, parse_line):
+    with open(log_path, 'r') as log_file:
+        lines = log_file.readlines()
+    best_elapsed = None
+    for _ in range(0, TIMING_RUNS):
+        start = time.perf_counter()
+        for line in lines:
+            parse_line(line)
+        elapsed = time.perf_counter() - start
+        if best_elapsed is None or elapsed < best_elapsed:
+            best_elapsed = elapsed
+    return len(lines) / best_elapsed
+
+
+# Times a full parse of the log file into a ParsedLog and returns the number of lines parsed per second
+def time_full_parse(log_path):
+    with open(log_path, 'r') as log_file:
+        start = time.perf_counter()
+        parsed_log = AnaPyzerParser.parse_common_apache_to_list(log_file)
+        elapsed = time.perf_counter() - start
+    return parsed_log.length / elapsed
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description='Benchmark the apache log parser')
+    argument_parser.add_argument('--lines', type=int, default=2000000, help='number of log lines to generate')
+    arguments = argument_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log_path = pathlib.Path(temp_dir) / 'access.log'
+        with open(log_path, 'w') as log_file:
+            generate_log(log_file, arguments.lines)
+
+        print('Lines: ' + str(arguments.lines))
+        print('Legacy split parser:       %12.0f lines/s' % time_line_parser(log_path, legacy_parse_common_apache_line))
+        print('Precompiled regex parser:  %12.0f lines/s'
+              % time_line_parser(log_path, AnaPyzerParser._match_common_apache_line))
+        print('Full parse to ParsedLog:   %12.0f lines/s' % time_full_parse(log_path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Benchmark for the NumPy backend of the accumulators
+# Generates a batch of parsed W3C rows and times the web site resource accumulator, the one accumulator with a NumPy
+# backend, with its python counts and with the NumPy ones, folding in the batch until each row count is reached, as
+# the accumulators do with the batches of a streamed parse. Needs NumPy to be installed.
+# Run from the project root directory with:
+# python benchmarks/bench_numpy_backend.py --rows 1000000 10000000 50000000
+import argparse
+import pathlib
+import random
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import anapyzernumpy
+from anapyzeraccumulators import WebPagesAccumulator, METRIC_HITS, METRIC_BYTES
+from anapyzerparsedlog import ParsedLog, LogSchema
+
+COLUMNS = ['date', 'timestamp', 'client-ip', 'uri-stem', 'bytes-sent']
+RESOURCES = ['/', '/index.html', '/css/style.css', '/js/app.js', '/images/logo.png', '/login', '/api/items']
+ACCUMULATORS = [lambda: WebPagesAccumulator(metric=METRIC_HITS), lambda: WebPagesAccumulator(metric=METRIC_BYTES)]
+
+
+# Returns a ParsedLog of row_count generated rows in time order, a second apart, from ip_count distinct ips
+def generate_batch(row_count, ip_count, seed=0):
+    rand = random.Random(seed)
+    rows = []
+    for i in range(0, row_count):
+        ip_number = rand.randrange(ip_count)
+        ip = '10.%d.%d.%d' % (ip_number >> 16 & 255, ip_number >> 8 & 255, ip_number & 255)
+        rows.append(['2018-04-%02d' % (1 + i // 86400 % 28), '%02d:%02d:%02d' % (i // 3600 % 24, i // 60 % 60, i % 60),
+                     ip, rand.choice(RESOURCES), str(rand.randrange(100000))])
+    parsed_log = ParsedLog(LogSchema(COLUMNS, {name: i for i, name in enumerate(COLUMNS)}))
+    parsed_log.append_rows(rows)
+    return parsed_log
+
+
+# Returns the seconds taken to fold row_count rows of the batch into each accumulator, and their results
+def time_accumulators(batch, row_count):
+    start = time.perf_counter()
+    results = []
+    for create in ACCUMULATORS:
+        accumulator = create()
+        for _ in range(0, row_count // batch.length):
+            accumulator.update(batch)
+        accumulator.update(batch, batch.length - row_count % batch.length)
+        results.append(accumulator.finalize())
+    return time.perf_counter() - start, results
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description='Benchmark the NumPy backend of the accumulators')
+    argument_parser.add_argument('--rows', type=int, nargs='+', default=[1000000, 10000000, 50000000],
+                                 help='numbers of rows to fold into the accumulators')
+    argument_parser.add_argument('--batch', type=int, default=1000000, help='number of rows in the generated batch')
+    argument_parser.add_argument('--ips', type=int, default=100000, help='number of distinct ips')
+    arguments = argument_parser.parse_args()
+    if anapyzernumpy.numpy is None:
+        sys.exit('NumPy is not installed')
+
+    batch = generate_batch(min(arguments.batch, max(arguments.rows)), arguments.ips)
+    enabled = anapyzernumpy.is_enabled()
+    try:
+        for row_count in arguments.rows:
+            anapyzernumpy.set_enabled(False)
+            python_elapsed, python_results = time_accumulators(batch, row_count)
+            anapyzernumpy.set_enabled(True)
+            numpy_elapsed, numpy_results = time_accumulators(batch, row_count)
+            print('%10d rows: python %8.2f s  numpy %8.2f s  %5.2fx  %s'
+                  % (row_count, python_elapsed, numpy_elapsed, python_elapsed / numpy_elapsed,
+                     'identical' if python_results == numpy_results else 'DIFFERENT'))
+    finally:
+        anapyzernumpy.set_enabled(enabled)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# Scaling benchmark for the multi-process log parser
+# Generates an apache log and times anapyzerparallel.parse_log_file with 1, 2, 4, 8 and 16 worker processes.
+# Run from the project root directory with:
+# python benchmarks/bench_parallel_parse.py --lines 2000000
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import anapyzerparallel
+from anapyzerparser import LOG_FORMAT_APACHE
+from bench_apache_parser import generate_log
+
+WORKER_COUNTS = [1, 2, 4, 8, 16]
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description='Benchmark the multi-process log parser')
+    argument_parser.add_argument('--lines', type=int, default=2000000, help='number of log lines to generate')
+    arguments = argument_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log_path = pathlib.Path(temp_dir) / 'access.log'
+        with open(log_path, 'w') as log_file:
+            generate_log(log_file, arguments.lines)
+
+        print('Lines: ' + str(arguments.lines) + ', CPUs: ' + str(os.cpu_count()))
+        baseline = None
+        for worker_count in WORKER_COUNTS:
+            start = time.perf_counter()
+            parsed_log = anapyzerparallel.parse_log_file(log_path, LOG_FORMAT_APACHE, worker_count)
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = elapsed
+            print('%2d workers: %8.2f s  %12.0f lines/s  %5.2fx'
+                  % (worker_count, elapsed, parsed_log.length / elapsed, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
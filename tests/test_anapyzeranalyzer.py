@@ -1,6 +1,10 @@
+import io
 import unittest
 import unittest.mock
+import anapyzernumpy
 from anapyzeranalyzer import AnaPyzerAnalyzer
+from anapyzerparser import AnaPyzerParser
+from anapyzeraccumulators import SuspiciousActivityAccumulator, ConnectionsPerHourAccumulator, IpConnectionsAccumulator
 
 class TestAnaPyzerAnalyzerMethods(unittest.TestCase):
     def setUp(self):
@@ -186,4 +190,257 @@ class TestAnaPyzerAnalyzerMethods(unittest.TestCase):
  'ylabel': 'Unique IPs Recorded'}
 
         output = self.analyzer.get_connections_per_hour(input)
-        self.assertEqual(expected_output, output)
\ No newline at end of file
+        self.assertEqual(expected_output, output)
+
+    def test_stream_connections_per_hour_matches_single_log(self):
+        parser = AnaPyzerParser()
+        input = ["#Fields: date time c-ip cs-uri-stem",
+                 "2016-05-16 00:00:00 52.232.212.188 /a",
+                 "2016-05-16 00:10:00 26.25.144.84 /b",
+                 "2016-05-16 01:00:00 26.25.144.84 /b",
+                 "2016-05-17 00:00:00 26.25.144.84 /c"]
+
+        expected_output = self.analyzer.get_connections_per_hour(parser.parse_w3c_to_list(input))
+        output = self.analyzer.stream_connections_per_hour(parser.iter_w3c_batches(input, 1))
+        self.assertEqual(expected_output, output)
+        self.assertEqual({'00': 2, '01': 1}, output['2016-05-16'])
+
+    def test_connections_per_hour_from_epoch_in_log_time_zone(self):
+        input = ["73.83.18.52 - - [04/Apr/2018:23:30:50 -0700] \"GET / HTTP/1.1\" 200 5",
+                 "73.83.18.53 - - [05/Apr/2018:00:10:00 -0700] \"GET / HTTP/1.1\" 200 5",
+                 "73.83.18.54 - - [05/Apr/2018:0x:10:00 -0700] \"GET / HTTP/1.1\" 200 5",
+                 "73.83.18.53 - - [05/Apr/2018:07:20:00 +0000] \"GET / HTTP/1.1\" 200 5"]
+        parsed_log = AnaPyzerParser.parse_common_apache_to_list(input)
+
+        # The hours and dates are those the log recorded, and the row whose time cannot be read is left out
+        output = self.analyzer.get_connections_per_hour(parsed_log)
+        self.assertEqual({'23': 1}, output['04/Apr/2018'])
+        self.assertEqual({'00': 1, '07': 1}, output['05/Apr/2018'])
+        ip_connections = IpConnectionsAccumulator()
+        ip_connections.update(parsed_log)
+        self.assertEqual({'04/Apr/2018': {'73.83.18.52': 1}, '05/Apr/2018': {'73.83.18.53': 2}},
+                         ip_connections.finalize())
+
+        # A log without times is counted by the text of its dates
+        ip_connections = IpConnectionsAccumulator()
+        ip_connections.update(AnaPyzerParser.parse_w3c_to_list(["#Fields: date c-ip", "2016-05-16 10.0.0.1",
+                                                                 "2016-05-16 10.0.0.1", "2016-05-17 10.0.0.2"]))
+        self.assertEqual({'2016-05-16': {'10.0.0.1': 2}, '2016-05-17': {'10.0.0.2': 1}}, ip_connections.finalize())
+
+    def test_stream_web_pages_matches_single_log(self):
+        parser = AnaPyzerParser()
+        input = ["#Fields: date time c-ip cs-uri-stem sc-bytes",
+                 "2016-05-16 00:00:00 52.232.212.188 /a 10",
+                 "2016-05-16 00:10:00 26.25.144.84 /b 20",
+                 "2016-05-16 01:00:00 26.25.144.84 /b 30"]
+
+        expected_output = self.analyzer.get_web_pages(parser.parse_w3c_to_list(input))
+        output = self.analyzer.stream_web_pages(parser.iter_w3c_batches(input, 2))
+        self.assertEqual(expected_output, output)
+        self.assertIn("Web Site resource: /b was hit 2 times", output)
+
+    def test_malicious_activity_report(self):
+        parser = AnaPyzerParser()
+        input = ["#Fields: date time c-ip cs-uri-stem"]
+        input += ["2016-05-16 00:00:01 10.0.0.1 /login"] * 6
+        # Hits spread over several seconds, or of the home page, are not suspicious
+        input += ["2016-05-16 00:00:0%d 10.0.0.2 /a" % i for i in range(0, 7)]
+        input += ["2016-05-16 00:00:01 10.0.0.3 /"] * 7
+        input += ["2016-05-16 00:00:01 10.0.0.4 /x"] * 5
+
+        output = self.analyzer.malicious_activity_report(parser.parse_w3c_to_list(input))
+        self.assertEqual("Malicious activity detected from 10.0.0.1:\n"
+                         "/login  was accessed more than five times within one second by 10.0.0.1\n\n", output)
+
+        output = self.analyzer.malicious_activity_report(parser.parse_w3c_to_list(input), 4, 10)
+        self.assertIn("/a  was accessed more than four times within ten seconds by 10.0.0.2\n", output)
+        self.assertIn("/x  was accessed more than four times within ten seconds by 10.0.0.4\n", output)
+        self.assertNotIn("10.0.0.3", output)
+
+    def test_suspicious_activity_accumulator_matches_single_log(self):
+        parser = AnaPyzerParser()
+        input = ["#Fields: date time c-ip cs-uri-stem"]
+        input += ["2016-05-16 00:00:%02d 10.0.0.%d /login" % (i // 4, i % 2) for i in range(0, 40)]
+
+        expected_output = self.analyzer.malicious_activity_report(parser.parse_w3c_to_list(input), 1)
+        accumulator = SuspiciousActivityAccumulator(1)
+        # Batches parsed separately do not share their symbol tables
+        for batch_input in [input[:15], input[:1] + input[15:]]:
+            accumulator.update(parser.parse_w3c_to_list(batch_input))
+        self.assertEqual(expected_output, accumulator.finalize())
+        self.assertIn("Malicious activity detected from 10.0.0.1:\n", expected_output)
+
+    def test_malicious_activity_report_in_worker_processes(self):
+        parser = AnaPyzerParser()
+        input = ["#Fields: date time c-ip cs-uri-stem"]
+        input += ["2016-05-16 00:00:%02d 10.0.0.%d /%d" % (i // 20, i % 5, i % 2) for i in range(0, 200)]
+
+        expected_output = self.analyzer.malicious_activity_report(parser.parse_w3c_to_list(input), 1)
+        output = self.analyzer.malicious_activity_report(parser.parse_w3c_to_list(input), 1, worker_count=3)
+        self.assertEqual(expected_output, output)
+        self.assertEqual(5, output.count("Malicious activity detected from "))
+
+    def test_approximate_connections_per_hour(self):
+        parser = AnaPyzerParser()
+        input = ["#Fields: date time c-ip"]
+        input += ["2016-05-16 00:%02d:00 10.0.%d.%d" % (i % 60, i // 256, i % 256) for i in range(0, 600)]
+        input += ["2016-05-16 01:00:00 26.25.144.84"] * 3
+
+        expected_output = self.analyzer.get_connections_per_hour(parser.parse_w3c_to_list(input))
+        output = self.analyzer.get_connections_per_hour(parser.parse_w3c_to_list(input), 12)
+        self.assertAlmostEqual(expected_output['2016-05-16']['00'], output['2016-05-16']['00'], delta=30)
+        self.assertEqual(1, output['2016-05-16']['01'])
+
+        # The sketches of separately parsed parts of a log merge into the sketches of the whole log
+        accumulator = ConnectionsPerHourAccumulator(12)
+        for batch in parser.iter_w3c_batches(input[:300], 100):
+            accumulator.update(batch)
+        other_accumulator = ConnectionsPerHourAccumulator(12)
+        other_accumulator.update(parser.parse_w3c_to_list(input[:1] + input[300:]))
+        accumulator.merge(other_accumulator)
+        self.assertEqual(output, accumulator.finalize())
+        self.assertEqual(603, accumulator.row_count)
+
+    def test_get_web_pages_top_k_by_bytes(self):
+        parser = AnaPyzerParser()
+        input = ["#Fields: date time c-ip cs-uri-stem sc-bytes",
+                 "2016-05-16 00:00:00 52.232.212.188 /a 10",
+                 "2016-05-16 00:00:01 52.232.212.188 /a 10",
+                 "2016-05-16 00:00:02 26.25.144.84 /b 500",
+                 "2016-05-16 00:00:03 26.25.144.84 /c 1"]
+
+        output = self.analyzer.get_web_pages(parser.parse_w3c_to_list(input), 2, 'bytes')
+        self.assertEqual("Web Site Resource Report has 3 entries \n\n The top 2 resources are : \n\n"
+                         "Web Site resource: /b sent 500 bytes in 1 hits \n"
+                         "Web Site resource: /a sent 20 bytes in 2 hits \n", output)
+
+        # A sketch of two resources keeps the largest one, and says how far its count may be over
+        output = self.analyzer.stream_web_pages(parser.iter_w3c_batches(input, 1), 1, 'bytes', 2)
+        self.assertIn("has 2 tracked entries", output)
+        self.assertIn("Web Site resource: /b sent ", output)
+        with self.assertRaises(ValueError):
+            self.analyzer.get_web_pages(parser.parse_w3c_to_list(input), 2, 'time')
+
+    def test_web_pages_sketch_reports_upper_and_lower_bounds(self):
+        header = "#Fields: date time c-ip cs-uri-stem sc-bytes"
+        batches = [["/a 10"] * 3 + ["/b 1"] * 4 + ["/c 100"], ["/c 100"] * 2 + ["/a 10"] * 2]
+        batches = [AnaPyzerParser.parse_w3c_to_list([header] + ["2016-05-16 00:00:00 10.0.0.1 " + line
+                                                                for line in batch]) for batch in batches]
+
+        # /a hit 5 times is evicted by /c and then taken back in, its sketch count of 6 is over by at most 4
+        output = self.analyzer.stream_web_pages(batches, 3, 'hits', 2)
+        self.assertIn("Web Site resource: /a was hit 6 times (over by at most 4) \n", output)
+        self.assertIn("Web Site resource: /c was hit 6 times (over by at most 3) \n", output)
+
+        # Ranked by bytes, /c's 300 bytes are counted as 304, and only its hits since it was last taken in are known
+        output = self.analyzer.stream_web_pages(batches, 3, 'bytes', 2)
+        self.assertIn("Web Site resource: /c sent 304 bytes (over by at most 4) in at least 3 hits \n", output)
+        self.assertIn("Web Site resource: /a sent 50 bytes in 5 hits \n", output)
+
+    def test_write_parsed_log_to_csv_with_changed_w3c_fields(self):
+        input = ["#Fields: date time s-ip cs-uri-stem c-ip sc-bytes",
+                 "2016-05-16 00:00:00 10.0.0.4 /a,b 52.232.212.188 512",
+                 "#Fields: date time c-ip cs-uri-stem cs-version",
+                 "2016-05-16 00:00:01 26.25.144.84 /b HTTP/1.1"]
+        out_file = io.StringIO()
+
+        self.assertTrue(self.analyzer.write_parsed_log_to_csv(AnaPyzerParser.parse_w3c_to_list(input), out_file))
+        self.assertEqual("2016-05-16,00:00:00,10.0.0.4,\"/a,b\",52.232.212.188,512,\n"
+                         "2016-05-16,00:00:01,-,/b,26.25.144.84,-,\n", out_file.getvalue())
+
+    def test_connection_length_report_splits_sessions_on_inactivity(self):
+        parser = AnaPyzerParser()
+        input = ["#Fields: date time c-ip cs-uri-stem sc-bytes cs(UserAgent)",
+                 "2016-05-16 00:00:00 10.0.0.1 /a 100 Mozilla",
+                 "2016-05-16 00:00:05 10.0.0.2 /a 1 curl",
+                 "2016-05-16 00:10:00 10.0.0.1 /b 50 Mozilla",
+                 "2016-05-16 00:10:00 10.0.0.1 /c 5 curl",
+                 "2016-05-16 01:00:00 10.0.0.1 /a 10 Mozilla"]
+
+        output = self.analyzer.get_connection_length_report(parser.parse_w3c_to_list(input))
+        # The requests of 10.0.0.2 in between do not split the first session of 10.0.0.1
+        self.assertEqual("IP Address: 10.0.0.1: 3 request(s) over 600 second(s), 155 bytes sent, "
+                         "from 2016-05-16 00:00:00 to 2016-05-16 00:10:00\n\n"
+                         "IP Address: 10.0.0.1: 1 request(s) over 0 second(s), 10 bytes sent, "
+                         "from 2016-05-16 01:00:00 to 2016-05-16 01:00:00\n\n"
+                         "IP Address: 10.0.0.2: 1 request(s) over 0 second(s), 1 bytes sent, "
+                         "from 2016-05-16 00:00:05 to 2016-05-16 00:00:05\n\n", output)
+        self.assertEqual(output, self.analyzer.stream_connection_length_report(parser.iter_w3c_batches(input, 2)))
+
+        output = self.analyzer.stream_connection_length_report(parser.iter_w3c_batches(input, 1), 3600, True)
+        self.assertIn("IP Address: 10.0.0.1 (Mozilla): 3 request(s) over 3600 second(s), 160 bytes sent", output)
+        self.assertIn("IP Address: 10.0.0.1 (curl): 1 request(s)", output)
+
+    def test_connection_length_report_out_of_order_across_batches(self):
+        parser = AnaPyzerParser()
+        # The batch boundary falls between requests of 10.0.0.1 that are out of time order
+        input = ["#Fields: date time c-ip cs-uri-stem sc-bytes",
+                 "2016-05-16 00:10:00 10.0.0.1 /a 1",
+                 "2016-05-16 00:05:00 10.0.0.1 /b 2",
+                 "2016-05-16 00:12:00 10.0.0.1 /c 4",
+                 "2016-05-16 03:00:00 10.0.0.2 /a 8",
+                 "2016-05-16 01:00:00 10.0.0.2 /b 16"]
+
+        output = self.analyzer.stream_connection_length_report(parser.iter_w3c_batches(input, 1))
+        self.assertEqual(self.analyzer.get_connection_length_report(parser.parse_w3c_to_list(input)), output)
+        # An earlier request within the gap moves the start of the session back, and one further back starts a new one
+        self.assertIn("IP Address: 10.0.0.1: 3 request(s) over 420 second(s), 7 bytes sent, "
+                      "from 2016-05-16 00:05:00 to 2016-05-16 00:12:00\n\n", output)
+        self.assertIn("IP Address: 10.0.0.2: 1 request(s) over 0 second(s), 8 bytes sent", output)
+        self.assertIn("IP Address: 10.0.0.2: 1 request(s) over 0 second(s), 16 bytes sent", output)
+
+    def test_connection_length_report_interleaved_logs_across_batches(self):
+        parser = AnaPyzerParser()
+        # Two logs of 10.0.0.1 merged one after the other: the second one's requests come before the first one's,
+        # fill the gaps between its sessions and join two of them
+        input = ["#Fields: date time c-ip cs-uri-stem sc-bytes",
+                 "2016-05-16 01:00:00 10.0.0.1 /a 1",
+                 "2016-05-16 02:00:00 10.0.0.1 /a 2",
+                 "2016-05-16 05:00:00 10.0.0.1 /a 4",
+                 "2016-05-16 05:20:00 10.0.0.1 /a 8",
+                 "2016-05-16 00:00:00 10.0.0.1 /b 16",
+                 "2016-05-16 01:30:00 10.0.0.1 /b 32",
+                 "2016-05-16 03:00:00 10.0.0.1 /b 64",
+                 "2016-05-16 05:40:00 10.0.0.1 /b 128"]
+
+        expected_output = self.analyzer.get_connection_length_report(parser.parse_w3c_to_list(input))
+        for batch_size in range(1, len(input)):
+            self.assertEqual(expected_output,
+                             self.analyzer.stream_connection_length_report(parser.iter_w3c_batches(input, batch_size)))
+        self.assertIn("IP Address: 10.0.0.1: 3 request(s) over 3600 second(s), 35 bytes sent, "
+                      "from 2016-05-16 01:00:00 to 2016-05-16 02:00:00\n\n", expected_output)
+        self.assertIn("IP Address: 10.0.0.1: 3 request(s) over 2400 second(s), 140 bytes sent", expected_output)
+        self.assertEqual(4, expected_output.count("IP Address"))
+
+    @unittest.skipIf(anapyzernumpy.numpy is None, "NumPy is not installed")
+    def test_numpy_backend_matches_python_backend(self):
+        parser = AnaPyzerParser()
+        input = ["#Fields: date time c-ip cs-uri-stem sc-bytes"]
+        input += ["2016-05-%02d %02d:%02d:00 10.0.0.%d /%d %d" % (16 + i % 3, i % 5, i % 60, i % 7, i % 11, i)
+                  for i in range(0, 500)]
+        # A date and an hour that come back after other rows are added to the rows seen before them
+        input += ["2016-05-16 00:00:00 26.25.144.84 /a -", "2016-05-16 00:00:00 10.0.0.1 /a 5"]
+
+        def analyze():
+            parsed_log = parser.parse_w3c_to_list(input)
+            ip_connections = IpConnectionsAccumulator()
+            ip_connections.update(parsed_log)
+            return (self.analyzer.get_connections_per_hour(parsed_log),
+                    self.analyzer.get_connections_per_hour(parsed_log, 12),
+                    self.analyzer.get_web_pages(parsed_log, 5), self.analyzer.get_web_pages(parsed_log, 5, 'bytes'),
+                    ip_connections.finalize())
+
+        enabled = anapyzernumpy.set_enabled(False)
+        try:
+            expected_output = analyze()
+            anapyzernumpy.set_enabled(True)
+            output = analyze()
+        finally:
+            anapyzernumpy.set_enabled(enabled)
+        self.assertEqual(expected_output, output)
+
+    @unittest.skipIf(anapyzernumpy.numpy is not None, "NumPy is installed")
+    def test_numpy_backend_needs_numpy(self):
+        self.assertFalse(anapyzernumpy.is_enabled())
+        with self.assertRaises(ImportError):
+            anapyzernumpy.set_enabled(True)
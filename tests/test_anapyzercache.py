@@ -0,0 +1,138 @@
+import os
+import pathlib
+import pickle
+import tempfile
+import unittest
+from anapyzercache import AnaPyzerCache, CACHE_SUFFIX, file_identity, compare_file_identity, default_parse_cache
+from anapyzercache import DEFAULT_CACHE_DIR, CACHE_DISABLED_VARIABLE
+from anapyzercache import FILE_UNCHANGED, FILE_APPENDED, FILE_CHANGED
+from anapyzeranalyzer import AnaPyzerAnalyzer
+from anapyzerparser import AnaPyzerParser, LOG_FORMAT_APACHE, LOG_FORMAT_W3C
+
+
+# Unpickles by calling int() with more arguments than it takes
+class _BadArguments:
+    def __reduce__(self):
+        return int, ('1', 10, 'extra')
+
+
+class TestAnaPyzerCacheMethods(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_path = pathlib.Path(self.temp_dir.name) / 'access.log'
+        self.log_path.write_text('73.83.18.52 - - [04/Apr/2018:19:30:50 +0000] "GET / HTTP/1.1" 200 1108\n')
+        self.cache = AnaPyzerCache(pathlib.Path(self.temp_dir.name) / 'cache')
+        with open(self.log_path) as log_file:
+            self.parsed_log = AnaPyzerParser.parse_common_apache_to_list(log_file)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_store_and_load(self):
+        self.assertIsNone(self.cache.load([self.log_path], LOG_FORMAT_APACHE))
+        self.cache.store([self.log_path], LOG_FORMAT_APACHE, None, self.parsed_log)
+
+        self.assertEqual(self.parsed_log, self.cache.load([self.log_path], LOG_FORMAT_APACHE))
+        self.assertIsNone(self.cache.load([self.log_path], LOG_FORMAT_W3C))
+
+    def test_entry_with_every_column_is_used_for_projected_load(self):
+        self.cache.store([self.log_path], LOG_FORMAT_APACHE, None, self.parsed_log)
+        self.assertEqual(self.parsed_log, self.cache.load([self.log_path], LOG_FORMAT_APACHE, ['client-ip']))
+
+    def test_changed_file_is_not_loaded(self):
+        self.cache.store([self.log_path], LOG_FORMAT_APACHE, None, self.parsed_log)
+        with open(self.log_path, 'a') as log_file:
+            log_file.write('73.83.18.52 - - [04/Apr/2018:19:30:51 +0000] "GET / HTTP/1.1" 200 1108\n')
+
+        self.assertIsNone(self.cache.load([self.log_path], LOG_FORMAT_APACHE))
+        self.assertEqual(0, self.cache.get_size())
+
+    def test_invalidate_and_clear(self):
+        other_path = pathlib.Path(self.temp_dir.name) / 'other.log'
+        other_path.write_text('')
+        self.cache.store([self.log_path], LOG_FORMAT_APACHE, None, self.parsed_log)
+        self.cache.store([other_path], LOG_FORMAT_APACHE, None, self.parsed_log)
+
+        self.cache.invalidate([self.log_path])
+        self.assertIsNone(self.cache.load([self.log_path], LOG_FORMAT_APACHE))
+        self.assertIsNotNone(self.cache.load([other_path], LOG_FORMAT_APACHE))
+
+        self.cache.clear()
+        self.assertEqual(0, self.cache.get_size())
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.cache.store([self.log_path], LOG_FORMAT_APACHE, None, self.parsed_log)
+        entry_size = self.cache.get_size()
+        self.cache.max_size = entry_size * 2
+        self.cache.store([self.log_path], LOG_FORMAT_APACHE, ['date'], self.parsed_log)
+        # Make the first entry the most recently used one
+        for entry_path in self.cache.cache_dir.glob('*' + CACHE_SUFFIX):
+            os.utime(entry_path, ns=(1, 1))
+        self.cache.load([self.log_path], LOG_FORMAT_APACHE)
+
+        self.cache.store([self.log_path], LOG_FORMAT_APACHE, ['client-ip'], self.parsed_log)
+        self.assertEqual(2, len(list(self.cache.cache_dir.glob('*' + CACHE_SUFFIX))))
+        self.assertTrue(self.cache._entry_path([self.log_path], LOG_FORMAT_APACHE, None).is_file())
+        self.assertFalse(self.cache._entry_path([self.log_path], LOG_FORMAT_APACHE, ['date']).is_file())
+
+    def test_corrupt_entry_is_ignored(self):
+        self.cache.store([self.log_path], LOG_FORMAT_APACHE, None, self.parsed_log)
+        for entry_path in self.cache.cache_dir.glob('*' + CACHE_SUFFIX):
+            entry_path.write_bytes(b'not a cache entry')
+
+        self.assertIsNone(self.cache.load([self.log_path], LOG_FORMAT_APACHE))
+
+    def test_incompatible_entry_is_ignored(self):
+        self.cache.store([self.log_path], LOG_FORMAT_APACHE, None, self.parsed_log)
+        entry_path = self.cache._entry_path([self.log_path], LOG_FORMAT_APACHE, None)
+        with open(entry_path, 'rb') as entry_file:
+            header = pickle.load(entry_file)
+        # An entry naming a module that no longer exists, and one calling a class with arguments it no longer takes
+        for entry in [b'cno_such_anapyzer_module\nParsedLog\n.', pickle.dumps(_BadArguments())]:
+            entry_path.write_bytes(pickle.dumps(header) + entry)
+            self.assertIsNone(self.cache.load([self.log_path], LOG_FORMAT_APACHE))
+            self.assertFalse(entry_path.is_file())
+            self.cache.store([self.log_path], LOG_FORMAT_APACHE, None, self.parsed_log)
+
+    def test_aggregates_are_not_stored(self):
+        analyzer = AnaPyzerAnalyzer()
+        connections_per_hour = analyzer.get_connections_per_hour(self.parsed_log)
+        analyzer.get_connection_length_report(self.parsed_log)
+        self.cache.store([self.log_path], LOG_FORMAT_APACHE, None, self.parsed_log)
+        self.assertEqual(2, len(self.parsed_log.aggregates))
+
+        parsed_log = self.cache.load([self.log_path], LOG_FORMAT_APACHE)
+        self.assertEqual({}, parsed_log.aggregates)
+        self.assertEqual(connections_per_hour, analyzer.get_connections_per_hour(parsed_log))
+
+    def test_compare_file_identity(self):
+        identity = file_identity(self.log_path)
+        self.assertEqual(FILE_UNCHANGED, compare_file_identity(identity))
+
+        with open(self.log_path, 'a') as log_file:
+            log_file.write('73.83.18.52 - - [04/Apr/2018:19:30:51 +0000] "GET / HTTP/1.1" 200 1108\n')
+        self.assertEqual(FILE_APPENDED, compare_file_identity(identity))
+
+        # Truncated
+        self.log_path.write_text('')
+        self.assertEqual(FILE_CHANGED, compare_file_identity(identity))
+
+    def test_compare_file_identity_rotated_or_incomplete(self):
+        identity = file_identity(self.log_path)
+        # A new log with different contents in place of the old one
+        rotated_path = pathlib.Path(self.temp_dir.name) / 'rotated.log'
+        rotated_path.write_text('10.0.0.1 - - [05/Apr/2018:00:00:00 +0000] "GET /new HTTP/1.1" 200 1\n' * 3)
+        os.replace(rotated_path, self.log_path)
+        self.assertEqual(FILE_CHANGED, compare_file_identity(identity))
+
+        # A log whose last line was only partly written cannot be appended to
+        self.log_path.write_text('10.0.0.1 - - [05/Apr/2018:00:00:00 +0000] "GET')
+        identity = file_identity(self.log_path)
+        with open(self.log_path, 'a') as log_file:
+            log_file.write(' / HTTP/1.1" 200 1\n')
+        self.assertEqual(FILE_CHANGED, compare_file_identity(identity))
+
+    def test_default_parse_cache(self):
+        self.assertEqual(DEFAULT_CACHE_DIR, default_parse_cache({}).cache_dir)
+        self.assertEqual(DEFAULT_CACHE_DIR, default_parse_cache({CACHE_DISABLED_VARIABLE: ''}).cache_dir)
+        self.assertIsNone(default_parse_cache({CACHE_DISABLED_VARIABLE: '1'}))
@@ -42,17 +42,26 @@ class TestAnaPyzerControllerMethods(unittest.TestCase):
         self.controller.open_file_button_clicked()
 
         self.modelMock.get_file_parse_mode.assert_called_once()
-        self.modelMock.create_report_data.assert_called_once()
-        self.modelMock.get_report_data.assert_called_once()
+        self.viewMock.open_report_view.assert_called_once()
+        self.modelMock.write_report_data.assert_called_once_with(self.viewMock.append_report_text)
 
 
     def test_open_file_button_clicked_report_mode_invalid_file(self):
         self.modelMock.get_file_parse_mode.return_value = FileParseModes.REPORT
-        self.modelMock.create_report_data.side_effect = AnaPyzerModelError("Invalid file")
+        self.modelMock.write_report_data.side_effect = AnaPyzerModelError("Invalid file")
         self.controller.open_file_button_clicked()
 
         self.modelMock.get_file_parse_mode.assert_called_once()
-        self.modelMock.create_report_data.assert_called_once()
+        self.modelMock.write_report_data.assert_called_once()
+        self.viewMock.display_error_message.assert_called_once()
+
+    def test_open_file_button_clicked_report_file_mode(self):
+        self.modelMock.get_file_parse_mode.return_value = FileParseModes.REPORT_FILE
+        self.modelMock.export_report.side_effect = AnaPyzerModelError("Could not write to file")
+        self.controller.open_file_button_clicked()
+
+        self.modelMock.export_report.assert_called_once()
+        self.modelMock.write_report_data.assert_not_called()
         self.viewMock.display_error_message.assert_called_once()
 
     def test_open_file_button_clicked_csv_mode_valid_file(self):
@@ -60,4 +69,45 @@ class TestAnaPyzerControllerMethods(unittest.TestCase):
         self.controller.open_file_button_clicked()
 
         self.modelMock.get_file_parse_mode.assert_called_once()
-        self.modelMock.export_log_to_csv.assert_called_once()
\ No newline at end of file
+        self.modelMock.export_log_to_csv.assert_called_once()
+
+    def test_follow_poll_updates_graphs_and_schedules_next_poll(self):
+        self.modelMock.get_file_parse_mode.return_value = FileParseModes.GRAPH
+        self.modelMock.get_graph_data_split.return_value = []
+        self.modelMock.get_follow.return_value = True
+        self.modelMock.poll_log_file_data.return_value = True
+        self.controller.open_file_button_clicked()
+        self.viewMock.after.assert_called_once_with(AnaPyzerController.FOLLOW_POLL_INTERVAL_MS,
+                                                    self.controller._follow_poll)
+
+        self.controller._follow_poll()
+        self.modelMock.poll_log_file_data.assert_called_once()
+        self.assertEqual(2, self.viewMock.display_graph_view.call_count)
+        self.assertEqual(2, self.viewMock.after.call_count)
+
+        self.controller.follow_changed(False)
+        self.modelMock.set_follow.assert_called_once_with(False)
+        self.viewMock.after_cancel.assert_called_once()
+
+    def test_graph_note_is_shown_with_every_graph(self):
+        self.modelMock.get_file_parse_mode.return_value = FileParseModes.GRAPH
+        self.modelMock.get_graph_data_split.return_value = ['04/Apr/2018', '05/Apr/2018']
+        self.modelMock.get_graph_data_note.return_value = 'Skipped 1 malformed line'
+        self.modelMock.get_follow.return_value = False
+        self.controller.open_file_button_clicked()
+
+        self.assertEqual(2, self.viewMock.display_graph_view.call_count)
+        for call in self.viewMock.display_graph_view.call_args_list:
+            self.assertEqual('Skipped 1 malformed line', call[0][5])
+
+        self.controller.skip_malformed_lines_changed(True)
+        self.modelMock.set_skip_malformed_lines.assert_called_once_with(True)
+
+    def test_in_file_browse_button_clicked_selects_detected_log_type(self):
+        self.viewMock.display_in_file_select_prompt.return_value = 'u_ex160516.log'
+        self.modelMock.detect_log_type.return_value = AcceptedLogTypes.IIS
+        self.controller.in_file_browse_button_clicked()
+
+        self.modelMock.set_in_file_path.assert_called_once_with('u_ex160516.log')
+        self.modelMock.set_log_type.assert_called_once_with(AcceptedLogTypes.IIS.value)
+        self.viewMock.set_log_type.assert_called_once_with(AcceptedLogTypes.IIS.value)
@@ -0,0 +1,138 @@
+import bz2
+import gzip
+import lzma
+import pathlib
+import tempfile
+import unittest
+from anapyzerlogfile import MappedLogFile, DecompressingLogFile, is_compressed, open_log_file, expand_log_paths
+from anapyzerlogfile import complete_lines_end, read_log_sample
+from anapyzerparser import AnaPyzerParser
+
+
+class TestAnaPyzerLogFileMethods(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_path = pathlib.Path(self.temp_dir.name) / 'test.log'
+        self.apache_lines = ['73.83.18.52 - - [04/Apr/2018:19:30:50 -0700] "GET / HTTP/1.1" 200 5043 "-" '
+                             '"Mozilla/5.0"\r\n',
+                             '10.0.0.1 - frank [05/Apr/2018:00:00:01 -0700] "POST /login HTTP/1.1" 302 -\n']
+        self.w3c_lines = ['#Software: Microsoft Internet Information Services 8.5\n',
+                          '#Fields: date time s-ip cs-method cs-uri-stem c-ip sc-bytes\n',
+                          '2016-05-16 00:00:08 10.0.0.4 GET / 52.232.212.217 1024\n',
+                          '#Fields: date time c-ip cs-uri-stem\n',
+                          '2016-05-16 00:00:09 26.25.144.16 /index.html\n']
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_iterates_lines_like_a_text_file(self):
+        self.log_path.write_text('first\nsecond\nlast')
+        with MappedLogFile(self.log_path) as log_file:
+            self.assertEqual(['first\n', 'second\n', 'last'], list(log_file))
+            self.assertEqual([(0, 5), (6, 12), (13, 17)], list(log_file.iter_line_offsets()))
+
+    def test_empty_file(self):
+        self.log_path.write_bytes(b'')
+        with MappedLogFile(self.log_path) as log_file:
+            self.assertEqual([], list(log_file))
+
+    def test_split_fields_only_returns_requested_positions(self):
+        self.log_path.write_bytes(b'a bb ccc\r\n')
+        with MappedLogFile(self.log_path) as log_file:
+            start, end = next(log_file.iter_line_offsets())
+            self.assertEqual(['ccc', 'a', None, None], log_file.split_fields(start, end, [2, 0, 5, -1]))
+
+    def test_drop_in_input_for_apache_parser(self):
+        self.log_path.write_bytes(''.join(self.apache_lines).encode())
+        with MappedLogFile(self.log_path) as log_file:
+            output = AnaPyzerParser.parse_common_apache_to_list(log_file)
+        self.assertEqual(AnaPyzerParser.parse_common_apache_to_list(self.apache_lines), output)
+
+    def test_drop_in_input_for_w3c_parser(self):
+        self.log_path.write_bytes(''.join(self.w3c_lines).encode())
+        with MappedLogFile(self.log_path) as log_file:
+            output = AnaPyzerParser.parse_w3c_to_list(log_file)
+        self.assertEqual(AnaPyzerParser.parse_w3c_to_list(self.w3c_lines), output)
+
+    def test_apache_columns_are_projected(self):
+        self.log_path.write_bytes(''.join(self.apache_lines).encode())
+        with MappedLogFile(self.log_path, ['client-ip', 'bytes-sent', 'not-a-field']) as log_file:
+            output = AnaPyzerParser.parse_common_apache_to_list(log_file)
+
+        self.assertEqual(['client-ip', 'bytes-sent'], output.schema.columns)
+        self.assertEqual(['73.83.18.52', '10.0.0.1'], list(output.column('client-ip')))
+        self.assertEqual(['5043', '0'], list(output.column('bytes-sent')))
+        self.assertIsNone(output.column('uri-stem'))
+
+    def test_w3c_columns_are_projected(self):
+        self.log_path.write_bytes(''.join(self.w3c_lines).encode())
+        with MappedLogFile(self.log_path, ['date', 'client-ip', 'uri-stem']) as log_file:
+            output = AnaPyzerParser.parse_w3c_to_list(log_file)
+
+        self.assertEqual(2, output.length)
+        self.assertEqual(['2016-05-16', '2016-05-16'], list(output.column('date')))
+        self.assertEqual(['52.232.212.217', '26.25.144.16'], list(output.column('c-ip')))
+        self.assertEqual(['/', '/index.html'], list(output.column('uri-stem')))
+        self.assertIsNone(output.column('bytes-sent'))
+
+    def test_decompresses_gzip_bzip2_and_xz(self):
+        data = ''.join(self.apache_lines)
+        data += '73.83.18.52 - - [04/Apr/2018:19:30:52 -0700] "GET /caf\u00e9 HTTP/1.1" 200 1'
+        for compress in [gzip.compress, bz2.compress, lzma.compress]:
+            self.log_path.write_bytes(compress(data.encode()))
+            self.assertTrue(is_compressed(self.log_path))
+            # A tiny chunk size splits lines and multi-byte characters between chunks
+            with DecompressingLogFile(self.log_path, chunk_size=7, queue_size=2) as log_file:
+                self.assertEqual(data.splitlines(keepends=True), list(log_file))
+
+    def test_open_log_file_parses_compressed_log(self):
+        self.log_path.write_bytes(gzip.compress(''.join(self.w3c_lines).encode()))
+        log_file = open_log_file(self.log_path, ['date'], True)
+        try:
+            self.assertIsInstance(log_file, DecompressingLogFile)
+            output = AnaPyzerParser.parse_w3c_to_list(log_file)
+        finally:
+            log_file.close()
+        self.assertEqual(AnaPyzerParser.parse_w3c_to_list(self.w3c_lines), output)
+
+    def test_closing_before_reading_everything_stops_the_thread(self):
+        self.log_path.write_bytes(gzip.compress(b'line\n' * 10000))
+        log_file = DecompressingLogFile(self.log_path, chunk_size=16, queue_size=1)
+        next(iter(log_file))
+        log_file.close()
+        self.assertFalse(log_file._thread.is_alive())
+
+    def test_corrupt_compressed_file_raises_io_error(self):
+        self.log_path.write_bytes(gzip.compress(b'line\n' * 100)[:-12] + b'garbage')
+        with DecompressingLogFile(self.log_path) as log_file:
+            with self.assertRaises(IOError):
+                list(log_file)
+
+    def test_expand_log_paths(self):
+        log_dir = pathlib.Path(self.temp_dir.name)
+        for name in ['u_ex160517.log', 'u_ex160516.log', 'access.log.1.gz', '.hidden']:
+            (log_dir / name).write_text('')
+        (log_dir / 'subdir').mkdir()
+
+        self.assertEqual([str(log_dir / 'access.log.1.gz'), str(log_dir / 'u_ex160516.log'),
+                          str(log_dir / 'u_ex160517.log')], expand_log_paths(log_dir))
+        self.assertEqual([str(log_dir / 'u_ex160516.log'), str(log_dir / 'u_ex160517.log')],
+                         expand_log_paths(log_dir / 'u_ex*.log'))
+        self.assertEqual([str(log_dir / 'u_ex160516.log')], expand_log_paths(log_dir / 'u_ex160516.log'))
+        self.assertEqual([], expand_log_paths(log_dir / 'missing.log'))
+
+    def test_complete_lines_end(self):
+        self.log_path.write_bytes(b'first\nsecond\npartial')
+        self.assertEqual(13, complete_lines_end(self.log_path))
+        self.assertEqual(13, complete_lines_end(self.log_path, 6))
+        self.assertEqual(14, complete_lines_end(self.log_path, 14))
+
+    def test_read_log_sample(self):
+        self.log_path.write_bytes(gzip.compress(b'first\r\nsecond\nthird\n'))
+        self.assertEqual(['first', 'second', 'third'], read_log_sample(self.log_path))
+        # A line cut off by the end of the sample is left out
+        self.assertEqual(['first', 'second'], read_log_sample(self.log_path, 16))
+
+        self.log_path.write_bytes(gzip.compress(b'line\n' * 100)[:20])
+        with self.assertRaises(IOError):
+            read_log_sample(self.log_path)
@@ -0,0 +1,73 @@
+import pathlib
+import pickle
+import tempfile
+import unittest
+import anapyzerparallel
+from anapyzerlogformat import compile_log_format, COMMON_LOG_FORMAT, COMBINED_LOG_FORMAT
+from anapyzerparser import AnaPyzerParser
+
+
+class TestAnaPyzerLogFormatMethods(unittest.TestCase):
+    def setUp(self):
+        self.log_format = compile_log_format('%h %l %u %t "%r" %>s %b "%{Referer}i" %D %v "%{X-Forwarded-For}i"')
+        self.lines = ['10.0.0.1 - frank [04/Apr/2018:19:30:50 -0700] "GET /index.html HTTP/1.1" 200 - '
+                      '"http://example.com/" 123456 www.example.com "203.0.113.7, 10.0.0.9"\n',
+                      '10.0.0.2 - - [04/Apr/2018:19:30:51 -0700] "-" 400 12 "-" 950 www.example.com "-"\r\n']
+
+    def test_columns(self):
+        self.assertEqual(['client-ip', 'username', 'date', 'timestamp', 'time-zone', 'method', 'uri-stem',
+                          'protocol', 'sc-status', 'bytes-sent', 'referer', 'time-taken', 'host', 'x-forwarded-for'],
+                         self.log_format.columns)
+        self.assertEqual(4, self.log_format.field_map['time-zone'])
+
+    def test_parse_line(self):
+        self.assertEqual(['10.0.0.1', 'frank', '04/Apr/2018', '19:30:50', '-0700', 'GET', '/index.html',
+                          'HTTP/1.1', '200', '0', 'http://example.com/', '123', 'www.example.com',
+                          '203.0.113.7, 10.0.0.9'], list(self.log_format.parse_line(self.lines[0])))
+        # A missing request line has no method or protocol
+        self.assertEqual(['10.0.0.2', '-', '04/Apr/2018', '19:30:51', '-0700', '-', '-', '-', '400', '12', '-',
+                          '0', 'www.example.com', '-'], list(self.log_format.parse_line(self.lines[1])))
+        with self.assertRaises(IndexError):
+            self.log_format.parse_line('not a log line\n')
+
+    def test_format_copied_from_apache_configuration(self):
+        log_format = compile_log_format(r'"%h %l %u %t \"%r\" %>s %b"')
+        self.assertEqual(compile_log_format(COMMON_LOG_FORMAT).columns, log_format.columns)
+        self.assertEqual('10.0.0.1', log_format.parse_line('10.0.0.1 - - [04/Apr/2018:19:30:50 -0700] '
+                                                           '"GET / HTTP/1.1" 200 5\n')[0])
+
+    def test_unsupported_directive(self):
+        for format_string in ['%h %Z', '%h %{%Y}t', '%h %r', '%h %{}i']:
+            with self.assertRaises(ValueError):
+                compile_log_format(format_string)
+
+    def test_same_output_as_built_in_parser(self):
+        lines = ['73.83.18.52 - - [04/Apr/2018:19:30:50 -0700] "GET / HTTP/1.1" 200 5043 "-" "Mozilla/5.0"\n',
+                 '10.0.0.1 - frank [05/Apr/2018:00:00:01 -0700] "POST /login HTTP/1.1" 302 - '
+                 '"http://example.com/" "Mozilla \\"compatible\\""\n']
+        output = AnaPyzerParser.parse_log_format_to_list(lines, compile_log_format(COMBINED_LOG_FORMAT))
+        expected_output = AnaPyzerParser.parse_common_apache_to_list(lines)
+
+        for name in output.schema.columns:
+            self.assertEqual(list(expected_output.column(name)), list(output.column(name)))
+        self.assertEqual(list(expected_output.column('epoch')), list(output.column('epoch')))
+
+    def test_requested_columns_and_batches(self):
+        batches = list(AnaPyzerParser.iter_batches(self.lines, self.log_format, 1, ['x-forwarded-for', 'date']))
+        self.assertEqual(2, len(batches))
+        self.assertEqual(['x-forwarded-for', 'date'], batches[0].schema.columns)
+        self.assertEqual(['203.0.113.7, 10.0.0.9'], list(batches[0].column('x-forwarded-for')))
+        self.assertIsNone(batches[1].column('client-ip'))
+
+    def test_compared_and_pickled_by_format_string(self):
+        self.assertIs(self.log_format, pickle.loads(pickle.dumps(self.log_format)))
+        self.assertEqual(compile_log_format(COMMON_LOG_FORMAT), pickle.loads(pickle.dumps(
+            compile_log_format(COMMON_LOG_FORMAT))))
+        self.assertNotEqual(self.log_format, compile_log_format(COMMON_LOG_FORMAT))
+
+    def test_parallel_parse_matches_serial_parse(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = pathlib.Path(temp_dir) / 'access.log'
+            log_path.write_text(''.join(self.lines * 50))
+            output = anapyzerparallel.parse_log_file(log_path, self.log_format, 3)
+        self.assertEqual(AnaPyzerParser.parse_log_format_to_list(self.lines * 50, self.log_format), output)
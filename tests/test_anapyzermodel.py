@@ -4,6 +4,10 @@ import unittest.mock
 from anapyzermodel import *
 # Import the pathlib library for cross platform file path abstraction
 import pathlib
+import tempfile
+from anapyzercache import AnaPyzerCache
+from anapyzerparser import AnaPyzerParser
+from anapyzeranalyzer import AnaPyzerAnalyzer
 
 class TestAnaPyzerModelMethods(unittest.TestCase):
     def setUp(self):
@@ -222,7 +226,8 @@ class TestAnaPyzerModelMethods(unittest.TestCase):
             'username': 7,
             'win32-status': 13}
         self.model.create_report_data()
-        self.analyzerMock.malicious_activity_report.assert_called_once_with(self.model._parsed_log_data)
+        self.analyzerMock.malicious_activity_report.assert_called_once_with(self.model._parsed_log_data,
+                                                                           worker_count=1)
 
     def test_create_report_data_connection_length_report(self):
         self.model.set_report_mode(ReportModes.CONN_LENGTH)
@@ -410,7 +415,7 @@ class TestAnaPyzerModelMethods(unittest.TestCase):
             'username': 7,
             'win32-status': 13}
         self.model.create_graph_data()
-        self.analyzerMock.get_connections_per_hour.assert_called_once_with(self.model._parsed_log_data)
+        self.analyzerMock.get_connections_per_hour.assert_called_once_with(self.model._parsed_log_data, None)
 
     def test_create_graph_data_ip_connection_report(self):
         self.model.set_graph_mode(GraphModes.IP_CONNECTIONS)
@@ -506,3 +511,317 @@ class TestAnaPyzerModelMethods(unittest.TestCase):
         self.model.create_graph_data()
         self.analyzerMock.ip_connection_report.assert_called_once_with(self.model._parsed_log_data)
 
+    def test_create_graph_data_streaming_does_not_store_parsed_log(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = pathlib.Path(temp_dir) / 'access.log'
+            log_path.write_text("#Fields: date time c-ip\n2016-05-16 00:00:00 52.232.212.188\n")
+            self.model.set_in_file_path(str(log_path))
+            self.model.set_log_type(AcceptedLogTypes.IIS)
+            self.model.set_graph_mode(GraphModes.CON_PER_HOUR)
+            self.model.set_streaming(True)
+            self.model.create_graph_data()
+
+        self.analyzerMock.stream_connections_per_hour.assert_called_once()
+        self.parserMock.iter_w3c_batches.assert_called_once()
+        self.assertIsNone(self.model._parsed_log_data)
+
+    def test_create_all_data_parses_the_log_once(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = pathlib.Path(temp_dir) / 'u_ex160516.log'
+            log_path.write_text("#Fields: date time c-ip cs-uri-stem sc-bytes\n" +
+                                "2016-05-16 00:00:01 52.232.212.188 /login 10\n" * 6 +
+                                "2016-05-16 01:00:00 26.25.144.84 /a 20\n")
+            modes = [GraphModes.CON_PER_HOUR, ReportModes.URL_RPT, ReportModes.SUSP_ACT, ReportModes.CONN_LENGTH]
+            for streaming in [False, True]:
+                self.model = AnaPyzerModel(AnaPyzerParser(), AnaPyzerAnalyzer())
+                self.model.set_in_file_path(str(log_path))
+                self.model.set_log_type(AcceptedLogTypes.IIS)
+                self.model.set_streaming(streaming)
+                with unittest.mock.patch.object(AnaPyzerParser, 'iter_w3c_batches',
+                                                wraps=AnaPyzerParser.iter_w3c_batches) as parse_mock:
+                    data = self.model.create_all_data(modes)
+                self.assertEqual(1, parse_mock.call_count)
+
+                for mode in modes:
+                    if isinstance(mode, GraphModes):
+                        self.model.set_graph_mode(mode)
+                        self.model.create_graph_data()
+                        self.assertEqual(self.model._graph_data, data[mode])
+                    else:
+                        self.model.set_report_mode(mode)
+                        self.model.create_report_data()
+                        self.assertEqual(self.model.get_report_data(), data[mode])
+                self.assertEqual({'00': 1, '01': 1}, data[GraphModes.CON_PER_HOUR]['2016-05-16'])
+                self.assertIn("/login  was accessed more than five times", data[ReportModes.SUSP_ACT])
+
+    def test_export_report(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = pathlib.Path(temp_dir) / 'u_ex160516.log'
+            log_path.write_text("#Fields: date time c-ip cs-uri-stem sc-bytes\n" +
+                                "2016-05-16 00:00:01 52.232.212.188 /login 10\n" * 3 +
+                                "2016-05-16 01:00:00 26.25.144.84 /a 20\n")
+            for streaming in [False, True]:
+                self.model = AnaPyzerModel(AnaPyzerParser(), AnaPyzerAnalyzer())
+                self.model.set_in_file_path(str(log_path))
+                self.model.set_log_type(AcceptedLogTypes.IIS)
+                self.model.set_file_parse_mode(FileParseModes.REPORT)
+                self.model.set_report_mode(ReportModes.URL_RPT)
+                self.model.set_streaming(streaming)
+
+                self.model.set_out_file_path(str(pathlib.Path(temp_dir) / 'report.txt'))
+                self.assertTrue(self.model.export_report())
+                self.model.create_report_data()
+                self.assertEqual(self.model.get_report_data(),
+                                 (pathlib.Path(temp_dir) / 'report.txt').read_text())
+
+                # The report view is given the same text a chunk at a time
+                chunks = []
+                self.model.write_report_data(chunks.append)
+                self.assertEqual([self.model.get_report_data()], chunks)
+
+                self.model.set_out_file_path(str(pathlib.Path(temp_dir) / 'report.csv'))
+                self.model.export_report()
+                self.assertEqual("url,hits,bytes_sent,error\n/login,3,30,0\n/a,1,20,0\n",
+                                 (pathlib.Path(temp_dir) / 'report.csv').read_text())
+
+    def test_memory_mapped_parse_only_reparses_for_missing_columns(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = pathlib.Path(temp_dir) / 'access.log'
+            log_path.write_text("#Fields: date time c-ip\n2016-05-16 00:00:00 52.232.212.188\n")
+            self.model.set_in_file_path(str(log_path))
+            self.model.set_log_type(AcceptedLogTypes.IIS)
+            self.model.set_memory_mapped(True)
+            self.model.set_graph_mode(GraphModes.CON_PER_HOUR)
+            self.model.create_graph_data()
+            self.model.set_graph_mode(GraphModes.IP_CONNECTIONS)
+            self.model.create_graph_data()
+            self.assertEqual(1, self.parserMock.parse_w3c_requested_to_list.call_count)
+            log_file, columns = self.parserMock.parse_w3c_requested_to_list.call_args[0]
+            self.assertIsInstance(log_file, MappedLogFile)
+            self.assertEqual(GraphModes.CON_PER_HOUR.columns, columns)
+
+            self.model.set_report_mode(ReportModes.URL_RPT)
+            self.model.create_report_data()
+            self.assertEqual(2, self.parserMock.parse_w3c_requested_to_list.call_count)
+            self.parserMock.parse_w3c_requested_to_list.assert_called_with(unittest.mock.ANY,
+                                                                           ReportModes.URL_RPT.columns,
+                                                                           malformed_lines=None)
+
+    def test_export_log_to_csv_parses_every_column(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = pathlib.Path(temp_dir) / 'access.log'
+            log_path.write_text("#Fields: date time c-ip\n2016-05-16 00:00:00 52.232.212.188\n")
+            self.model.set_in_file_path(str(log_path))
+            self.model.set_log_type(AcceptedLogTypes.IIS)
+            self.model.set_file_parse_mode(FileParseModes.CSV)
+            self.model.set_out_file_path(str(pathlib.Path(temp_dir) / 'out.csv'))
+            self.model.export_log_to_csv()
+
+        self.parserMock.parse_w3c_to_list.assert_called_once()
+        self.parserMock.parse_w3c_requested_to_list.assert_not_called()
+
+    def test_create_graph_data_from_directory_of_logs(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_dir = pathlib.Path(temp_dir)
+            (log_dir / 'u_ex160517.log').write_text("#Fields: date time c-ip\n2016-05-17 00:00:00 52.232.212.188\n")
+            (log_dir / 'u_ex160516.log').write_text("#Fields: date time c-ip\n2016-05-16 00:00:00 26.25.144.84\n")
+            self.model.set_in_file_path(temp_dir)
+            self.model.set_log_type(AcceptedLogTypes.IIS)
+            self.model.set_graph_mode(GraphModes.CON_PER_HOUR)
+            self.assertTrue(self.model.in_file_path_is_valid())
+            self.model.create_graph_data()
+
+        parsed_log = self.analyzerMock.get_connections_per_hour.call_args[0][0]
+        self.assertEqual(['2016-05-16', '2016-05-17'], list(parsed_log.column('date')))
+
+    def test_parse_cache_is_used_instead_of_parsing_again(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = pathlib.Path(temp_dir) / 'access.log'
+            log_path.write_text("#Fields: date time c-ip\n2016-05-16 00:00:00 52.232.212.188\n")
+            parse_cache = AnaPyzerCache(pathlib.Path(temp_dir) / 'cache')
+            self.model._parser = AnaPyzerParser()
+            self.model.set_parse_cache(parse_cache)
+            self.model.set_in_file_path(str(log_path))
+            self.model.set_log_type(AcceptedLogTypes.IIS)
+            self.model.set_graph_mode(GraphModes.CON_PER_HOUR)
+            self.model.create_graph_data()
+            parsed_log = self.model._parsed_log_data
+
+            # A new model with a parser that cannot parse anything loads the log from the cache
+            self.model = AnaPyzerModel(self.parserMock, self.analyzerMock)
+            self.model.set_parse_cache(parse_cache)
+            self.model.set_in_file_path(str(log_path))
+            self.model.set_log_type(AcceptedLogTypes.IIS)
+            self.model.create_graph_data()
+            self.parserMock.parse_w3c_requested_to_list.assert_not_called()
+            self.assertEqual(parsed_log, self.model._parsed_log_data)
+
+            self.parserMock.parse_w3c_requested_to_list.return_value = parsed_log
+            self.model.invalidate_parse_cache()
+            self.model.create_graph_data()
+            self.parserMock.parse_w3c_requested_to_list.assert_called_once()
+
+    def test_appended_lines_are_parsed_incrementally(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = pathlib.Path(temp_dir) / 'u_ex160516.log'
+            log_path.write_text("#Fields: date time c-ip\n2016-05-16 00:00:00 52.232.212.188\n")
+            self.model = AnaPyzerModel(AnaPyzerParser(), AnaPyzerAnalyzer())
+            self.model.set_parse_cache(AnaPyzerCache(pathlib.Path(temp_dir) / 'cache'))
+            self.model.set_in_file_path(str(log_path))
+            self.model.set_log_type(AcceptedLogTypes.IIS)
+            self.model.set_graph_mode(GraphModes.CON_PER_HOUR)
+            self.model.create_graph_data()
+
+            with open(log_path, 'a') as log_file:
+                log_file.write("#Fields: date c-ip time\n2016-05-16 26.25.144.84 00:10:00\n")
+            with unittest.mock.patch.object(AnaPyzerParser, 'parse_w3c_requested_to_list') as parse_mock:
+                self.model.set_in_file_path(str(log_path))
+                self.model.create_graph_data()
+                parse_mock.assert_not_called()
+            self.assertEqual({'00': 2}, self.model._graph_data['2016-05-16'])
+            parsed_log = self.model._parsed_log_data
+            self.assertEqual(['00:00:00', '00:10:00'], list(parsed_log.column('timestamp')))
+            self.assertEqual(2, parsed_log.aggregates['connections-per-hour'].row_count)
+
+            # A new model picks up the appended lines from the parse cache
+            with open(log_path, 'a') as log_file:
+                log_file.write("2016-05-16 26.25.144.85 01:00:00\n")
+            parse_cache = self.model.get_parse_cache()
+            self.model = AnaPyzerModel(AnaPyzerParser(), AnaPyzerAnalyzer())
+            self.model.set_parse_cache(parse_cache)
+            self.model.set_in_file_path(str(log_path))
+            self.model.set_log_type(AcceptedLogTypes.IIS)
+            with unittest.mock.patch.object(AnaPyzerParser, 'parse_w3c_requested_to_list') as parse_mock:
+                self.model.create_graph_data()
+                parse_mock.assert_not_called()
+            self.assertEqual({'00': 2, '01': 1}, self.model._graph_data['2016-05-16'])
+
+    def test_truncated_log_is_parsed_again(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = pathlib.Path(temp_dir) / 'u_ex160516.log'
+            log_path.write_text("#Fields: date time c-ip\n2016-05-16 00:00:00 52.232.212.188\n"
+                                "2016-05-16 00:00:01 52.232.212.189\n")
+            self.model = AnaPyzerModel(AnaPyzerParser(), AnaPyzerAnalyzer())
+            self.model.set_in_file_path(str(log_path))
+            self.model.set_log_type(AcceptedLogTypes.IIS)
+            self.model.create_graph_data()
+
+            log_path.write_text("#Fields: date time c-ip\n2016-05-17 00:00:00 26.25.144.84\n")
+            self.model.set_in_file_path(str(log_path))
+            self.model.create_graph_data()
+            self.assertEqual(['2016-05-17'], list(self.model._parsed_log_data.column('date')))
+
+    def test_followed_log_is_polled_for_appended_lines(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = pathlib.Path(temp_dir) / 'u_ex160516.log'
+            # The last line is still being written
+            log_path.write_text("#Fields: date time c-ip\n2016-05-16 00:00:00 52.232.212.188\n2016-05-16 00:0")
+            self.model = AnaPyzerModel(AnaPyzerParser(), AnaPyzerAnalyzer())
+            self.model.set_in_file_path(str(log_path))
+            self.model.set_log_type(AcceptedLogTypes.IIS)
+            self.model.set_follow(True)
+            self.model.create_graph_data()
+            self.assertEqual({'00': 1}, self.model._graph_data['2016-05-16'])
+            self.assertFalse(self.model.poll_log_file_data())
+
+            with open(log_path, 'a') as log_file:
+                log_file.write("1:00 26.25.144.84\n2016-05-16 01:00:00 26.25.144.85\n")
+            with unittest.mock.patch.object(AnaPyzerParser, 'parse_w3c_requested_to_list') as parse_mock:
+                self.assertTrue(self.model.poll_log_file_data())
+                parse_mock.assert_not_called()
+            self.assertEqual({'00': 2, '01': 1}, self.model._graph_data['2016-05-16'])
+            self.assertEqual(3, self.model._parsed_log_data.aggregates['connections-per-hour'].row_count)
+
+            # The country report keeps its counts with the parsed log as well
+            self.model.set_graph_mode(GraphModes.IP_CONNECTIONS)
+            self.model.create_graph_data()
+            with open(log_path, 'a') as log_file:
+                log_file.write("2016-05-17 00:00:00 26.25.144.86\n")
+            self.assertTrue(self.model.poll_log_file_data())
+            self.assertEqual(4, self.model._parsed_log_data.aggregates['ip-connections'].row_count)
+            self.assertIn('2016-05-17', self.model._graph_data)
+
+            # A rotated log is parsed again from the start
+            log_path.write_text("#Fields: date time c-ip\n2016-05-18 00:00:00 26.25.144.84\n")
+            self.assertTrue(self.model.poll_log_file_data())
+            self.assertEqual(['2016-05-18'], list(self.model._parsed_log_data.column('date')))
+
+    def test_ip_connections_graph_on_fresh_log(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = pathlib.Path(temp_dir) / 'access.log'
+            log_path.write_text("73.83.18.52 - - [04/Apr/2018:23:30:50 -0700] \"GET / HTTP/1.1\" 200 5\n"
+                                "73.83.18.53 - - [05/Apr/2018:00:10:00 -0700] \"GET / HTTP/1.1\" 200 5\n")
+            for streaming in [False, True]:
+                self.model = AnaPyzerModel(AnaPyzerParser(), AnaPyzerAnalyzer())
+                self.model.set_in_file_path(str(log_path))
+                self.model.set_log_type(AcceptedLogTypes.APACHE)
+                self.model.set_streaming(streaming)
+                self.model.set_graph_mode(GraphModes.IP_CONNECTIONS)
+                self.model.create_graph_data()
+                self.assertEqual(1, sum(self.model._graph_data['04/Apr/2018'].values()))
+                self.assertEqual(1, sum(self.model._graph_data['05/Apr/2018'].values()))
+
+                data = self.model.create_all_data([GraphModes.IP_CONNECTIONS])[GraphModes.IP_CONNECTIONS]
+                self.assertEqual(self.model._graph_data, data)
+
+    def test_log_type_is_detected_before_parsing(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = pathlib.Path(temp_dir) / 'u_ex160516.log'
+            log_path.write_text("#Fields: date time c-ip\n2016-05-16 00:00:00 52.232.212.188\n")
+            self.model.set_in_file_path(str(log_path))
+            self.assertIs(AcceptedLogTypes.IIS, self.model.detect_log_type())
+
+            self.model.set_log_type(AcceptedLogTypes.APACHE)
+            with self.assertRaises(AnaPyzerModelError):
+                self.model.create_graph_data()
+            self.parserMock.parse_common_apache_requested_to_list.assert_not_called()
+
+            log_path.write_text("not a log\n")
+            self.assertIsNone(self.model.detect_log_type())
+
+    def test_custom_apache_log_format_is_parsed_with_compiled_format(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = pathlib.Path(temp_dir) / 'access.log'
+            log_path.write_text('10.0.0.1 - - [04/Apr/2018:19:30:50 +0000] "GET / HTTP/1.1" 200 5 1500 example.com\n')
+            self.model.set_in_file_path(str(log_path))
+            self.model.set_log_type(AcceptedLogTypes.APACHE)
+            self.model.set_apache_log_format('%h %l %u %t "%r" %>s %b %D %v')
+            self.model.set_graph_mode(GraphModes.CON_PER_HOUR)
+            self.model.create_graph_data()
+
+        self.assertEqual('%h %l %u %t "%r" %>s %b %D %v', self.model.get_apache_log_format())
+        self.parserMock.parse_log_format_to_list.assert_called_once()
+        self.assertEqual(['client-ip', 'username', 'date', 'timestamp', 'time-zone', 'method', 'uri-stem',
+                          'protocol', 'sc-status', 'bytes-sent', 'time-taken', 'host'],
+                         self.parserMock.parse_log_format_to_list.call_args[0][1].columns)
+        self.parserMock.parse_common_apache_requested_to_list.assert_not_called()
+
+        with self.assertRaises(AnaPyzerModelError):
+            self.model.set_apache_log_format('%h %Z')
+        self.model.set_apache_log_format('')
+        self.assertIsNone(self.model.get_apache_log_format())
+
+    def test_malformed_lines_are_skipped_and_reported(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = pathlib.Path(temp_dir) / 'access.log'
+            log_path.write_text('10.0.0.1 - - [04/Apr/2018:19:30:50 +0000] "GET / HTTP/1.1" 200 5\n'
+                                '10.0.0.2 - - [04/Apr/2018:19:30:51 +0000] "GET /cut\n'
+                                '10.0.0.1 - - [04/Apr/2018:20:30:50 +0000] "GET / HTTP/1.1" 200 5\n')
+            self.model = AnaPyzerModel(AnaPyzerParser(), AnaPyzerAnalyzer())
+            self.model.set_in_file_path(str(log_path))
+            self.model.set_log_type(AcceptedLogTypes.APACHE)
+            self.model.set_file_parse_mode(FileParseModes.REPORT)
+            with self.assertRaises(AnaPyzerModelError):
+                self.model.create_report_data()
+
+            self.model.set_skip_malformed_lines(True)
+            self.model.create_report_data()
+            self.assertEqual({'truncated line': 1}, self.model.get_malformed_lines().counts)
+            self.assertTrue(self.model.get_report_data().endswith(self.model.get_malformed_lines_summary()))
+            self.assertIn('Sample of malformed lines: 2', self.model.get_report_data())
+
+            self.model.set_file_parse_mode(FileParseModes.GRAPH)
+            self.model.set_streaming(True)
+            self.model.create_graph_data()
+            self.assertEqual({'19': 1, '20': 1}, self.model._graph_data['04/Apr/2018'])
+            self.assertEqual(self.model.get_malformed_lines_summary(), self.model.get_graph_data_note())
@@ -0,0 +1,128 @@
+import gzip
+import pathlib
+import tempfile
+import unittest
+import anapyzerparallel
+from anapyzerparser import AnaPyzerParser, MalformedLines, LOG_FORMAT_APACHE, LOG_FORMAT_W3C
+
+
+class TestAnaPyzerParallelMethods(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_path = pathlib.Path(self.temp_dir.name) / 'test.log'
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_split_file_ranges_aligned_to_lines(self):
+        self.log_path.write_bytes(b'aaaa\nbb\ncccccc\nd\n')
+        ranges = anapyzerparallel.split_file_ranges(self.log_path, 3)
+
+        data = self.log_path.read_bytes()
+        self.assertEqual(0, ranges[0][0])
+        self.assertEqual(len(data), ranges[-1][1])
+        for start, end in ranges:
+            self.assertTrue(start == 0 or data[start - 1:start] == b'\n')
+            self.assertEqual(b'\n', data[end - 1:end])
+
+    def test_parse_log_file_apache_matches_serial_parse(self):
+        lines = ['10.0.0.%d - - [04/Apr/2018:19:30:%02d +0000] "GET /%d HTTP/1.1" 200 %d\n' % (i % 7, i % 60, i, i)
+                 for i in range(0, 200)]
+        self.log_path.write_text(''.join(lines))
+
+        expected_output = AnaPyzerParser.parse_common_apache_to_list(lines)
+        output = anapyzerparallel.parse_log_file(self.log_path, LOG_FORMAT_APACHE, 4)
+        self.assertEqual(expected_output, output)
+
+    def test_parse_log_file_w3c_passes_header_to_every_worker(self):
+        lines = ['#Fields: date time c-ip cs-uri-stem\n']
+        lines += ['2016-05-16 00:00:%02d 52.232.212.%d /%d\n' % (i % 60, i % 5, i) for i in range(0, 100)]
+        lines += ['#Fields: date time cs-uri-stem c-ip\n']
+        lines += ['2016-05-16 00:01:%02d /%d 26.25.144.%d\n' % (i % 60, i, i % 5) for i in range(0, 100)]
+        self.log_path.write_text(''.join(lines))
+
+        output = anapyzerparallel.parse_log_file(self.log_path, LOG_FORMAT_W3C, 4)
+        self.assertEqual(200, output.length)
+        self.assertEqual('52.232.212.0', output[0][output['client-ip']])
+        self.assertEqual('26.25.144.4', output[199][output['client-ip']])
+        self.assertEqual('2016-05-16', output[199][output['date']])
+        self.assertEqual(AnaPyzerParser.parse_w3c_to_list(lines), output)
+
+    def test_parse_log_file_compressed_log_is_parsed_serially(self):
+        lines = ['10.0.0.%d - - [04/Apr/2018:19:30:%02d +0000] "GET /%d HTTP/1.1" 200 %d\n' % (i % 7, i % 60, i, i)
+                 for i in range(0, 50)]
+        self.log_path.write_bytes(gzip.compress(''.join(lines).encode()))
+
+        output = anapyzerparallel.parse_log_file(self.log_path, LOG_FORMAT_APACHE, 4)
+        self.assertEqual(AnaPyzerParser.parse_common_apache_to_list(lines), output)
+
+    def test_parse_log_files_merges_in_timestamp_order(self):
+        log_dir = pathlib.Path(self.temp_dir.name)
+        (log_dir / 'access.log.1').write_text(
+            '10.0.0.1 - - [31/Mar/2018:23:59:58 +0000] "GET /a HTTP/1.1" 200 1\n'
+            '10.0.0.1 - - [01/Apr/2018:00:00:02 +0000] "GET /c HTTP/1.1" 200 1\n')
+        (log_dir / 'access.log').write_bytes(gzip.compress(
+            b'10.0.0.2 - - [01/Apr/2018:00:00:01 +0000] "GET /b HTTP/1.1" 200 1\n'
+            b'10.0.0.2 - - [01/Apr/2018:00:00:03 +0000] "GET /d HTTP/1.1" 200 1\n'))
+
+        file_paths = [log_dir / 'access.log', log_dir / 'access.log.1']
+        for worker_count in [1, 2]:
+            output = anapyzerparallel.parse_log_files(file_paths, LOG_FORMAT_APACHE, worker_count,
+                                                      ['date', 'timestamp', 'uri-stem'])
+            self.assertEqual(['/a', '/b', '/c', '/d'], list(output.column('uri-stem')))
+            self.assertEqual(-1, output['client-ip'])
+
+    def test_iter_merged_batches_unifies_w3c_columns(self):
+        first = AnaPyzerParser.iter_w3c_batches(['#Fields: date time c-ip',
+                                                 '2016-05-16 00:00:00 10.0.0.1',
+                                                 '2016-05-16 00:00:02 10.0.0.1'], 1)
+        second = AnaPyzerParser.iter_w3c_batches(['#Fields: date time cs-uri-stem c-ip',
+                                                  '2016-05-16 00:00:01 /b 10.0.0.2'], 1)
+
+        batches = list(anapyzerparallel.iter_merged_batches([first, second], 2))
+        self.assertEqual([2, 1], [batch.length for batch in batches])
+        self.assertEqual(['10.0.0.1', '10.0.0.2'], list(batches[0].column('client-ip')))
+        self.assertEqual([None, '/b'], list(batches[0].column('uri-stem')))
+        self.assertEqual(['00:00:02'], list(batches[1].column('timestamp')))
+
+    def test_iter_merged_batches_widens_schema_for_later_w3c_segments(self):
+        first = AnaPyzerParser.iter_w3c_batches(['#Fields: date time c-ip',
+                                                 '2016-05-16 00:00:00 10.0.0.1',
+                                                 '#Fields: date time c-ip cs-uri-stem',
+                                                 '2016-05-16 00:00:02 10.0.0.1 /c'], 1)
+        second = AnaPyzerParser.iter_w3c_batches(['#Fields: date time c-ip',
+                                                  '2016-05-16 00:00:01 10.0.0.2',
+                                                  '2016-05-16 00:00:03 10.0.0.2'], 1)
+
+        batches = list(anapyzerparallel.iter_merged_batches([first, second], 2))
+        self.assertEqual(['10.0.0.1', '10.0.0.2', '10.0.0.1', '10.0.0.2'],
+                         [ip for batch in batches for ip in batch.column('client-ip')])
+        # The column of the later segment is kept, with no value in the rows of the other segments
+        self.assertEqual([None, None, '/c', None], [uri for batch in batches for uri in batch.column('uri-stem')])
+
+    def test_iter_merged_batches_in_epoch_order_across_time_zones(self):
+        first = AnaPyzerParser.iter_common_apache_batches(
+            ['10.0.0.1 - - [04/Apr/2018:12:00:00 -0700] "GET /a HTTP/1.1" 200 1',
+             '10.0.0.1 - - [04/Apr/2018:12:30:00 -0700] "GET /c HTTP/1.1" 200 1'], 1)
+        second = AnaPyzerParser.iter_common_apache_batches(
+            ['10.0.0.2 - - [04/Apr/2018:19:10:00 +0000] "GET /b HTTP/1.1" 200 1',
+             '10.0.0.2 - - [04/Apr/2018:19:40:00 +0000] "GET /d HTTP/1.1" 200 1'], 1)
+
+        batches = list(anapyzerparallel.iter_merged_batches([second, first], None))
+        self.assertEqual(['/a', '/b', '/c', '/d'], list(batches[0].column('uri-stem')))
+
+    def test_parse_log_file_counts_malformed_lines_of_every_range(self):
+        lines = ['#Fields: date time c-ip\n']
+        lines += ['2016-05-16 00:00:%02d 52.232.212.%d\n' % (i % 60, i % 5) if i % 25 else 'truncated\n'
+                  for i in range(1, 100)]
+        self.log_path.write_text(''.join(lines))
+
+        expected_malformed_lines = MalformedLines()
+        expected_output = AnaPyzerParser.parse_w3c_to_list(lines, expected_malformed_lines)
+        for worker_count in [1, 4]:
+            malformed_lines = MalformedLines()
+            output = anapyzerparallel.parse_log_file(self.log_path, LOG_FORMAT_W3C, worker_count, None,
+                                                     malformed_lines)
+            self.assertEqual(expected_output, output)
+            self.assertEqual(expected_malformed_lines, malformed_lines)
+        self.assertEqual([26, 51, 76], [line_number for source, line_number, category in malformed_lines.sample])
@@ -0,0 +1,97 @@
+import unittest
+import pickle
+from anapyzerparsedlog import ParsedLog, LogSchema, StringColumn, SymbolTable, MISSING_EPOCH
+
+
+class TestAnaPyzerParsedLogMethods(unittest.TestCase):
+    def setUp(self):
+        columns = ['date', 'timestamp', 'client-ip', 'uri-stem']
+        self.parsed_log = ParsedLog(LogSchema(columns, {name: i for i, name in enumerate(columns)}))
+        self.parsed_log.append_row(['04/Apr/2018', '19:30:50', '73.83.18.52', '/'])
+        self.parsed_log.append_row(['04/Apr/2018', '19:30:51', '73.83.18.52', '/css/style.css'])
+
+    def test_string_column_shares_repeated_values(self):
+        column = StringColumn()
+        for value in ['a', 'b', 'a', 'a']:
+            column.append(value)
+        self.assertEqual(['a', 'b'], column.symbols)
+        self.assertEqual([0, 1, 0, 0], list(column.codes))
+        self.assertEqual(['a', 'b', 'a', 'a'], list(column))
+
+    def test_columns_sharing_a_symbol_table(self):
+        symbol_table = SymbolTable()
+        first, second = StringColumn(symbol_table), StringColumn(symbol_table)
+        first.extend_values(['a', 'b'])
+        second.extend_values(['b', 'c'])
+        self.assertEqual([1, 2], list(second.codes))
+        first.extend(second)
+        self.assertEqual(['a', 'b', 'b', 'c'], list(first))
+        self.assertEqual(['a', 'b', 'c'], symbol_table.symbols)
+
+        # Derived values are only worked out for the symbols added since they were last asked for
+        calls = []
+
+        def upper(value):
+            calls.append(value)
+            return value.upper()
+
+        self.assertEqual(['A', 'B', 'C'], symbol_table.derived('upper', upper))
+        symbol_table.code('d')
+        self.assertEqual(['A', 'B', 'C', 'D'], symbol_table.derived('upper', str.upper))
+        self.assertEqual(['a', 'b', 'c'], calls)
+
+        # Columns pickled together still share their symbol table
+        first, second = pickle.loads(pickle.dumps((first, second)))
+        self.assertIs(first.symbol_table, second.symbol_table)
+        second.append('e')
+        self.assertEqual(4, second.codes[-1])
+
+    def test_logs_sharing_symbol_tables(self):
+        other = ParsedLog(LogSchema(self.parsed_log.schema.columns, self.parsed_log.schema.field_map),
+                          self.parsed_log.symbol_tables)
+        other.append_row(['04/Apr/2018', '19:30:52', '73.83.18.52', '/'])
+        self.assertEqual([0], list(other.column('client-ip').codes))
+
+    def test_epoch_column(self):
+        columns = ['date', 'timestamp', 'time-zone']
+        parsed_log = ParsedLog(LogSchema(columns, {name: i for i, name in enumerate(columns)}))
+        parsed_log.append_row(['04/Apr/2018', '19:30:50', '+0000'])
+        parsed_log.append_row(['04/Apr/2018', '12:30:51', '-0700'])
+        self.assertEqual([1522870250, 1522870251], list(parsed_log.column('epoch')))
+
+        # Only the rows added since are worked out, and an unreadable time gets MISSING_EPOCH
+        epoch_column = parsed_log.epoch_column()
+        parsed_log.append_row(['2016-05-16', 'garbage', None])
+        self.assertIs(epoch_column, parsed_log.epoch_column())
+        self.assertEqual([1522870250, 1522870251, MISSING_EPOCH], list(epoch_column))
+
+        # A log without a time zone column is taken to be in UTC, as W3C logs are
+        self.assertEqual([1522870250, 1522870251], list(self.parsed_log.column('epoch')))
+        self.assertIsNone(ParsedLog(LogSchema(['client-ip'], {'client-ip': 0})).column('epoch'))
+
+    def test_column_by_name(self):
+        self.assertEqual(['73.83.18.52', '73.83.18.52'], list(self.parsed_log.column('client-ip')))
+        self.assertIsNone(self.parsed_log.column('user-agent'))
+
+    def test_compatibility_access(self):
+        self.assertEqual(2, self.parsed_log['length'])
+        self.assertEqual(2, self.parsed_log['client-ip'])
+        self.assertEqual('/css/style.css', self.parsed_log[1][self.parsed_log['uri-stem']])
+
+    def test_to_dict_and_from_dict_round_trip(self):
+        expected_output = {0: ['04/Apr/2018', '19:30:50', '73.83.18.52', '/'],
+                           1: ['04/Apr/2018', '19:30:51', '73.83.18.52', '/css/style.css'],
+                           'date': 0,
+                           'timestamp': 1,
+                           'client-ip': 2,
+                           'uri-stem': 3,
+                           'length': 2}
+        self.assertEqual(expected_output, self.parsed_log.to_dict())
+        self.assertEqual(self.parsed_log, ParsedLog.from_dict(expected_output))
+
+    def test_extend(self):
+        other = ParsedLog(LogSchema(self.parsed_log.schema.columns, self.parsed_log.schema.field_map))
+        other.append_row(['05/Apr/2018', '00:00:01', '10.0.0.1', '/'])
+        self.parsed_log.extend(other)
+        self.assertEqual(3, self.parsed_log.length)
+        self.assertEqual(['05/Apr/2018', '00:00:01', '10.0.0.1', '/'], self.parsed_log[2])
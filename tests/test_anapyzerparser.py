@@ -1,6 +1,8 @@
 import unittest
 import unittest.mock
-from anapyzerparser import AnaPyzerParser
+from anapyzerparser import AnaPyzerParser, detect_log_format, LOG_FORMAT_APACHE, LOG_FORMAT_W3C
+from anapyzerparser import MalformedLines, MALFORMED_BLANK, MALFORMED_TRUNCATED, MALFORMED_NO_TIMESTAMP
+from anapyzerparser import MALFORMED_NO_FIELDS, MALFORMED_FIELD_COUNT
 
 class TestAnaPyzerParserMethods(unittest.TestCase):
     def setUp(self):
@@ -199,16 +201,23 @@ class TestAnaPyzerParserMethods(unittest.TestCase):
     def test_parse_common_apache_to_list_sample1(self):
         input = ["73.83.18.52 - - [04/Apr/2018:19:30:50 +0000] \"GET / HTTP/1.1\" 200 1108 \"-\" \"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/65.0.3325.181 Safari/537.36\""]
 
-        expected_output = {0: ['04/Apr/2018', '19:30:50', '73.83.18.52', 'GET ', '/', '200', '1108', '-'],
+        expected_output = {0: ['04/Apr/2018', '19:30:50', '73.83.18.52', 'GET', '/', '200', '1108', '-',
+                               'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/65.0.3325.181 Safari/537.36',
+                               'HTTP/1.1', '-', '-', '+0000'],
                              'bytes-sent': 6,
                              'client-ip': 2,
                              'date': 0,
+                             'host': 11,
                              'length': 1,
                              'method': 3,
+                             'protocol': 9,
                              'referer': 7,
                              'sc-status': 5,
+                             'time-zone': 12,
                              'timestamp': 1,
-                             'uri-stem': 4}
+                             'uri-stem': 4,
+                             'user-agent': 8,
+                             'username': 10}
 
         self.log_file_mock.return_value = input
 
@@ -219,17 +228,27 @@ class TestAnaPyzerParserMethods(unittest.TestCase):
         input = ["73.83.18.52 - - [04/Apr/2018:19:30:50 +0000] \"GET / HTTP/1.1\" 200 1108 \"-\" \"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/65.0.3325.181 Safari/537.36\"",
                  "73.83.18.52 - - [04/Apr/2018:19:30:50 +0000] \"GET /css/style.css HTTP/1.1\" 200 1209 \"http://www.avsift.com/\" \"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/65.0.3325.181 Safari/537.36\""]
         expected_output = {
-            0: ['04/Apr/2018', '19:30:50', '73.83.18.52', 'GET ', '/', '200', '1108', '-'],
-            1: ['04/Apr/2018', '19:30:50', '73.83.18.52', 'GET ', '/css/style.css', '200', '1209', '-'],
+            0: ['04/Apr/2018', '19:30:50', '73.83.18.52', 'GET', '/', '200', '1108', '-',
+                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/65.0.3325.181 Safari/537.36',
+                'HTTP/1.1', '-', '-', '+0000'],
+            1: ['04/Apr/2018', '19:30:50', '73.83.18.52', 'GET', '/css/style.css', '200', '1209',
+                'http://www.avsift.com/',
+                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/65.0.3325.181 Safari/537.36',
+                'HTTP/1.1', '-', '-', '+0000'],
              'bytes-sent': 6,
              'client-ip': 2,
              'date': 0,
+             'host': 11,
              'length': 2,
              'method': 3,
+             'protocol': 9,
              'referer': 7,
              'sc-status': 5,
+             'time-zone': 12,
              'timestamp': 1,
-             'uri-stem': 4}
+             'uri-stem': 4,
+             'user-agent': 8,
+             'username': 10}
 
         self.log_file_mock.return_value = input
 
@@ -239,4 +258,165 @@ class TestAnaPyzerParserMethods(unittest.TestCase):
     def test_parse_common_apache_to_list_bad_file(self):
         input = [""]
         self.log_file_mock.return_value = input
-        self.assertRaises(IndexError, self.parser.parse_common_apache_to_list, self.log_file_mock())
\ No newline at end of file
+        self.assertRaises(IndexError, self.parser.parse_common_apache_to_list, self.log_file_mock())
+
+    def test_parse_common_apache_to_list_non_get_and_vhost(self):
+        input = ["73.83.18.52 - bob [04/Apr/2018:19:30:50 +0000] \"POST /login HTTP/1.1\" 302 -",
+                 "www.avsift.com:80 73.83.18.52 - - [04/Apr/2018:19:30:51 +0000] \"HEAD / HTTP/1.0\" 200 5 \"-\" \"curl\""]
+
+        output = self.parser.parse_common_apache_to_list(input)
+        self.assertEqual(['04/Apr/2018', '19:30:50', '73.83.18.52', 'POST', '/login', '302', '0', '-', '-',
+                          'HTTP/1.1', 'bob', '-', '+0000'], output[0])
+        self.assertEqual(['04/Apr/2018', '19:30:51', '73.83.18.52', 'HEAD', '/', '200', '5', '-', 'curl',
+                          'HTTP/1.0', '-', 'www.avsift.com:80', '+0000'], output[1])
+
+    def test_parse_common_apache_to_list_escaped_quotes(self):
+        input = ["73.83.18.52 - - [04/Apr/2018:19:30:50 +0000] \"GET /a\\\"b HTTP/1.1\" 200 5 \"-\" \"say \\\"hi\\\"\""]
+
+        output = self.parser.parse_common_apache_to_list(input)
+        self.assertEqual(['04/Apr/2018', '19:30:50', '73.83.18.52', 'GET', '/a\\"b', '200', '5', '-',
+                          'say \\"hi\\"', 'HTTP/1.1', '-', '-', '+0000'], output[0])
+
+    def test_iter_common_apache_batches(self):
+        input = ["73.83.18.52 - - [04/Apr/2018:19:30:50 +0000] \"GET / HTTP/1.1\" 200 1108 \"-\" \"-\"",
+                 "73.83.18.53 - - [04/Apr/2018:19:30:51 +0000] \"GET /a HTTP/1.1\" 200 1108 \"-\" \"-\"",
+                 "73.83.18.54 - - [04/Apr/2018:19:30:52 +0000] \"GET /b HTTP/1.1\" 200 1108 \"-\" \"-\""]
+
+        batches = list(self.parser.iter_common_apache_batches(input, 2))
+        self.assertEqual([2, 1], [batch.length for batch in batches])
+        self.assertEqual(['73.83.18.54'], list(batches[1].column('client-ip')))
+        self.assertEqual([1522870252], list(batches[1].column('epoch')))
+        # The batches encode their values with the same symbol tables
+        self.assertIs(batches[0].column('date').symbol_table, batches[1].column('date').symbol_table)
+        self.assertEqual([0], list(batches[1].column('date').codes))
+
+    def test_iter_w3c_batches_keeps_header_between_batches(self):
+        input = ["#Fields: date time c-ip cs-uri-stem",
+                 "2016-05-16 00:00:00 52.232.212.188 /a",
+                 "2016-05-16 00:00:01 26.25.144.84 /b",
+                 "2016-05-16 00:00:02 26.25.144.85 /c"]
+
+        batches = list(self.parser.iter_w3c_batches(input, 2))
+        self.assertEqual([2, 1], [batch.length for batch in batches])
+        self.assertEqual(2, batches[1]['client-ip'])
+        self.assertEqual(['/c'], list(batches[1].column('uri-stem')))
+
+    def test_parse_w3c_requested_to_list(self):
+        input = ["#Fields: date time s-ip cs-uri-stem c-ip sc-bytes",
+                 "2016-05-16 00:00:00 10.0.0.4 /a 52.232.212.188 512",
+                 "#Fields: date time c-ip cs-uri-stem",
+                 "2016-05-16 00:00:01 26.25.144.84 /b"]
+
+        output = self.parser.parse_w3c_requested_to_list(input, ['c-ip', 'date', 'referer'])
+        self.assertEqual({0: ['52.232.212.188', '2016-05-16'],
+                          1: ['26.25.144.84', '2016-05-16'],
+                          'length': 2}, {key: output[key] for key in [0, 1, 'length']})
+        self.assertEqual(0, output['client-ip'])
+        self.assertEqual(1, output['date'])
+        self.assertEqual(-1, output['referer'])
+        self.assertEqual(-1, output['uri-stem'])
+
+    def test_w3c_segments_are_stored_in_one_column_layout(self):
+        input = ["#Fields: date time s-ip cs-uri-stem c-ip sc-bytes",
+                 "2016-05-16 00:00:00 10.0.0.4 /a 52.232.212.188 512",
+                 "#Fields: date time c-ip cs-uri-stem cs-version",
+                 "2016-05-16 00:00:01 26.25.144.84 /b HTTP/1.1"]
+
+        output = self.parser.parse_w3c_to_list(input)
+        self.assertEqual(['date', 'time', 's-ip', 'cs-uri-stem', 'c-ip', 'sc-bytes', 'cs-version'],
+                         output.schema.columns)
+        self.assertEqual(['52.232.212.188', '26.25.144.84'], list(output.column('client-ip')))
+        self.assertEqual(['/a', '/b'], list(output.column('cs-uri-stem')))
+        self.assertEqual(['10.0.0.4', None], list(output.column('s-ip')))
+        self.assertEqual([None, 'HTTP/1.1'], list(output.column('cs-version')))
+
+        # A later batch has the columns of the earlier ones, with the new columns to their right
+        batches = list(self.parser.iter_w3c_batches(input, 1))
+        self.assertEqual(output.schema.columns[:-1], batches[0].schema.columns)
+        self.assertEqual(output.schema.columns, batches[1].schema.columns)
+        self.assertEqual(4, batches[1]['client-ip'])
+
+    def test_requested_field_of_a_later_w3c_segment(self):
+        input = ["#Fields: date time c-ip",
+                 "2016-05-16 00:00:00 52.232.212.188",
+                 "#Fields: date time cs-uri-stem c-ip",
+                 "2016-05-16 00:00:01 /b 26.25.144.84"]
+
+        output = self.parser.parse_w3c_requested_to_list(input, ['uri-stem', 'client-ip'])
+        self.assertEqual(['client-ip', 'uri-stem'], output.schema.columns)
+        self.assertEqual([None, '/b'], list(output.column('cs-uri-stem')))
+        self.assertEqual(['52.232.212.188', '26.25.144.84'], list(output.column('c-ip')))
+
+    def test_parse_common_apache_requested_to_list(self):
+        input = ["73.83.18.52 - bob [04/Apr/2018:19:30:50 +0000] \"POST /login HTTP/1.1\" 302 -"]
+
+        output = self.parser.parse_common_apache_requested_to_list(input, ['uri-stem', 'bytes-sent'])
+        self.assertEqual(['/login', '0'], output[0])
+        self.assertEqual(1, output['bytes-sent'])
+        self.assertIsNone(output.column('client-ip'))
+
+    def test_detect_log_format(self):
+        w3c_lines = ["#Software: Microsoft Internet Information Services 8.5",
+                     "#Fields: date time c-ip cs-uri-stem",
+                     "2016-05-16 00:00:00 52.232.212.188 /a"]
+        self.assertEqual((LOG_FORMAT_W3C, ['date', 'timestamp', 'client-ip', 'uri-stem']),
+                         detect_log_format(w3c_lines))
+
+        common_line = "73.83.18.52 - bob [04/Apr/2018:19:30:50 +0000] \"POST /login HTTP/1.1\" 302 -"
+        vhost_line = ("www.avsift.com:80 73.83.18.52 - - [04/Apr/2018:19:30:51 +0000] \"HEAD / HTTP/1.0\" 200 5 "
+                      "\"-\" \"curl\"")
+        log_format, columns = detect_log_format([common_line])
+        self.assertEqual(LOG_FORMAT_APACHE, log_format)
+        self.assertNotIn('user-agent', columns)
+        log_format, columns = detect_log_format([common_line, vhost_line, "garbage"])
+        self.assertEqual(LOG_FORMAT_APACHE, log_format)
+        self.assertIn('host', columns)
+
+        self.assertEqual((None, None), detect_log_format(["garbage", "more garbage", common_line]))
+        self.assertEqual((None, None), detect_log_format([]))
+
+    def test_lenient_apache_parse_counts_malformed_lines(self):
+        good_line = '10.0.0.1 - - [04/Apr/2018:19:30:50 +0000] "GET / HTTP/1.1" 200 5\n'
+        lines = [good_line, '\n', '10.0.0.2 - - [04/Apr/2018:19:30:51 +0000] "GET /cut', good_line,
+                 'no timestamp here\n', good_line]
+        with self.assertRaises(IndexError):
+            AnaPyzerParser.parse_common_apache_to_list(lines)
+
+        malformed_lines = MalformedLines()
+        output = AnaPyzerParser.parse_common_apache_to_list(lines, malformed_lines)
+        self.assertEqual(3, output.length)
+        self.assertEqual({MALFORMED_BLANK: 1, MALFORMED_TRUNCATED: 1, MALFORMED_NO_TIMESTAMP: 1},
+                         malformed_lines.counts)
+        self.assertEqual([2, 3, 5], [line_number for source, line_number, category in malformed_lines.sample])
+        self.assertEqual(6, malformed_lines.line_count)
+
+        # Lines parsed later are numbered on from the lines already counted
+        AnaPyzerParser.parse_common_apache_requested_to_list(['\n'], ['client-ip'], malformed_lines)
+        self.assertEqual((None, 7, MALFORMED_BLANK), malformed_lines.sample[-1])
+
+    def test_lenient_w3c_parse_counts_malformed_lines(self):
+        lines = ['2016-05-16 00:00:00 52.232.212.188\n',
+                 '#Fields: date time c-ip\n',
+                 '2016-05-16 00:00:01 52.232.212.188\n',
+                 '2016-05-16 00:00:02\n',
+                 '2016-05-16 00:00:03 52.232.212.188 extra\n',
+                 '2016-05-16 00:00:04 52.232.212.189\n']
+        malformed_lines = MalformedLines()
+        output = AnaPyzerParser.parse_w3c_to_list(lines, malformed_lines)
+
+        self.assertEqual(['52.232.212.188', '52.232.212.189'], list(output.column('c-ip')))
+        self.assertEqual([(None, 1, MALFORMED_NO_FIELDS), (None, 4, MALFORMED_TRUNCATED),
+                          (None, 5, MALFORMED_FIELD_COUNT)], malformed_lines.sample)
+
+    def test_malformed_lines_sample_is_bounded(self):
+        malformed_lines = MalformedLines(sample_size=2)
+        AnaPyzerParser.parse_common_apache_to_list(['bad\n'] * 5, malformed_lines)
+        self.assertEqual(5, malformed_lines.total)
+        self.assertEqual([1, 2], [line_number for source, line_number, category in malformed_lines.sample])
+        self.assertIn('Skipped 5 malformed lines', malformed_lines.summary())
+        self.assertEqual('', MalformedLines().summary())
+
+        combined = MalformedLines()
+        combined.extend(malformed_lines, 'access.log.1')
+        self.assertEqual(('access.log.1', 1, MALFORMED_NO_TIMESTAMP), combined.sample[0])
+        self.assertIn('access.log.1:1', combined.summary())
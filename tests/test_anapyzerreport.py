@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+import unittest
+from anapyzeranalyzer import AnaPyzerAnalyzer
+from anapyzerparser import AnaPyzerParser
+from anapyzerreport import ReportRecord, TextSink, JsonLinesSink, CsvSink, ChunkSink, HEADING, report_sink
+from anapyzerreport import write_report
+
+
+class TestAnaPyzerReportMethods(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = AnaPyzerAnalyzer()
+        self.parsed_log = AnaPyzerParser.parse_w3c_to_list(["#Fields: date time c-ip cs-uri-stem sc-bytes",
+                                                            "2016-05-16 00:00:00 52.232.212.188 /a,b 10",
+                                                            "2016-05-16 00:00:01 52.232.212.188 /a,b 10",
+                                                            "2016-05-16 00:00:02 26.25.144.84 /c 500"])
+
+    def test_text_sink_writes_report_text(self):
+        for report in [self.analyzer.get_web_pages, self.analyzer.get_connection_length_report,
+                       lambda parsed_log, sink=None: self.analyzer.malicious_activity_report(parsed_log, 1, 5,
+                                                                                             sink=sink)]:
+            out_file = io.StringIO()
+            record_count = report(self.parsed_log, sink=TextSink(out_file))
+            self.assertEqual(report(self.parsed_log), out_file.getvalue())
+            self.assertGreater(record_count, 1)
+
+    def test_json_lines_sink(self):
+        out_file = io.StringIO()
+        self.assertEqual(3, self.analyzer.get_web_pages(self.parsed_log, sink=JsonLinesSink(out_file)))
+        lines = [json.loads(line) for line in out_file.getvalue().splitlines()]
+        self.assertEqual({'record': HEADING, 'entries': 2, 'tracked': False, 'top_k': 50, 'metric': 'hits'},
+                         lines[0])
+        self.assertEqual({'record': 'resource', 'url': '/a,b', 'hits': 2, 'bytes_sent': 20, 'error': 0}, lines[1])
+
+    def test_csv_sink_writes_rows_only(self):
+        out_file = io.StringIO(newline='')
+        self.analyzer.malicious_activity_report(self.parsed_log, 1, 5, sink=CsvSink(out_file))
+        self.assertEqual([['ip', 'url', 'max_hits', 'window_seconds'], ['52.232.212.188', '/a,b', '1', '5']],
+                         list(csv.reader(io.StringIO(out_file.getvalue()))))
+
+    def test_chunk_sink(self):
+        chunks = []
+        records = [ReportRecord('row', {}, str(i) * 3) for i in range(0, 5)]
+        self.assertEqual(5, write_report(records, ChunkSink(chunks.append, 5)))
+        self.assertEqual(['000111', '222333', '444'], chunks)
+
+    def test_report_sink_from_suffix(self):
+        out_file = io.StringIO()
+        self.assertIsInstance(report_sink(out_file, 'report.CSV'), CsvSink)
+        self.assertIsInstance(report_sink(out_file, 'report.jsonl'), JsonLinesSink)
+        self.assertIsInstance(report_sink(out_file, 'report.txt'), TextSink)
+
+    def test_save_report_to_file(self):
+        report = self.analyzer.get_connection_length_report(self.parsed_log)
+        out_file = io.StringIO()
+        self.assertTrue(self.analyzer.save_report_to_file(report, out_file))
+        self.assertEqual(report, out_file.getvalue())
+
+        out_file = io.StringIO()
+        self.analyzer.save_report_to_file([ReportRecord(HEADING, {}, "a\n"), ReportRecord('row', {}, "b\n")],
+                                          out_file)
+        self.assertEqual("a\nb\n", out_file.getvalue())
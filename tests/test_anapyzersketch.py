@@ -0,0 +1,60 @@
+import pickle
+import unittest
+from anapyzersketch import HyperLogLog, SpaceSaving, sketch_hash
+
+
+class TestAnaPyzerSketchMethods(unittest.TestCase):
+    def test_count_is_within_error(self):
+        sketch = HyperLogLog(12)
+        for i in range(0, 50000):
+            sketch.add('10.%d.%d.%d' % (i // 65536, i // 256 % 256, i % 256))
+            # Values added again are not counted twice
+            sketch.add('10.0.0.1')
+        # The standard error of a precision of 12 is about 1.6%
+        self.assertAlmostEqual(50000, sketch.count(), delta=50000 * 0.05)
+
+    def test_small_counts_are_close_to_exact(self):
+        sketch = HyperLogLog(10)
+        for i in range(0, 20):
+            sketch.add('52.232.212.' + str(i))
+        self.assertEqual(20, round(sketch.count()))
+        self.assertEqual(0, HyperLogLog(10).count())
+
+    def test_merge(self):
+        first, second, both = HyperLogLog(8), HyperLogLog(8), HyperLogLog(8)
+        for i in range(0, 3000):
+            (first if i % 2 else second).add(i)
+            both.add(i)
+        first.merge(second)
+        self.assertEqual(both, first)
+        self.assertEqual(both, pickle.loads(pickle.dumps(first)))
+
+        with self.assertRaises(ValueError):
+            first.merge(HyperLogLog(9))
+
+    def test_precision_is_checked(self):
+        for precision in [3, 17, 12.5]:
+            with self.assertRaises(ValueError):
+                HyperLogLog(precision)
+
+    def test_hash_is_the_same_in_every_process(self):
+        self.assertEqual(0x538ef646e14d03e6, sketch_hash('10.0.0.1'))
+
+    def test_space_saving_keeps_frequent_items(self):
+        sketch = SpaceSaving(10)
+        true_counts = {}
+        for i in range(0, 5000):
+            # Two frequent items among many items that are only seen once
+            item = '/a' if i % 4 == 0 else '/b' if i % 4 == 1 else '/crawl/' + str(i)
+            sketch.add(item)
+            true_counts[item] = true_counts.get(item, 0) + 1
+
+        self.assertEqual(10, len(sketch))
+        top = sketch.top(2)
+        self.assertEqual(['/a', '/b'], sorted(item for item, count, error in top))
+        for item, count, error in top:
+            self.assertLessEqual(true_counts[item], count)
+            self.assertLessEqual(count - error, true_counts[item])
+
+        with self.assertRaises(ValueError):
+            SpaceSaving(0)